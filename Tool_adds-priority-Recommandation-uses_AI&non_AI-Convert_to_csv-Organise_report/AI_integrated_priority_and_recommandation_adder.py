@@ -1,7 +1,14 @@
-import pandas as pd
 import os
-import shutil
-import openai
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from priority_splitter import split_by_priority
+from report_io import read_csv, read_report, write_report
+from run_profile import RunProfile, profiled
 
 def generate_recommendation(control_title, description):
     """
@@ -28,6 +35,8 @@ def generate_recommendation(control_title, description):
     # REF: [accurate link or "Closest Reference Link: <link>"]
     """
     
+    import openai
+
     try:
         response = openai.ChatCompletion.create(
             model="gpt-4",
@@ -43,86 +52,99 @@ def generate_recommendation(control_title, description):
 
 def load_priority_data(priority_file):
     """Load priority data from a given CSV file."""
+    import pandas as pd
+
     if os.path.exists(priority_file):
-        return pd.read_csv(priority_file)
+        return read_csv(priority_file)
     else:
         print(f"Error: The file {priority_file} does not exist.")
         return pd.DataFrame()
 
-def create_priority_files(report_df, reports_folder):
-    """Create separate files for each priority level and move them to the reports folder."""
-    for priority in [1, 2, 3]:
-        priority_df = report_df[report_df['priority'] == priority]
-        if not priority_df.empty:
-            new_file_name = f"{report_file.split('.')[0]}_priority_{priority}.csv"
-            priority_df.to_csv(new_file_name, index=False)
-            print(f"Created file: {new_file_name}")
-            shutil.move(new_file_name, os.path.join(reports_folder, new_file_name))
-            print(f"Moved file to: {os.path.join(reports_folder, new_file_name)}")
-
-def move_report_to_folder(report_file, reports_folder):
-    """Move the generated report to the reports folder."""
-    shutil.move(report_file, os.path.join(reports_folder, report_file))
-    print(f"Moved report to: {os.path.join(reports_folder, report_file)}")
-
-def main(report_file):
-    reports_folder = 'reports'
+def create_priority_files(report_df, reports_folder, report_file, output_format='csv'):
+    """Create separate files for each priority level directly in the reports folder."""
+    base_name = os.path.splitext(os.path.basename(report_file))[0]
+    return split_by_priority(report_df, reports_folder, base_name, output_format)
+
+def main(report_file, output_format='csv', create_files=None, priority_dir='optimizer_locked/ex1',
+         reports_folder='reports'):
+    """
+    Add priorities and recommendations to a report.
+    output_format selects the saved report type: csv, xlsx, parquet or arrow.
+    create_files=None asks whether to write one file per priority; True/False skips the prompt.
+    Returns the path of the saved report.
+    """
+    import pandas as pd
+
     os.makedirs(reports_folder, exist_ok=True)
 
+    profile = RunProfile('AI_integrated_priority_and_recommandation_adder')
+
     # Load priority data
-    priority_files = [
-        'optimizer_locked/ex1/1_priority_expe.csv',
-        'optimizer_locked/ex1/2_priority_expe.csv',
-        'optimizer_locked/ex1/3_priority_expe.csv'
-    ]
+    with profile.stage('load_priority_lists') as stage:
+        priority_files = [
+            os.path.join(priority_dir, '1_priority_expe.csv'),
+            os.path.join(priority_dir, '2_priority_expe.csv'),
+            os.path.join(priority_dir, '3_priority_expe.csv')
+        ]
     
-    priority_data = [load_priority_data(file) for file in priority_files]
+        priority_data = [load_priority_data(file) for file in priority_files]
+        stage['rows'] = sum(len(df) for df in priority_data)
 
     # Load report data
-    report_df = pd.read_csv(report_file)
+    with profile.stage('load_report') as stage:
+        report_df = read_report(report_file)
+        stage['rows'] = len(report_df)
 
     # Initialize new columns for priorities, recommendations, and cost
-    report_df['priority'] = None
-    report_df['Recommendation Steps/Approach'] = None
-    report_df['COST'] = None
-
-    # Match and add priority data
-    for priority_df, priority in zip(priority_data, [1, 2, 3]):
-        if priority_df.empty:
-            continue
-        for index, row in priority_df.iterrows():
-            control_title = row['control_title']
-            recommendation = row.get('Recommendation Steps/Approach', "")
-            cost = row.get('COST', "")
-
-            if control_title in report_df['control_title'].values:
-                report_df.loc[report_df['control_title'] == control_title, 
-                              ['priority', 'Recommendation Steps/Approach', 'COST']] = [priority, recommendation, cost]
+    with profile.stage('assign_priorities', rows=len(report_df)):
+        report_df['priority'] = None
+        report_df['Recommendation Steps/Approach'] = None
+        report_df['COST'] = None
+
+        # Match and add priority data
+        for priority_df, priority in zip(priority_data, [1, 2, 3]):
+            if priority_df.empty:
+                continue
+            for index, row in priority_df.iterrows():
+                control_title = row['control_title']
+                recommendation = row.get('Recommendation Steps/Approach', "")
+                cost = row.get('COST', "")
+
+                if control_title in report_df['control_title'].values:
+                    report_df.loc[report_df['control_title'] == control_title, 
+                                  ['priority', 'Recommendation Steps/Approach', 'COST']] = [priority, recommendation, cost]
 
     # Handle missing recommendations using AI
-    for index, row in report_df.iterrows():
-        if pd.isna(row['priority']):
-            report_df.at[index, 'priority'] = 3  # Default to priority 3
-        if pd.isna(row['Recommendation Steps/Approach']):
-            ai_recommendation = generate_recommendation(row['control_title'], row['control_description'])
-            report_df.at[index, 'Recommendation Steps/Approach'] = ai_recommendation
-        if pd.isna(row['COST']):
-            report_df.at[index, 'COST'] = "Cost not provided"
+    with profile.stage('ai_recommendations') as stage:
+        for index, row in report_df.iterrows():
+            if pd.isna(row['priority']):
+                report_df.at[index, 'priority'] = 3  # Default to priority 3
+            if pd.isna(row['Recommendation Steps/Approach']):
+                ai_recommendation = generate_recommendation(row['control_title'], row['control_description'])
+                report_df.at[index, 'Recommendation Steps/Approach'] = ai_recommendation
+                stage['rows'] = (stage['rows'] or 0) + 1
+            if pd.isna(row['COST']):
+                report_df.at[index, 'COST'] = "Cost not provided"
 
     # Save the updated report
-    updated_report_file = f"{report_file.split('.')[0]}_with_priorities.csv"
-    report_df.to_csv(updated_report_file, index=False)
-    print(f"Report saved as {updated_report_file}")
-
-    # Move the report file to the reports folder
-    move_report_to_folder(updated_report_file, reports_folder)
+    with profile.stage('save_report', rows=len(report_df)):
+        # Written straight into the reports folder rather than moved there afterwards
+        base_name = os.path.splitext(os.path.basename(report_file))[0]
+        saved_report_file = os.path.join(reports_folder, f"{base_name}_with_priorities.{output_format}")
+        write_report(report_df, saved_report_file)
+        print(f"Report saved as {saved_report_file}")
 
     # Prompt for additional file creation
-    create_files = input("Do you want to create separate files for priorities 1, 2, and 3? (yes/no): ").strip().lower()
-    if create_files == 'yes':
-        create_priority_files(report_df, reports_folder)
+    if create_files is None:
+        create_files = input("Do you want to create separate files for priorities 1, 2, and 3? (yes/no): ").strip().lower() == 'yes'
+    if create_files:
+        with profile.stage('split_priorities', rows=len(report_df)):
+            create_priority_files(report_df, reports_folder, report_file, output_format)
+
+    profile.write(saved_report_file)
+    return saved_report_file
 
 if __name__ == "__main__":
     report_file = input("Enter the report file name: ").strip()
-    main(report_file)
+    profiled(main)(report_file)
 
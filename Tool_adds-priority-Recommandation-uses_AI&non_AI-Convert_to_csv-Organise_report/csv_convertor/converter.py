@@ -1,30 +1,160 @@
+import argparse
 import csv
 import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-# Ask the user for the input file path
-input_file = input("Please enter the input file path (e.g., /path/to/checks.csv[/home/optit/Documents/Big_Data_analysis_and_sortings/csv_python_sort/checks.csv]# Replace with your file ): ").strip()
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from run_profile import profiled
 
-# Check if the file exists
-if not os.path.isfile(input_file):
-    print("File not found. Please check the path and try again.")
-else:
-    # Ask the user if they want to convert the file to CSV
-    convert_to_csv = input("Do you want your file to get converted to CSV? (yes/no): ").strip().lower()
+# Large buffered reads and batched writes keep the conversion bound by disk speed
+BUFFER_SIZE = 16 * 1024 * 1024  # bytes per read
+BATCH_ROWS = 10000  # rows per writerows call
 
-    if convert_to_csv == 'yes':
-        # Ask for the output filename (full path)
-        output_file = input("Please enter the output filename (with .csv extension): ").strip()
-    else:
-        print("Skipping CSV conversion.")
-        output_file = input("Please enter the output filename (with .csv extension): ").strip()
+# Files smaller than this are not worth splitting across processes
+MIN_PARALLEL_SIZE = 64 * 1024 * 1024
+
+# surrogateescape round-trips any byte sequence unchanged
+ENCODING = 'utf-8'
+ERRORS = 'surrogateescape'
 
-    # Open the input file and process it line by line
-    with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
-        csv_writer = csv.writer(outfile)
 
-        for line in infile:
+def iter_lines(infile, start, end, buffer_size=BUFFER_SIZE):
+    """
+    Yield decoded lines from the byte range [start, end) of a binary file.
+    The range must begin and end on line boundaries.
+    """
+    infile.seek(start)
+    remaining = end - start
+    pending = b''
+    while remaining > 0:
+        block = infile.read(min(buffer_size, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode(ENCODING, ERRORS)
+    if pending:
+        yield pending.decode(ENCODING, ERRORS)
+
+
+def convert_range(input_file, output_file, start, end):
+    """
+    Convert one byte range of the tab separated input into CSV rows.
+    Returns the number of rows written.
+    """
+    rows = 0
+    with open(input_file, 'rb') as infile, \
+            open(output_file, 'w', newline='', encoding=ENCODING, errors=ERRORS,
+                 buffering=BUFFER_SIZE) as outfile:
+        csv_writer = csv.writer(outfile)
+        batch = []
+        for line in iter_lines(infile, start, end):
             # Split the line by tabs
-            row = line.strip().split('\t')  # Split by tab character
-            csv_writer.writerow(row)
+            batch.append(line.strip().split('\t'))
+            if len(batch) >= BATCH_ROWS:
+                csv_writer.writerows(batch)
+                rows += len(batch)
+                batch = []
+        csv_writer.writerows(batch)
+        rows += len(batch)
+    return rows
+
+
+def split_offsets(input_file, parts):
+    """
+    Split the file into roughly equal byte ranges that start on a new line.
+    """
+    size = os.path.getsize(input_file)
+    offsets = [0]
+    with open(input_file, 'rb') as infile:
+        for i in range(1, parts):
+            infile.seek(max(size * i // parts, offsets[-1]))
+            infile.readline()  # move to the start of the next line
+            position = infile.tell()
+            if position >= size:
+                break
+            if position > offsets[-1]:
+                offsets.append(position)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def convert_file(input_file, output_file, workers=1):
+    """
+    Convert a tab separated file to CSV.
+
+    With workers > 1 the input is split at newline boundaries, every part is
+    converted in its own process and the parts are concatenated in order.
+    """
+    size = os.path.getsize(input_file)
+    if workers <= 1 or size < MIN_PARALLEL_SIZE:
+        return convert_range(input_file, output_file, 0, size)
+
+    ranges = split_offsets(input_file, workers)
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        part_files = [os.path.join(tmp_dir, f"part_{i}.csv") for i in range(len(ranges))]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(convert_range, input_file, part_file, start, end)
+                       for part_file, (start, end) in zip(part_files, ranges)]
+            rows = sum(future.result() for future in futures)
+
+        # Concatenate the converted parts in input order
+        with open(output_file, 'wb') as outfile:
+            for part_file in part_files:
+                with open(part_file, 'rb') as part:
+                    shutil.copyfileobj(part, outfile, BUFFER_SIZE)
+    return rows
+
+
+def prompt_for_files():
+    """
+    Interactive fallback when no arguments are given
+    """
+    # Ask the user for the input file path
+    input_file = input("Please enter the input file path (e.g., /path/to/checks.csv[/home/optit/Documents/Big_Data_analysis_and_sortings/csv_python_sort/checks.csv]# Replace with your file ): ").strip()
+
+    # Check if the file exists
+    if not os.path.isfile(input_file):
+        print("File not found. Please check the path and try again.")
+        return None, None
+
+    # Ask for the output filename (full path)
+    output_file = input("Please enter the output filename (with .csv extension): ").strip()
+    return input_file, output_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a tab separated checks dump to CSV.")
+    parser.add_argument('input_file', nargs='?', help="Tab separated input file")
+    parser.add_argument('output_file', nargs='?', help="CSV output file")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="Convert in parallel across this many processes (default: 1)")
+    args = parser.parse_args(argv)
+
+    if args.input_file and args.output_file:
+        input_file, output_file = args.input_file, args.output_file
+        if not os.path.isfile(input_file):
+            print("File not found. Please check the path and try again.")
+            return 1
+    else:
+        input_file, output_file = prompt_for_files()
+        if input_file is None:
+            return 1
+
+    rows = convert_file(input_file, output_file, workers=args.workers)
+    print(f"Conversion to CSV completed. {rows} rows written to {output_file}")
+    return 0
+
 
-    print("Conversion to CSV completed.")
+if __name__ == "__main__":
+    raise SystemExit(profiled(main)())
@@ -1,6 +1,14 @@
 import os
-import pandas as pd
-from tabulate import tabulate
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from control_query import load_catalog
+from run_profile import profiled
+from table_render import render_table
 
 def generate_unique_filename(filename, extension):
     """
@@ -18,46 +26,55 @@ def generate_unique_filename(filename, extension):
     
     return unique_filename
 
-def filter_checks_by_priority(file_path, priority):
-    # Read the CSV file
-    df = pd.read_csv(file_path)
-
-    # Clean up whitespace in the relevant columns
-    df['title'] = df['title'].str.strip()
-    df['control_title'] = df['control_title'].str.strip()  # Fixed column name
-    df['priority'] = df['priority'].str.strip()
-
-    # Filter the DataFrame based on the selected priority
-    filtered_df = df[df['priority'] == f'p{priority}']
+def filter_checks_by_priority(file_path, priority, csv_filename=None, table_filename=None, prompt=True):
+    """
+    Print the checks of one priority level and optionally save them.
+    With prompt=False nothing is asked: the CSV and table files are written only
+    when csv_filename and table_filename are given. Returns the filtered rows.
+    """
+    # The file is loaded, stripped and indexed once per session; the priority
+    # is then looked up in memory (the encoding is detected from a sample)
+    filtered_df = load_catalog(file_path).query(priority=priority)
 
-    # Print the output with the desired columns using tabulate for better formatting
-    table_output = tabulate(filtered_df[['title', 'control_title', 'priority']], headers='keys', tablefmt='pretty', showindex=False)
-    print(table_output)
+    # Print the output with the desired columns
+    # The rows are streamed as they are formatted, a page at a time on a terminal
+    table_columns = ['title', 'control_title', 'priority']
+    render_table(filtered_df, table_columns, page_size=None if prompt else 0)
 
     # Ask if the user wants to save the output to a file
-    save_file = input("Do you want to save the filtered table results to a new file? (yes/no): ").strip().lower()
+    if prompt:
+        save_file = input("Do you want to save the filtered table results to a new file? (yes/no): ").strip().lower()
+    else:
+        save_file = 'yes' if csv_filename else 'no'
 
     if save_file == 'yes':
         # Get the file name for CSV, ensure extension is added and uniqueness
-        csv_filename = input("Enter the name of the CSV file (e.g., 'filtered_output.csv'): ").strip()
+        if prompt:
+            csv_filename = input("Enter the name of the CSV file (e.g., 'filtered_output.csv'): ").strip()
         csv_filename = generate_unique_filename(csv_filename, '.csv')
         # Save CSV file
         filtered_df.to_csv(csv_filename, index=False)
         print(f"Filtered results have been saved to {csv_filename}")
 
         # Ask if the user wants to save a clear formatted table file
-        save_table = input("Do you want to save a clear formatted table file as well? (yes/no): ").strip().lower()
+        if prompt:
+            save_table = input("Do you want to save a clear formatted table file as well? (yes/no): ").strip().lower()
+        else:
+            save_table = 'yes' if table_filename else 'no'
         if save_table == 'yes':
             # Get the file name for the table format, ensure uniqueness
-            table_filename = input("Enter the name of the table file (e.g., 'filtered_output.txt'): ").strip()
+            if prompt:
+                table_filename = input("Enter the name of the table file (e.g., 'filtered_output.txt'): ").strip()
             table_filename = generate_unique_filename(table_filename, '.txt')
             # Save the table format to a file
             with open(table_filename, 'w') as f:
-                f.write(table_output)
+                render_table(filtered_df, table_columns, out=f, max_width=None)
             print(f"Formatted table has been saved to {table_filename}")
     else:
         print("No files were saved.")
 
+    return filtered_df
+
 if __name__ == "__main__":
     # Specify the path to your CSV file
     file_path = 'input_file_priority.csv'
@@ -66,4 +83,4 @@ if __name__ == "__main__":
     priority = input("Enter the priority level you want to filter by (1, 2, or 3): ")
 
     # Call the filtering function
-    filter_checks_by_priority(file_path, priority)
+    profiled(filter_checks_by_priority)(file_path, priority)
@@ -1,34 +1,55 @@
-import pandas as pd
 import os
 from datetime import datetime
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_header, read_report, should_stream, stream_columns, write_report
+from run_profile import profiled
+
+def create_final_optimized_report(report_file, final_report_file, stream=None):
+    """
+    Trim the report to the required columns.
+    Only those columns are parsed; stream=True (default for very large files)
+    copies them chunk by chunk in a single pass with bounded memory.
+    """
+    # Discover the available columns from the header only (CSV, Excel, Parquet or Arrow)
+    header = read_header(report_file)
 
-def create_final_optimized_report(report_file, final_report_file):
-    # Detect the file extension and read accordingly
-    if report_file.endswith('.csv'):
-        report_df = pd.read_csv(report_file)
-    elif report_file.endswith(('.xls', '.xlsx')):
-        report_df = pd.read_excel(report_file)
-    else:
-        raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
-    
     # Columns that should always be included
     required_columns = [
         'title', 'control_title', 'control_description', 'region', 'account_id',
         'resource', 'reason', 'description', 'priority', 'Recommendation Steps/Approach', 'status'
     ]
     
-    # Create the final DataFrame with only the necessary columns
     # Select only the columns present in the report file to avoid errors
-    final_columns = [col for col in required_columns if col in report_df.columns]
-    final_report_df = report_df[final_columns]
-    
-    # Save the final optimized report
-    final_report_df.to_csv(final_report_file, index=False)
+    final_columns = [col for col in required_columns if col in header]
+
+    if stream is None:
+        stream = should_stream(report_file)
+
+    if stream:
+        # Single pass copy of the necessary columns
+        stream_columns(report_file, final_report_file, final_columns)
+    else:
+        # Load only the necessary columns
+        final_report_df = read_report(report_file, columns=final_columns)
+
+        # Save the final optimized report
+        write_report(final_report_df, final_report_file)
     print(f"Final optimized report saved as {final_report_file}")
 
-def main():
+def main(report_file=None, create_report=None, output_dir=None):
+    """
+    Build the final optimized report. Arguments left as None are asked for interactively.
+    Returns the path of the saved report, or None when nothing was written.
+    """
     # Ask the user to input the report file name
-    report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
+    if report_file is None:
+        report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
     
     # Get the input file's base name (without path) and extension
     base_name = os.path.splitext(os.path.basename(report_file))[0]
@@ -38,20 +59,23 @@ def main():
     unique_file_name = f"{base_name}_final_optimized_report_{timestamp}.csv"
     
     # Set the output path to the reports directory
-    reports_directory = os.path.dirname(os.path.abspath(__file__))  # Get the current script's directory
+    reports_directory = output_dir or os.path.dirname(os.path.abspath(__file__))  # Defaults to the script's directory
     final_report_file = os.path.join(reports_directory, unique_file_name)
 
     # Ask if the user wants to create the final report
-    create_report = input("Do you want to create the final optimized report? (yes/no): ").strip().lower()
-    if create_report == 'yes':
+    if create_report is None:
+        create_report = input("Do you want to create the final optimized report? (yes/no): ").strip().lower() == 'yes'
+    if create_report:
         try:
             create_final_optimized_report(report_file, final_report_file)
+            return final_report_file
         except ValueError as e:
             print(e)
         except Exception as e:
             print(f"An error occurred: {e}")
     else:
         print("Final report creation skipped.")
+    return None
 
 if __name__ == "__main__":
-    main()
+    profiled(main)()
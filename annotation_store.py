@@ -0,0 +1,157 @@
+"""
+Memory-mapped annotation store shared by worker processes.
+
+Every worker that enriches exports needs the annotations, and most of their
+size is the recommendation text. Loading the workbook in each worker gives
+every process its own copy of that text. The store is the annotations
+written once as an uncompressed Arrow IPC file: repeated text columns
+(priority, service, cost) are dictionary encoded, the rest are plain string
+columns (offsets + data). Opening the store memory-maps the file, and the
+DataFrame built from it points into the mapping, so all workers read the same
+physical pages from the OS page cache instead of holding private copies.
+
+    python annotation_store.py PowerPipeControls_Annotations.xlsx
+    python annotation_store.py PowerPipeControls_Annotations.xlsx -o annotations.arrow
+
+load_annotations() builds the store for a workbook on first use, keyed by
+the workbook's SHA-256 so an edited workbook gets a new store, and is what
+create_one.load_priority_database uses.
+"""
+import argparse
+import os
+import sys
+
+from report_io import XLSX_CACHE_DIR, file_hash, read_report, to_arrow_table
+from run_profile import profiled
+
+STORE_EXTENSION = '.arrow'
+STORE_DIR = os.path.join(XLSX_CACHE_DIR, 'annotation_store')
+
+# String columns with at most this share of distinct values are dictionary encoded
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def is_store(path):
+    return str(path).lower().endswith(STORE_EXTENSION)
+
+
+def read_annotations(path):
+    """
+    Read an annotations file the way the pipeline always has: workbooks with
+    pandas' Excel reader, anything else through report_io
+    """
+    import pandas as pd
+
+    if str(path).lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(path)
+    return read_report(path)
+
+
+def write_store(df, path):
+    """
+    Write annotations as an uncompressed Arrow IPC file. Compression would
+    force every reader to decompress into private memory, so none is used.
+    Returns the path.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = to_arrow_table(df)
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)) and len(column) \
+                and pc.count_distinct(column).as_py() <= DICTIONARY_MAX_RATIO * len(column):
+            table = table.set_column(i, field.name, pc.dictionary_encode(column))
+
+    # Write to a temporary name first so a concurrent reader never maps a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def store_path(annotations_path):
+    """
+    Store location for an annotations file, keyed by its contents
+    """
+    return os.path.join(STORE_DIR, f"{file_hash(annotations_path)}{STORE_EXTENSION}")
+
+
+def build_store(annotations_path, path=None):
+    """
+    Build the store for an annotations file unless it already exists.
+    A store passed as annotations_path is used as is. Returns the store path.
+    """
+    if path is None and is_store(annotations_path):
+        return annotations_path
+    path = path or store_path(annotations_path)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        write_store(read_annotations(annotations_path), path)
+    return path
+
+
+def open_store(path):
+    """
+    Memory-map a store. The returned pyarrow Table reads from the mapping, not from copies.
+    """
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def _string_types_mapper():
+    """
+    pandas 3 keeps Arrow strings in its Arrow-backed str dtype by default;
+    older versions have to be asked, or each string becomes a Python object
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    try:
+        if pd.get_option('future.infer_string'):
+            return None
+    except KeyError:
+        # pandas before 2.1 has no such option
+        pass
+    return {pa.string(): pd.StringDtype('pyarrow'), pa.large_string(): pd.StringDtype('pyarrow')}.get
+
+
+def load_annotations(path):
+    """
+    Annotations as a DataFrame backed by the memory-mapped store.
+
+    Args:
+        path (str): A store (.arrow), or an annotations workbook/CSV whose store
+            is built on first use
+
+    Returns:
+        pd.DataFrame: String columns point into the mapping; dictionary encoded
+            columns are categoricals
+    """
+    if not is_store(path):
+        path = build_store(path)
+    return open_store(path).to_pandas(types_mapper=_string_types_mapper())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped annotation store for an annotations file.")
+    parser.add_argument('annotations', help="Annotations workbook, CSV, Parquet or Arrow file")
+    parser.add_argument('-o', '--output', help=f"Store path (default: {STORE_DIR}/<sha256>{STORE_EXTENSION})")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        path = write_store(read_annotations(args.annotations), args.output)
+    else:
+        path = build_store(args.annotations)
+    table = open_store(path)
+    encoded = [field.name for field in table.schema if str(field.type).startswith('dictionary')]
+    print(f"Annotation store {path}: {table.num_rows} rows, {os.path.getsize(path) / (1024 * 1024):.1f} MB"
+          f"{', dictionary encoded: ' + ', '.join(encoded) if encoded else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
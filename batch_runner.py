@@ -0,0 +1,225 @@
+"""
+Batch mode: enrich and report many Powerpipe exports (one per client account) at once.
+
+The annotations workbook is converted once, in the parent process, into the
+memory-mapped annotation store (annotation_store.py). Each worker maps that
+file instead of receiving its own copy, so the recommendation text is held
+once in the page cache however many workers run. Each export gets its own
+comprehensive report in a folder named after it (exports that share a file
+name are told apart by their parent folder), and a combined roll-up workbook
+summarises every account.
+
+    python batch_runner.py exports/ --annotations PowerPipeControls_Annotations.xlsx -j 8 -o batch_out
+    python batch_runner.py "exports/*_aws_*.csv" -o batch_out
+"""
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from annotation_store import build_store, load_annotations
+from report_io import COLUMNAR_EXTENSIONS, read_report, write_columnar
+from run_profile import profiled
+import scan_history
+from script_loader import load_stage
+
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.xls') + COLUMNAR_EXTENSIONS
+
+# Columns the roll-up needs from every enriched export
+ROLLUP_COLUMNS = ['account_id', 'region', 'title', 'control_title', 'status', 'priority']
+
+# Annotations shared with the workers, set by init_worker
+_shared_priority = None
+
+
+def find_exports(sources):
+    """
+    Expand folders and glob patterns into a sorted list of export files
+    """
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            matches = glob.glob(source)
+        files.extend(path for path in matches
+                     if os.path.isfile(path) and path.lower().endswith(INPUT_EXTENSIONS))
+    return sorted(set(files))
+
+
+def account_names(input_files):
+    """
+    Output folder name for every export: its file name without extension. Exports
+    that share a file name (acct1/scan.csv, acct2/scan.csv) are prefixed with their
+    parent folder, and get a short hash of their path if that is still ambiguous.
+    Returns {input file: name}.
+    """
+    def stem(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def with_parent(path):
+        return f"{os.path.basename(os.path.dirname(os.path.abspath(path)))}_{stem(path)}"
+
+    def with_hash(path):
+        return f"{with_parent(path)}_{hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]}"
+
+    names = {path: stem(path) for path in input_files}
+    for rename in (with_parent, with_hash):
+        counts = {}
+        for name in names.values():
+            counts[name] = counts.get(name, 0) + 1
+        names = {path: rename(path) if counts[name] > 1 else name for path, name in names.items()}
+    return names
+
+
+def init_worker(store_path):
+    """
+    Pool initializer: map the annotation store once for every task of this worker
+    """
+    global _shared_priority
+    _shared_priority = load_annotations(store_path)
+
+
+def process_export(input_file, output_dir, name=None):
+    """
+    Enrich one export and build its report in output_dir/<name> (default: the
+    export's file name). Runs in a worker process.
+    Returns (input file, report path, enriched intermediate path); the paths are None on error.
+    """
+    annotate = load_stage('annotate')
+    account_dir = os.path.join(output_dir, name or os.path.splitext(os.path.basename(input_file))[0])
+    os.makedirs(account_dir, exist_ok=True)
+    try:
+        report_file, intermediate_file = annotate.annotate_file(input_file, _shared_priority, account_dir)
+    except Exception as e:
+        print(f"Error processing {input_file}: {e}")
+        return input_file, None, None
+    return input_file, report_file, intermediate_file
+
+
+def build_rollup(results, output_dir):
+    """
+    Combine the enriched exports into one roll-up workbook plus a combined Parquet file.
+    Returns the workbook path.
+    """
+    import pandas as pd
+
+    frames = []
+    for _, report_file, intermediate_file in results:
+        # Named after the export's output folder, unique within the batch
+        name = os.path.basename(os.path.dirname(report_file))
+        df = read_report(intermediate_file, columns=ROLLUP_COLUMNS)
+        df.insert(0, 'source_file', name)
+        if 'account_id' not in df.columns:
+            df.insert(1, 'account_id', name)
+        frames.append(df)
+    combined = pd.concat(frames, ignore_index=True)
+    combined['priority'] = combined['priority'].astype(str)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    write_columnar(combined, os.path.join(output_dir, f"batch_combined_{timestamp}.parquet"))
+
+    # One row per account with its check counts by status
+    summary = pd.crosstab([combined['source_file'], combined['account_id']], combined['status'])
+    summary['total'] = summary.sum(axis=1)
+    summary = summary.reset_index()
+
+    alarms = combined[combined['status'] == 'alarm']
+    priority_by_account = pd.crosstab(alarms['account_id'], alarms['priority'], margins=True, margins_name='Total')
+    service_by_account = pd.crosstab(alarms['title'], alarms['account_id'], margins=True, margins_name='Total') \
+        .sort_values('Total', ascending=False)
+
+    rollup_file = os.path.join(output_dir, f"batch_rollup_{timestamp}.xlsx")
+    with pd.ExcelWriter(rollup_file, engine='xlsxwriter') as writer:
+        header_format = writer.book.add_format({'bold': True, 'bg_color': '#4F81BD', 'font_color': 'white'})
+        summary.to_excel(writer, sheet_name='summary', index=False)
+        priority_by_account.to_excel(writer, sheet_name='alarm_priority_by_account')
+        service_by_account.to_excel(writer, sheet_name='alarm_service_by_account')
+        for col_num, value in enumerate(summary.columns.values):
+            writer.sheets['summary'].write(0, col_num, value, header_format)
+
+    print(f"Roll-up report saved as {rollup_file}")
+    return rollup_file
+
+
+def record_history(results, db_path):
+    """
+    Ingest every enriched export as a run and write one delta workbook per run
+    """
+    conn = scan_history.connect(db_path)
+    try:
+        for input_file, report_file, intermediate_file in results:
+            if report_file is None:
+                continue
+            run_id = scan_history.ingest(conn, intermediate_file)
+            account_dir = os.path.dirname(report_file)
+            scan_history.write_delta_report(scan_history.delta(conn, run_id),
+                                            os.path.join(account_dir, f"{os.path.basename(account_dir)}_delta.xlsx"))
+    finally:
+        conn.close()
+
+
+def run_batch(input_files, priority_file, output_dir, workers=None):
+    """
+    Process every export across a worker pool and write the roll-up.
+    Returns (per-export results, roll-up path).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Build the annotation store once, before the workers start
+    store_path = build_store(priority_file)
+
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+    names = account_names(input_files)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(store_path,)) as executor:
+        futures = [executor.submit(process_export, path, output_dir, names[path]) for path in input_files]
+        for future in as_completed(futures):
+            input_file, report_file, intermediate_file = future.result()
+            if report_file:
+                print(f"Done: {input_file} -> {report_file}")
+            results.append((input_file, report_file, intermediate_file))
+
+    results.sort()
+    succeeded = [result for result in results if result[1]]
+    rollup_file = build_rollup(succeeded, output_dir) if succeeded else None
+    return results, rollup_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrich and report many Powerpipe exports in parallel.")
+    parser.add_argument('sources', nargs='+', help="Folders or glob patterns of exports")
+    parser.add_argument('--annotations', default="PowerPipeControls_Annotations.xlsx",
+                        help="Annotations workbook, loaded once and shared by all workers")
+    parser.add_argument('-o', '--output-dir', default='batch_reports')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument('--history', metavar='DB',
+                        help="Ingest the enriched exports into this scan history store and write a delta report")
+    args = parser.parse_args(argv)
+
+    input_files = find_exports(args.sources)
+    if not input_files:
+        print("No exports found.")
+        return 1
+    print(f"Processing {len(input_files)} export(s)")
+
+    results, rollup_file = run_batch(input_files, args.annotations, args.output_dir, args.jobs)
+    if args.history:
+        record_history(results, args.history)
+
+    failed = [input_file for input_file, report_file, _ in results if report_file is None]
+    if failed:
+        print(f"{len(failed)} of {len(results)} export(s) failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
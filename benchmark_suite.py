@@ -0,0 +1,421 @@
+"""
+Benchmark suite for the report pipeline.
+
+Times enrichment, aggregation and workbook writing on synthetic Powerpipe data
+at several sizes, records wall time, CPU time and peak memory, writes the
+results as JSON and compares them with a stored baseline:
+
+    python benchmark_suite.py --sizes 10000 100000 1000000 -o results.json
+    python benchmark_suite.py --save-baseline benchmarks/baseline.json
+    python benchmark_suite.py --baseline benchmarks/baseline.json --tolerance 0.2
+
+Each case runs in a forked child process (where available) so its peak RSS is
+measured in isolation. Cases that still take minutes at 1M rows (the
+analyse workbook, which loops over the rows and writes every one to xlsx) are
+capped at max_rows by default; --no-limits lifts the cap.
+Exit status is 1 when a case regressed against the baseline or failed.
+
+--imports checks start-up cost instead: every pipeline script is loaded in a
+fresh interpreter, which has to finish within the start-up budget without
+pulling in pandas, openpyxl, openai or the other heavy dependencies (those are
+imported inside the stage that uses them):
+
+    python benchmark_suite.py --imports --import-budget 0.5
+
+tests/test_import_budget.py runs the same check under pytest and fails on a
+script over the budget.
+"""
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from report_io import read_csv, write_columnar
+from run_profile import profiled
+from script_loader import REPO_ROOT, SCRIPTS, load_script, load_stage
+from synthetic_dataset import CATALOG_FILES, SyntheticPowerpipe
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_TOLERANCE = 0.2  # 20% slower than the baseline counts as a regression
+MIN_REGRESSION_SECONDS = 0.05  # ignore jitter on cases that take a few milliseconds
+
+# Start-up check: scripts that must load without the heavy dependencies,
+# the Tool_adds copies of the tools included
+TOOL_ADDS_DIR = 'Tool_adds-priority-Recommandation-uses_AI&non_AI-Convert_to_csv-Organise_report'
+IMPORT_CHECK_SCRIPTS = sorted(set(SCRIPTS.values())) + [
+    'report_io.py', 'run_profile.py', 'script_loader.py', 'report_cli.py', 'pipeline_runner.py',
+    'batch_runner.py', 'scan_history.py', 'incremental_enrichment.py', 'report_daemon.py',
+    'job_queue.py', 'annotation_store.py', 'priority_splitter.py',
+    'control_query.py', 'table_render.py', 'report_summary.py', 'docx_template.py',
+] + sorted(os.path.relpath(path, REPO_ROOT) for path in glob.glob(
+    os.path.join(glob.escape(os.path.join(REPO_ROOT, TOOL_ADDS_DIR)), '**', '*.py'), recursive=True))
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'openpyxl', 'xlsxwriter', 'openai', 'matplotlib', 'seaborn',
+                 'docx', 'tabulate']
+DEFAULT_IMPORT_BUDGET = 0.5  # seconds from process start until the script is loaded
+
+# Run in a fresh interpreter: load one script and report which heavy modules came with it
+_IMPORT_PROBE = """
+import json, sys
+from script_loader import load_script
+load_script(sys.argv[1])
+print(json.dumps(sorted(name for name in sys.argv[2].split(',') if name in sys.modules)))
+"""
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def annotation_database():
+    """
+    The PRC annotation catalog, shaped like PowerPipeControls_Annotations.xlsx
+    """
+    df = read_csv(CATALOG_FILES[0])
+    return df[['title', 'control_title', 'priority', 'Recommendation Steps/Approach', 'COST']] \
+        .drop_duplicates('control_title')
+
+
+def enriched_frame(raw, annotations):
+    """
+    Vectorised stand-in for an enriched report, used as input by the later stages
+    """
+    df = raw.copy()
+    mapping = annotations.set_index('control_title')
+    for column in ['priority', 'Recommendation Steps/Approach', 'COST']:
+        df[column] = df['control_title'].map(mapping[column])
+    df['priority'] = df['priority'].fillna('No data')
+    return df
+
+
+class Case:
+    """
+    One benchmark case.
+
+    Args:
+        name (str): Group/name shown in the results
+        run (callable): run(state) is the timed part
+        setup (callable, optional): setup(data) -> state, not timed
+        teardown (callable, optional): teardown(state), not timed
+        max_rows (int, optional): Larger sizes are skipped unless limits are off
+    """
+
+    def __init__(self, name, run, setup=None, teardown=None, max_rows=None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda data: data)
+        self.teardown = teardown or (lambda state: None)
+        self.max_rows = max_rows
+
+
+def _h_reporter(data):
+    h = load_script('h.py')
+    reporter = h.AWSComplianceReporter.__new__(h.AWSComplianceReporter)
+    reporter.df = data['raw'].copy()
+    reporter.priority_df = data['annotations']
+    return reporter
+
+
+def _writer_state(data):
+    """
+    An in-memory workbook, so the builders are timed without the final save
+    """
+    h = load_script('h.py')
+    reporter = h.AWSComplianceReporter.__new__(h.AWSComplianceReporter)
+    buffer = io.BytesIO()
+    writer = pd.ExcelWriter(buffer, engine='xlsxwriter')
+    return {'reporter': reporter, 'writer': writer, 'df': data['enriched'],
+            'open_issues': data['enriched'][data['enriched']['status'] == 'alarm']}
+
+
+def _close_writer(state):
+    state['writer'].close()
+
+
+def _report_file_state(data):
+    handle, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(handle)
+    write_columnar(data['enriched'], path)
+    return {'input': path, 'output': f"{path}.xlsx"}
+
+
+def _remove_files(state):
+    for path in state.values():
+        if isinstance(path, str) and os.path.exists(path):
+            os.remove(path)
+
+
+def _excel_state(data):
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    return {'df': data['enriched'], 'output': path}
+
+
+def _write_excel(state):
+    with pd.ExcelWriter(state['output'], engine='xlsxwriter') as writer:
+        state['df'].to_excel(writer, sheet_name='Raw Data', index=False)
+
+
+CASES = [
+    Case('enrich/create_one.update_priority_and_recommendation',
+         lambda state: load_stage('annotate').update_priority_and_recommendation(state['df'], state['annotations']),
+         setup=lambda data: {'df': data['raw'].copy(), 'annotations': data['annotations']}),
+    Case('enrich/h.enrich_data', lambda reporter: reporter.enrich_data(), setup=_h_reporter),
+    Case('aggregate/create_one.create_simplified_report',
+         lambda state: load_stage('annotate').create_simplified_report(state, None),
+         setup=lambda data: data['enriched'].copy()),
+    Case('aggregate/h.priority_summary',
+         lambda s: s['reporter']._create_priority_summary(s['df'], s['writer'], s['writer'].book),
+         setup=_writer_state, teardown=_close_writer),
+    Case('aggregate/h.service_category_analysis',
+         lambda s: s['reporter']._create_service_category_analysis(s['open_issues'], s['writer'], s['writer'].book),
+         setup=_writer_state, teardown=_close_writer),
+    Case('aggregate/h.pivot_analysis',
+         lambda s: s['reporter']._create_pivot_analysis(s['df'], s['writer'], s['writer'].book),
+         setup=_writer_state, teardown=_close_writer),
+    Case('report/analsis_prog.create_simplified_report_with_pivot',
+         lambda s: load_stage('analyse').create_simplified_report_with_pivot(s['input'], s['output']),
+         setup=_report_file_state, teardown=_remove_files, max_rows=10_000),
+    Case('excel/xlsxwriter.raw_sheet', _write_excel, setup=_excel_state, teardown=_remove_files),
+]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(case, data):
+    """
+    Run one case and return its measurements
+    """
+    state = case.setup(data)
+    use_tracemalloc = resource is None
+    if use_tracemalloc:
+        tracemalloc.start()
+    rss_before = _peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        case.run(state)
+        status, error = 'ok', None
+    except Exception as e:
+        status, error = 'error', f"{type(e).__name__}: {e}"
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    if use_tracemalloc:
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    else:
+        peak_mb = _peak_rss_mb() - rss_before
+    case.teardown(state)
+    return {'status': status, 'error': error, 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+            'peak_mem_mb': round(peak_mb, 1)}
+
+
+def _child(case_index, data, conn):
+    # Output of the pipeline functions would drown the results
+    sys.stdout = open(os.devnull, 'w')
+    conn.send(measure(CASES[case_index], data))
+    conn.close()
+
+
+def run_case(case_index, data):
+    """
+    Measure a case in a forked child so its peak memory is isolated
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return measure(CASES[case_index], data)
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(case_index, data, child_conn))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {'status': 'error', 'error': f"child exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+
+def run_suite(sizes, selected=None, no_limits=False, repeat=1, seed=0):
+    """
+    Run the selected cases at every size. Returns the list of result records.
+    """
+    annotations = annotation_database()
+    results = []
+    for rows in sizes:
+        generator = SyntheticPowerpipe(accounts=10, seed=seed)
+        raw = pd.concat(generator.chunks(rows), ignore_index=True)
+        data = {'raw': raw, 'annotations': annotations, 'enriched': enriched_frame(raw, annotations)}
+
+        for index, case in enumerate(CASES):
+            if selected and not any(pattern in case.name for pattern in selected):
+                continue
+            record = {'case': case.name, 'rows': rows}
+            if case.max_rows and rows > case.max_rows and not no_limits:
+                record.update(status='skipped', error=f"over max_rows={case.max_rows}")
+                print(f"{case.name:<60} {rows:>9}  skipped (max_rows={case.max_rows})")
+                results.append(record)
+                continue
+
+            runs = [run_case(index, data) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run.get('wall_s', float('inf')))
+            record.update(best)
+            if best['status'] == 'ok' and best['wall_s']:
+                record['rows_per_s'] = round(rows / best['wall_s'])
+                print(f"{case.name:<60} {rows:>9}  {best['wall_s']:>9.3f}s  cpu {best['cpu_s']:>8.3f}s  "
+                      f"peak {best['peak_mem_mb']:>8.1f} MB")
+            else:
+                print(f"{case.name:<60} {rows:>9}  {best['status']}: {best.get('error')}")
+            results.append(record)
+    return results
+
+
+def measure_import(path, repeat=3):
+    """
+    Start a new interpreter that loads the script, repeat times.
+    Returns the fastest start-up time in seconds and the heavy modules it imported.
+    """
+    best, heavy = None, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', _IMPORT_PROBE, path, ','.join(HEAVY_MODULES)],
+                                   cwd=REPO_ROOT, capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        heavy = json.loads(completed.stdout.strip().splitlines()[-1])
+        best = seconds if best is None else min(best, seconds)
+    return best, heavy
+
+
+def check_imports(scripts=IMPORT_CHECK_SCRIPTS, budget=DEFAULT_IMPORT_BUDGET, repeat=3):
+    """
+    Measure the start-up time of every script against the budget.
+    Returns the result records; status is 'over_budget' or 'heavy_import' on failure.
+    """
+    results = []
+    for path in scripts:
+        record = {'script': path}
+        try:
+            seconds, heavy = measure_import(path, repeat)
+        except RuntimeError as e:
+            record.update(status='error', error=str(e))
+            print(f"{'':>8}  {'error':<12}  {path}: {e}")
+            results.append(record)
+            continue
+        status = 'heavy_import' if heavy else 'over_budget' if seconds > budget else 'ok'
+        record.update(status=status, startup_s=round(seconds, 4), heavy_modules=heavy)
+        print(f"{seconds:>7.3f}s  {status:<12}  {path}{'  (' + ', '.join(heavy) + ')' if heavy else ''}")
+        results.append(record)
+    return results
+
+
+def environment():
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare wall times with a baseline run.
+    Returns the records that are slower than the baseline by more than tolerance.
+    """
+    reference = {(r['case'], r['rows']): r for r in baseline.get('results', []) if r.get('status') == 'ok'}
+    regressions = []
+    for record in results:
+        base = reference.get((record['case'], record['rows']))
+        if record.get('status') != 'ok' or base is None or not base['wall_s']:
+            continue
+        ratio = record['wall_s'] / base['wall_s']
+        record['baseline_wall_s'] = base['wall_s']
+        record['ratio'] = round(ratio, 3)
+        if ratio > 1 + tolerance and record['wall_s'] - base['wall_s'] > MIN_REGRESSION_SECONDS:
+            regressions.append(record)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark enrichment, aggregation and workbook writing.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('-k', '--cases', nargs='+', help="Only run cases whose name contains one of these")
+    parser.add_argument('--no-limits', action='store_true', help="Also run the capped cases above their max_rows")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case; the fastest is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="Write the results as JSON here")
+    parser.add_argument('--baseline', help="Compare with this results JSON")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown against the baseline (default: 0.2 = 20%%)")
+    parser.add_argument('--save-baseline', help="Store these results as the new baseline")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    parser.add_argument('--imports', action='store_true',
+                        help="Check script start-up time and heavy imports instead of running the cases")
+    parser.add_argument('--import-budget', type=float, default=DEFAULT_IMPORT_BUDGET,
+                        help="Start-up budget per script in seconds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        results = check_imports(budget=args.import_budget, repeat=args.repeat if args.repeat > 1 else 3)
+        failed = [record for record in results if record['status'] != 'ok']
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'environment': environment(), 'budget_s': args.import_budget, 'imports': results},
+                          f, indent=2)
+            print(f"Import check saved as {args.output}")
+        print(f"{len(results) - len(failed)} of {len(results)} scripts within the start-up budget")
+        return 1 if failed else 0
+
+    if args.list:
+        for case in CASES:
+            print(f"{case.name}{f'  (max_rows={case.max_rows})' if case.max_rows else ''}")
+        return 0
+
+    results = run_suite(args.sizes, args.cases, args.no_limits, args.repeat, args.seed)
+    report = {'environment': environment(), 'results': results}
+
+    exit_code = 0
+    if any(record.get('status') == 'error' for record in results):
+        exit_code = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        report['baseline'] = {'file': args.baseline, 'tolerance': args.tolerance,
+                              'regressions': [(r['case'], r['rows']) for r in regressions]}
+        for record in regressions:
+            print(f"REGRESSION {record['case']} at {record['rows']} rows: "
+                  f"{record['wall_s']:.3f}s vs {record['baseline_wall_s']:.3f}s (x{record['ratio']})")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"No regressions against {args.baseline}")
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark results saved as {path}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -4,6 +4,14 @@ from datetime import datetime
 import xlsxwriter
 import os
 from pathlib import Path
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_csv, read_excel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,9 +33,9 @@ def read_input_file(file_path):
     """Reads the input CSV or Excel file and returns the dataframe."""
     try:
         if file_path.endswith('.csv'):
-            return pd.read_csv(file_path)
+            return read_csv(file_path)
         elif file_path.endswith(('.xls', '.xlsx')):
-            return pd.read_excel(file_path)
+            return read_excel(file_path)
         else:
             raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
     except Exception as e:
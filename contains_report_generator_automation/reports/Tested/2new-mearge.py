@@ -3,13 +3,21 @@ import os
 from datetime import datetime
 import xlsxwriter
 import matplotlib.pyplot as plt
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_csv, read_excel
 
 def read_input_file(report_file):
     """Read the input file (CSV or Excel)."""
     if report_file.endswith('.csv'):
-        df = pd.read_csv(report_file)
+        df = read_csv(report_file)
     elif report_file.endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(report_file)
+        df = read_excel(report_file)
     else:
         raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
     return df
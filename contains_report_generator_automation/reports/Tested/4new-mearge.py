@@ -1,6 +1,15 @@
 import pandas as pd
 import xlsxwriter
 from datetime import datetime
+import os
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_csv, read_excel
 
 # Define service categories as before
 categories = {
@@ -15,9 +24,9 @@ categories = {
 def read_input_file(file_name):
     file_extension = file_name.split('.')[-1].lower()
     if file_extension == 'csv':
-        return pd.read_csv(file_name)
+        return read_csv(file_name)
     elif file_extension in ['xls', 'xlsx']:
-        return pd.read_excel(file_name)
+        return read_excel(file_name)
     else:
         raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
 
@@ -1,13 +1,22 @@
 import pandas as pd
 import xlsxwriter
 import matplotlib.pyplot as plt
+import os
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_csv, read_excel
 
 def read_input_file(file_name):
     """Read the input CSV or Excel file."""
     if file_name.endswith('.csv'):
-        return pd.read_csv(file_name)
+        return read_csv(file_name)
     elif file_name.endswith('.xlsx'):
-        return pd.read_excel(file_name)
+        return read_excel(file_name)
     else:
         raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
 
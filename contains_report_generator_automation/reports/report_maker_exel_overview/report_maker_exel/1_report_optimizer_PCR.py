@@ -1,10 +1,23 @@
-import pandas as pd
 import os
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_header, read_report, should_stream, stream_columns, write_report
+from run_profile import profiled
+
+def create_final_optimized_report(report_file, final_report_file, stream=None):
+    """
+    Trim the report to the standard and compliance framework columns.
+    Only those columns are parsed; stream=True (default for very large files)
+    copies them chunk by chunk in a single pass with bounded memory.
+    """
+    # Discover the available columns from the header only
+    header = read_header(report_file)
 
-def create_final_optimized_report(report_file, final_report_file):
-    # Load the report data
-    report_df = pd.read_csv(report_file)
-    
     # Standard columns that should always be included
     standard_columns = ['title', 'control_title', 'description', 'control_description', 'priority', 
                         'Recommendation Steps/Approach', 'COST', 'reason', 'resource', 'status', 
@@ -19,32 +32,49 @@ def create_final_optimized_report(report_file, final_report_file):
                           'acsc_essential_eight_ml_3', 'audit_manager_control_tower', 'aws_foundational_security']
 
     # Find additional columns that are present in the report file
-    present_additional_columns = [col for col in additional_columns if col in report_df.columns]
+    present_additional_columns = [col for col in additional_columns if col in header]
 
     # Combine the standard columns with the additional ones that are present
     final_columns = standard_columns + present_additional_columns
-    
-    # Create the final DataFrame with only the necessary columns
-    final_report_df = report_df[final_columns]
-    
-    # Save the final optimized report
-    final_report_df.to_csv(final_report_file, index=False)
+    missing_columns = [col for col in standard_columns if col not in header]
+    if missing_columns:
+        raise KeyError(f"Missing columns: {', '.join(missing_columns)}")
+
+    if stream is None:
+        stream = should_stream(report_file)
+
+    if stream:
+        # Single pass copy of the necessary columns
+        stream_columns(report_file, final_report_file, final_columns)
+    else:
+        # Load only the necessary columns (CSV, Excel, Parquet or Arrow)
+        final_report_df = read_report(report_file, columns=final_columns)
+
+        # Save the final optimized report
+        write_report(final_report_df, final_report_file)
     print(f"Final optimized report saved as {final_report_file}")
 
-def main():
+def main(report_file=None, create_report=None, output_dir=None):
+    """
+    Build the final optimized report. Arguments left as None are asked for interactively.
+    Returns the path of the saved report, or None when nothing was written.
+    """
     # Ask the user to input the report file name
-    report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
+    if report_file is None:
+        report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
     
     # Set the output path to the reports directory
-    reports_directory = os.path.dirname(os.path.abspath(__file__))  # Get the current script's directory
+    reports_directory = output_dir or os.path.dirname(os.path.abspath(__file__))  # Defaults to the script's directory
     final_report_file = os.path.join(reports_directory, 'aws_compliance_benchmark_all_controls_benchmark_final_optimized_report.csv')
 
     # Ask if the user wants to create the final report
-    create_report = input("Do you want to create the final optimized report? (yes/no): ").strip().lower()
-    if create_report == 'yes':
+    if create_report is None:
+        create_report = input("Do you want to create the final optimized report? (yes/no): ").strip().lower() == 'yes'
+    if create_report:
         create_final_optimized_report(report_file, final_report_file)
-    else:
-        print("Final report creation skipped.")
+        return final_report_file
+    print("Final report creation skipped.")
+    return None
 
 if __name__ == "__main__":
-    main()
+    profiled(main)()
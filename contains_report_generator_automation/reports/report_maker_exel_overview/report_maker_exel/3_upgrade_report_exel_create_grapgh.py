@@ -1,29 +1,25 @@
-import pandas as pd
 import os
 from datetime import datetime
-import xlsxwriter
-
-# Define service categories as before
-categories = {
-    'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
-    'Compute': ['Auto Scaling', 'EC2', 'ECS', 'EKS', 'Lambda', 'EMR', 'Step Functions'],
-    'Storage': ['EBS', 'ECR', 'S3', 'DLM', 'Backup'],
-    'Network': ['API Gateway', 'CloudFront', 'Route 53', 'VPC', 'ELB', 'ElasticCache', 'CloudTrail'],
-    'Database': ['RDS', 'DynamoDB', 'Athena', 'Glue'],
-    'Other': ['CloudFormation', 'CodeDeploy', 'Config', 'SNS', 'SQS', 'WorkSpaces', 'EventBridge', 'Config']
-}
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from report_io import read_report
+from run_profile import profiled
+from service_categories import partition
+
 
 # Map numerical priorities to words
 priority_map = {1: "High", 2: "Medium", 3: "Low"}
 
 def create_simplified_report_with_pivot(report_file, final_report_file):
-    # Read input report file (CSV or Excel)
-    if report_file.endswith('.csv'):
-        df = pd.read_csv(report_file)
-    elif report_file.endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(report_file)
-    else:
-        raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
+    import pandas as pd
+
+    # Read input report file (CSV, Excel, Parquet or Arrow)
+    df = read_report(report_file)
     
     # Ensure columns exist
     required_columns = ['status', 'priority', 'title', 'control_title', 'control_description']
@@ -60,8 +56,7 @@ def create_simplified_report_with_pivot(report_file, final_report_file):
         sr_no = 1
         
         # Process each service and leave a one-line gap after each service
-        for service in categories.keys():
-            service_df = df[df['title'].isin(categories[service])]
+        for service, service_df in partition(df).items():
             
             # Group by Control Title and sum Open Issues per title
             service_grouped = service_df.groupby(
@@ -184,28 +179,39 @@ def create_simplified_report_with_pivot(report_file, final_report_file):
             worksheet_safe_controls.write(row_num, 5, row[5], light_green_format)
 
 # Main method to execute script
-def main():
+def main(report_file=None, create_report=None, output_dir=None):
+    """
+    Build the simplified workbook with pivot tables and charts.
+    Arguments left as None are asked for interactively.
+    Returns the path of the saved workbook, or None when nothing was written.
+    """
     # Prompt for the report file name
-    report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
+    if report_file is None:
+        report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
 
     if not os.path.exists(report_file):
         print(f"Error: The file '{report_file}' does not exist.")
-        return
+        return None
 
     # Ask if the user wants to create the simplified report
-    create_report = input("Do you want to create the simplified report with pivot table? (yes/no): ").strip().lower()
+    if create_report is None:
+        create_report = input("Do you want to create the simplified report with pivot table? (yes/no): ").strip().lower() == 'yes'
 
-    if create_report == 'yes':
+    if create_report:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         final_report_file = f"{os.path.splitext(report_file)[0]}_simplified_report_with_pivot_{timestamp}.xlsx"
+        if output_dir:
+            final_report_file = os.path.join(output_dir, os.path.basename(final_report_file))
 
         try:
             create_simplified_report_with_pivot(report_file, final_report_file)
             print(f"Final report with pivot table and charts saved as {final_report_file}")
+            return final_report_file
         except Exception as e:
             print(f"An error occurred: {e}")
     else:
         print("Report creation skipped.")
+    return None
 
 if __name__ == "__main__":
-    main()
+    profiled(main)()
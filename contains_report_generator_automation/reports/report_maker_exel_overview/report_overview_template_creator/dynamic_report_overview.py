@@ -1,46 +1,150 @@
-from docx import Document
+import os
+import sys
 from datetime import datetime
 
-def create_report_overview_template(output_file):
-    # Get client name from user input
-    client_name = input("Enter the client name: ").strip()
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from docx_template import format_value, load_template
+from report_io import XLSX_CACHE_DIR, file_hash
+from run_profile import profiled
+from report_summary import load_summary
+from service_categories import CATEGORIES
+
+TEMPLATE_DIR = os.path.join(XLSX_CACHE_DIR, 'docx_templates')
+
+# Data tables of the overview: name -> (header, row fields)
+OVERVIEW_TABLES = {
+    'categories': (["S.No", "Category", "Services", "Controls", "Open Issues"],
+                   ['sno', 'category', 'services', 'controls', 'open_issues']),
+    'priorities': (["Priority", "Titles", "Open Issues"], ['priority', 'titles', 'open_issues']),
+    'controls': (["S.No", "Service", "Control Title", "Open Issues", "Priority"],
+                 ['sno', 'service', 'control_title', 'open_issues', 'priority']),
+    'category_issues': (["Category", "Open Issues"], ['category', 'open_issues']),
+    'services': (["S.No", "Service", "Open Issues", "By Priority"], ['sno', 'service', 'open_issues', 'by_priority']),
+}
+
+
+def add_toc(doc):
+    """
+    Insert a table of contents field over the section headings. Word fills
+    in the entries and page numbers when the document is opened.
+    """
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    paragraph = doc.add_paragraph()
+    run = paragraph.add_run()
+    for tag, attrs, text in [('w:fldChar', {'w:fldCharType': 'begin'}, None),
+                             ('w:instrText', {'xml:space': 'preserve'}, 'TOC \\o "2-2" \\h \\z \\u'),
+                             ('w:fldChar', {'w:fldCharType': 'separate'}, None),
+                             ('w:t', {}, "Right-click and choose Update Field to build the index."),
+                             ('w:fldChar', {'w:fldCharType': 'end'}, None)]:
+        element = OxmlElement(tag)
+        for name, value in attrs.items():
+            element.set(qn(name), value)
+        if text:
+            element.text = text
+        run._r.append(element)
+
+    # Ask Word to refresh fields on open, so the page numbers are filled without user action
+    update_fields = OxmlElement('w:updateFields')
+    update_fields.set(qn('w:val'), 'true')
+    doc.settings.element.append(update_fields)
+
+
+def add_table(doc, header, rows):
+    """
+    Append a grid table with a header row and one row per item of rows
+    """
+    table = doc.add_table(rows=1 + len(rows), cols=len(header))
+    table.style = "Table Grid"
+    for col, text in enumerate(header):
+        table.cell(0, col).text = str(text)
+    for row_index, row in enumerate(rows, start=1):
+        for col, value in enumerate(row):
+            table.cell(row_index, col).text = format_value(value)
+    return table
+
+
+def priority_sentence(priority_counts):
+    """
+    'The Total Count of Titles is 1,554 for priority level 1, ... resulting in a Grand Total of 6,729.'
+    """
+    parts = [f"{count:,} for priority level {label}" for label, count in priority_counts.items()]
+    if len(parts) > 1:
+        parts[-2:] = [f"{parts[-2]}{',' if len(parts) > 2 else ''} and {parts[-1]}"]
+    return (f"The Total Count of Titles is {', '.join(parts)}, "
+            f"resulting in a Grand Total of {sum(priority_counts.values()):,}.")
+
+
+def overview_fields(client_name, summary=None):
+    """
+    Text values and table rows of the overview for one client.
+
+    Returns:
+        tuple: (values dict, tables dict of row lists, or None without a summary)
+    """
     report_name = f"AWS {client_name} Report"
-    
-    # Get the current date
-    today_date = datetime.now().strftime('%A, %dth %B %Y')
+    values = {
+        'client': client_name,
+        'report_name': report_name,
+        'report_date': datetime.now().strftime('%A, %dth %B %Y'),
+    }
+    if not summary:
+        return values, None
+
+    values['priority_sentence'] = priority_sentence(summary['priority_counts'])
+    values['controls_listed'] = len(summary['top_controls'])
+    tables = {
+        'categories': [dict(row, sno=i) for i, row in enumerate(summary['categories'], start=1)],
+        'priorities': [{'priority': label, 'titles': count,
+                        'open_issues': summary['open_by_priority'].get(label, 0)}
+                       for label, count in summary['priority_counts'].items()]
+                      + [{'priority': "Grand Total", 'titles': summary['rows'], 'open_issues': summary['open_issues']}],
+        'controls': [dict(row, sno=i) for i, row in enumerate(summary['top_controls'], start=1)],
+        'category_issues': [{'category': row['category'], 'open_issues': row['open_issues']}
+                            for row in summary['categories']]
+                           + [{'category': "Total", 'open_issues': summary['open_issues']}],
+        'services': [{'sno': i, 'service': row['service'], 'open_issues': row['open_issues'],
+                      'by_priority': ', '.join(f"Priority {label}: {count:,}"
+                                               for label, count in row['by_priority'].items())}
+                     for i, row in enumerate(summary['top_services'], start=1)],
+    }
+    return values, tables
+
+
+def build_document(values, tables=None):
+    """
+    Lay out the overview with python-docx. Without tables the data sections
+    are left as placeholders for the user to fill in.
+    """
+    from docx import Document
 
     # Initialize the document
     doc = Document()
 
+    def data_table(name):
+        header, fields = OVERVIEW_TABLES[name]
+        add_table(doc, header, [[row[field] for field in fields] for row in tables[name]])
+
     # Add the report title
-    doc.add_heading(report_name, level=1)
+    doc.add_heading(values['report_name'], level=1)
 
     # Add client and report details
-    doc.add_paragraph(f"- Client: {client_name}")
-    doc.add_paragraph(f"- Report Name: {report_name}")
-    doc.add_paragraph(f"- Report Date: {today_date}")
+    doc.add_paragraph(f"- Client: {values['client']}")
+    doc.add_paragraph(f"- Report Name: {values['report_name']}")
+    doc.add_paragraph(f"- Report Date: {values['report_date']}")
     doc.add_paragraph("- Report Version: Version 1.0")
 
     # Add a section break
     doc.add_paragraph("\n")
 
-    # Add index section
+    # Add index section; the entries and page numbers come from a TOC field
     doc.add_heading("Index:", level=2)
-    table = doc.add_table(rows=6, cols=2)
-    table.style = "Table Grid"
-    table.cell(0, 0).text = "Title"
-    table.cell(0, 1).text = "Page No"
-    table.cell(1, 0).text = "Overview"
-    table.cell(1, 1).text = "03"
-    table.cell(2, 0).text = "LINK OF DETAILED REPORT"
-    table.cell(2, 1).text = "04"
-    table.cell(3, 0).text = "AWS Compliance Control Summary"
-    table.cell(3, 1).text = "06"
-    table.cell(4, 0).text = "Open Issues Chart"
-    table.cell(4, 1).text = "47"
-    table.cell(5, 0).text = "Top services severity"
-    table.cell(5, 1).text = "48"
-    doc.add_paragraph("(Page numbers to be filled by the user)")
+    add_toc(doc)
 
     # Add the Overview section
     doc.add_heading("Overview:", level=2)
@@ -60,28 +164,13 @@ def create_report_overview_template(output_file):
     doc.add_heading("LINK OF DETAILED REPORT:", level=2)
     doc.add_paragraph("[Add the link here]")
 
-    # Add the Key Components table
+    # Add the Key Components table: the category sheets, with their counts when known
     doc.add_heading("Key Components:", level=2)
-    components_table = doc.add_table(rows=9, cols=2)
-    components_table.style = "Table Grid"
-    components_table.cell(0, 0).text = "S.No"
-    components_table.cell(0, 1).text = "Category"
-    components_table.cell(1, 0).text = "1"
-    components_table.cell(1, 1).text = "Sheet Name"
-    components_table.cell(2, 0).text = ""
-    components_table.cell(2, 1).text = "Compute Services"
-    components_table.cell(3, 0).text = ""
-    components_table.cell(3, 1).text = "Compute"
-    components_table.cell(4, 0).text = ""
-    components_table.cell(4, 1).text = "Storage Services"
-    components_table.cell(5, 0).text = ""
-    components_table.cell(5, 1).text = "Storage"
-    components_table.cell(6, 0).text = ""
-    components_table.cell(6, 1).text = "Network Services"
-    components_table.cell(7, 0).text = ""
-    components_table.cell(7, 1).text = "Database Services"
-    components_table.cell(8, 0).text = ""
-    components_table.cell(8, 1).text = "Security Services"
+    if tables:
+        data_table('categories')
+    else:
+        add_table(doc, ["S.No", "Category"],
+                  [(i, f"{category} Services") for i, category in enumerate(CATEGORIES, start=1)])
 
     # Add the AWS Compliance Control Summary
     doc.add_heading("AWS Compliance Control Summary", level=2)
@@ -90,23 +179,80 @@ def create_report_overview_template(output_file):
         "It includes descriptions, open issues, and priority levels to ensure security and operational efficiency. "
         "Refer to the attached Excel sheet for details."
     )
+    if tables:
+        data_table('priorities')
+        doc.add_paragraph(values['priority_sentence'])
+        doc.add_paragraph(f"Controls with the most open issues ({values['controls_listed']} listed):")
+        data_table('controls')
+    else:
+        doc.add_paragraph("[Insert table with compliance controls here]")
 
-    # Add placeholders for user inputs (e.g., tables and summary details)
-    doc.add_paragraph("[Insert table with compliance controls here]")
-    doc.add_paragraph(
-        "The Total Count of Titles is 1,554 for priority level 1, 3,328 for priority level 2, "
-        "and 1,847 for priority level 3, resulting in a Grand Total of 6,729."
-    )
+    # Add the open issue breakdowns
+    doc.add_heading("Open Issues by Category", level=2)
+    if tables:
+        data_table('category_issues')
+    else:
+        doc.add_paragraph("[Insert open issues chart here]")
+
+    doc.add_heading("Top services severity", level=2)
+    if tables:
+        data_table('services')
+    else:
+        doc.add_paragraph("[Insert top services table here]")
 
     # Add Synopsis section
     doc.add_heading("SYNOPSIS:", level=2)
     doc.add_paragraph("[Add synopsis here]")
+    return doc
+
+
+def overview_template():
+    """
+    Path of the pre-built overview template: the layout with {{field}} markers
+    and one prototype row per data table. Built once and cached, keyed by
+    this script's contents so a layout change builds a new template.
+    """
+    path = os.path.join(TEMPLATE_DIR, f"overview_{file_hash(os.path.abspath(__file__))[:16]}.docx")
+    if not os.path.exists(path):
+        values = {name: f"{{{{{name}}}}}" for name in
+                  ('client', 'report_name', 'report_date', 'priority_sentence', 'controls_listed')}
+        tables = {name: [{field: f"{{{{{name}.{field}}}}}" for field in fields}]
+                  for name, (_, fields) in OVERVIEW_TABLES.items()}
+        os.makedirs(TEMPLATE_DIR, exist_ok=True)
+        # Write to a temporary name first so a concurrent process never loads a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        build_document(values, tables).save(tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def create_report_overview_template(output_file, client_name=None, summary=None, summary_file=None):
+    """
+    Write the report overview document. The client name is asked for when not given.
+
+    The statistics come from summary (a report_summary.summarize_report result)
+    or summary_file (a _summary.json written by the analyse stage, or a report
+    to summarize). With statistics the document is a fill of the cached
+    template; without, the data sections are left as placeholders.
+    Returns the path of the saved document.
+    """
+    # Get client name from user input
+    if client_name is None:
+        client_name = input("Enter the client name: ").strip()
+    if summary is None and summary_file:
+        summary = load_summary(summary_file)
 
-    # Save the document
-    doc.save(output_file)
+    values, tables = overview_fields(client_name, summary)
+    if tables is None:
+        build_document(values).save(output_file)
+    else:
+        load_template(overview_template()).save(output_file, values, tables)
     print(f"Report overview template saved as {output_file}")
+    return output_file
 
 
 if __name__ == "__main__":
     output_file = "AWS_Report_Overview_Template.docx"
-    create_report_overview_template(output_file)
+    # Optional: a _summary.json from the analyse stage, or a report to take the statistics from
+    summary_file = sys.argv[1] if len(sys.argv) > 1 else None
+    profiled(create_report_overview_template)(output_file, summary_file=summary_file)
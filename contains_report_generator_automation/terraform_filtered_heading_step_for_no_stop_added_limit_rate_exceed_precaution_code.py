@@ -1,11 +1,18 @@
 import os
-import shutil
-import pandas as pd
-import openai
 import time  # Import the time module for adding delays
+import sys
+
+# Shared pipeline modules (report_io, ...) live at the repository root, the nearest folder up with script_loader.py
+_root = os.path.dirname(os.path.abspath(__file__))
+while not os.path.exists(os.path.join(_root, 'script_loader.py')) and os.path.dirname(_root) != _root:
+    _root = os.path.dirname(_root)
+sys.path.insert(0, _root)
+from priority_splitter import split_by_priority
+from report_io import read_csv
+from run_profile import profiled
 
 # Set your OpenAI API key directly
-openai.api_key = "add key"
+OPENAI_API_KEY = "add key"
 
 def generate_recommendation(title, control_title, control_description):
     """
@@ -32,6 +39,9 @@ def generate_recommendation(title, control_title, control_description):
     3. [Additional detailed steps, if necessary, to fully implement the recommendation]
     # REF: [accurate link or "Closest Reference Link: <link>"]
     """
+    import openai
+
+    openai.api_key = OPENAI_API_KEY
     try:
         response = openai.ChatCompletion.create(
             model="gpt-4",
@@ -71,6 +81,9 @@ def generate_terraform_script(title, control_title, control_description):
     }}
     ```
     """
+    import openai
+
+    openai.api_key = OPENAI_API_KEY
     try:
         response = openai.ChatCompletion.create(
             model="gpt-4",
@@ -91,8 +104,10 @@ def save_progress(report_df, filename):
     print(f"Progress saved to {filename}")
 
 def main(report_file):
+    import pandas as pd
+
     # Load report data
-    report_df = pd.read_csv(report_file)
+    report_df = read_csv(report_file)
 
     # Initialize new columns for priorities, recommendations, cost, and Terraform script
     if 'priority' not in report_df.columns:
@@ -158,24 +173,15 @@ def main(report_file):
         create_priority_files(report_df, updated_report_file)
 
 def create_priority_files(report_df, report_file):
-    """Create separate files for each priority level."""
-    reports_folder = 'reports'
-    os.makedirs(reports_folder, exist_ok=True)
-    
+    """Create separate files for each priority level in the reports folder."""
     # Map numeric priority to text labels
     priority_mapping = {1: "High", 2: "Medium", 3: "Low"}
     report_df['priority'] = report_df['priority'].map(priority_mapping)
-    
-    # Create separate files for each priority
-    for priority, label in priority_mapping.items():
-        priority_df = report_df[report_df['priority'] == label]
-        if not priority_df.empty:
-            new_file_name = f"{report_file.split('.')[0]}_priority_{label}.csv"
-            priority_df.to_csv(new_file_name, index=False)
-            print(f"Created file: {new_file_name}")
-            shutil.move(new_file_name, os.path.join(reports_folder, new_file_name))
-            print(f"Moved file to: {os.path.join(reports_folder, new_file_name)}")
+
+    # Create separate files for each priority, written straight into the folder
+    base_name = os.path.splitext(os.path.basename(report_file))[0]
+    return split_by_priority(report_df, 'reports', base_name, priorities=tuple(priority_mapping.values()))
 
 if __name__ == "__main__":
     report_file = input("Enter the report file name: ").strip()
-    main(report_file)
+    profiled(main)(report_file)
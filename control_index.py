@@ -0,0 +1,176 @@
+"""
+Normalized control_title index for joining scan rows to annotations.
+
+Powerpipe exports and the annotation workbooks drift apart in small ways:
+trailing spaces, doubled spaces, case, a missing full stop. An exact string
+comparison treats those as different controls and the row ends up with no
+priority. The index keys both sides by a normalized form of the title
+(casefolded, punctuation dropped, whitespace collapsed), is built once per
+annotations table and is applied to a whole column with one map:
+
+    index = ControlIndex.for_annotations(df_priority)
+    matched, found = index.match(df['control_title'], ['priority', 'Recommendation Steps/Approach'])
+
+Titles that still do not match can optionally be matched by character
+trigram similarity. Candidates are found through a trigram -> title
+inverted index, so only annotations that share trigrams with the title are
+scored. Enable it with fuzzy=True or REPORT_FUZZY_MATCH=1.
+"""
+import os
+import re
+import weakref
+from collections import Counter, defaultdict
+
+FUZZY_MATCH = os.environ.get('REPORT_FUZZY_MATCH', '0') == '1'
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy match
+FUZZY_THRESHOLD = float(os.environ.get('REPORT_FUZZY_THRESHOLD', 0.85))
+NGRAM_SIZE = 3
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_key(title):
+    """
+    Normalized form of one control title: casefolded, punctuation and
+    underscores replaced by spaces, runs of whitespace collapsed.
+    """
+    if not isinstance(title, str):
+        return ''
+    return _NON_WORD.sub(' ', title.casefold()).strip()
+
+
+def normalize_keys(titles):
+    """
+    normalize_key over a Series, vectorized
+    """
+    return (titles.fillna('').astype(str).str.casefold()
+            .str.replace(_NON_WORD, ' ', regex=True).str.strip())
+
+
+def ngrams(key, size=NGRAM_SIZE):
+    """
+    Character n-grams of a key, padded so the first and last words count too
+    """
+    padded = f" {key} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+class ControlIndex:
+    """
+    Normalized key -> row lookup over one annotations table.
+
+    Args:
+        annotations (pd.DataFrame): Annotations with a control_title column
+        column (str): Column holding the control titles
+        fuzzy (bool, optional): Try trigram matching for titles without an exact
+            normalized match; defaults to REPORT_FUZZY_MATCH
+        threshold (float): Minimum trigram similarity for a fuzzy match
+    """
+
+    # Indexes built by for_annotations, by id() of the annotations DataFrame
+    _cache = {}
+
+    def __init__(self, annotations, column='control_title', fuzzy=None, threshold=FUZZY_THRESHOLD):
+        import pandas as pd
+
+        self.annotations = annotations.reset_index(drop=True)
+        self.fuzzy = FUZZY_MATCH if fuzzy is None else fuzzy
+        self.threshold = threshold
+
+        # The first row wins when several titles normalize to the same key,
+        # as the row-by-row lookup it replaces took the first match
+        keys = normalize_keys(self.annotations[column]) if column in self.annotations.columns \
+            else pd.Series([], dtype=str)
+        keys = keys[keys != '']
+        first = ~keys.duplicated()
+        self.positions = pd.Series(keys.index[first.to_numpy()], index=keys[first].to_numpy())
+        self._grams = None
+        self.stats = {}
+
+    @classmethod
+    def for_annotations(cls, annotations, column='control_title', fuzzy=None):
+        """
+        Index for an annotations DataFrame, built on first use and reused while
+        the DataFrame is alive (e.g. the report daemon's cached annotations).
+        """
+        fuzzy = FUZZY_MATCH if fuzzy is None else fuzzy
+        key = (id(annotations), column, fuzzy)
+        index = cls._cache.get(key)
+        if index is None:
+            index = cls._cache[key] = cls(annotations, column, fuzzy)
+            weakref.finalize(annotations, cls._cache.pop, key, None)
+        return index
+
+    def _gram_index(self):
+        # Built on the first fuzzy lookup and published in one assignment,
+        # so concurrent daemon requests never see a half-built index
+        if self._grams is None:
+            grams_by_key = [ngrams(key) for key in self.positions.index]
+            gram_index = defaultdict(list)
+            for key_id, grams in enumerate(grams_by_key):
+                for gram in grams:
+                    gram_index[gram].append(key_id)
+            self._grams = (dict(gram_index), [len(grams) for grams in grams_by_key])
+        return self._grams
+
+    def fuzzy_position(self, key):
+        """
+        Annotation row of the most similar title, or -1 when none reaches the threshold
+        """
+        grams = ngrams(key)
+        gram_index, gram_counts = self._gram_index()
+
+        # Only titles sharing at least one trigram are candidates
+        shared = Counter()
+        for gram in grams:
+            shared.update(gram_index.get(gram, ()))
+
+        best_id, best_score = -1, self.threshold
+        for key_id, count in shared.items():
+            score = 2 * count / (len(grams) + gram_counts[key_id])
+            if score >= best_score:
+                best_id, best_score = key_id, score
+        return -1 if best_id < 0 else int(self.positions.iloc[best_id])
+
+    def lookup(self, titles):
+        """
+        Annotation row position for each title, -1 where nothing matched.
+        Returns an integer Series aligned to titles.
+        """
+        keys = normalize_keys(titles)
+        positions = keys.map(self.positions)
+        exact = int(positions.notna().sum())
+
+        fuzzy = 0
+        if self.fuzzy and exact < len(keys):
+            # Score each distinct unmatched title once
+            missing = keys[positions.isna() & (keys != '')].unique()
+            found = {key: self.fuzzy_position(key) for key in missing}
+            found = {key: position for key, position in found.items() if position >= 0}
+            if found:
+                positions = positions.fillna(keys.map(found))
+                fuzzy = len(keys) - exact - int(positions.isna().sum())
+
+        self.stats = {'rows': len(keys), 'exact': exact, 'fuzzy': fuzzy,
+                      'unmatched': len(keys) - exact - fuzzy}
+        return positions.fillna(-1).astype(int)
+
+    def match(self, titles, columns):
+        """
+        Annotation columns for each title, aligned to titles.
+
+        Returns:
+            tuple: (DataFrame of the requested columns, NaN where unmatched;
+                    boolean Series that is True where a title matched)
+        """
+        positions = self.lookup(titles)
+        found = positions >= 0
+        matched = self.annotations.reindex(columns=columns).reindex(positions.to_numpy())
+        matched.index = titles.index
+        for column in matched.columns:
+            # Dictionary encoded store columns arrive as categoricals; callers
+            # write their own labels into the result, so hand back plain values
+            if matched[column].dtype == 'category':
+                matched[column] = matched[column].astype(matched[column].cat.categories.dtype)
+        return matched, found
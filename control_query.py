@@ -0,0 +1,244 @@
+"""
+In-memory query engine over the control priority lists.
+
+The priority filter tools read and clean the whole CSV again for every
+query. ControlCatalog loads centralfile.csv / input_file_priority.csv once,
+strips the text columns once, and keeps two indexes: priority -> rows and
+service (title) -> rows. A query intersects the index entries it needs and
+only then runs a text search on the remaining rows, so repeated queries in
+one session are answered from memory.
+
+    catalog = load_catalog('centralfile.csv')
+    catalog.query(priority=1, service='EC2', text='encrypt')
+
+    python control_query.py                                 # interactive, both default files
+    python control_query.py centralfile.csv -p 1 -s S3      # one query
+    python control_query.py --text "public access" --columns title control_title priority
+
+Interactive queries are key=value pairs, anything else is search text:
+
+    > p=1 s=EC2 encrypt
+    > service=S3 service=EBS
+    > services
+"""
+import argparse
+import os
+import shlex
+import sys
+import threading
+
+from report_io import read_csv
+from run_profile import profiled
+from table_render import render_table
+
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contains_report_generator_automation',
+                           'optimizer_locked', 'priority_seperater_file_tool')
+DEFAULT_FILES = [os.path.join(CATALOG_DIR, 'centralfile.csv'),
+                 os.path.join(CATALOG_DIR, 'input_file_priority.csv')]
+
+# Columns the filter tools strip before comparing
+STRIPPED_COLUMNS = ['title', 'control_title', 'priority']
+# Columns searched by text queries
+SEARCH_COLUMNS = ['title', 'control_title', 'Recommendation Steps/Approach']
+DEFAULT_COLUMNS = ['title', 'control_title', 'priority']
+
+
+def priority_key(priority):
+    """
+    Index key for a priority given as 1, '1', 'p1' or ' P1 '
+    """
+    key = str(priority).strip().lower()
+    return key if key.startswith('p') else f"p{key}"
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+class ControlCatalog:
+    """
+    One or more priority list CSVs, cleaned and indexed once.
+
+    Args:
+        paths (list): CSV files; with more than one, a 'source' column names the file of each row
+    """
+
+    def __init__(self, paths):
+        import pandas as pd
+
+        paths = _as_list(paths)
+        frames = []
+        for path in paths:
+            df = read_csv(path)
+            if len(paths) > 1:
+                df['source'] = os.path.basename(path)
+            frames.append(df)
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+
+        # Clean up whitespace once, instead of on every query
+        for column in STRIPPED_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].str.strip()
+        self.df = df
+        self.paths = paths
+
+        self.by_priority = self._index(df['priority'].str.lower()) if 'priority' in df.columns else {}
+        self.by_service = self._index(df['title'].str.casefold()) if 'title' in df.columns else {}
+
+        search_columns = [column for column in SEARCH_COLUMNS if column in df.columns]
+        search = df[search_columns[0]].fillna('') if search_columns else pd.Series('', index=df.index)
+        for column in search_columns[1:]:
+            search = search + ' ' + df[column].fillna('')
+        self._search = search.str.casefold()
+
+    @staticmethod
+    def _index(keys):
+        """
+        key -> sorted row positions, in one groupby pass
+        """
+        return {key: positions for key, positions in keys.groupby(keys, sort=False).indices.items()}
+
+    def _positions(self, index, keys):
+        import numpy as np
+
+        found = [index[key] for key in keys if key in index]
+        return np.unique(np.concatenate(found)) if found else np.array([], dtype=int)
+
+    def query(self, priority=None, service=None, text=None, columns=None, limit=None):
+        """
+        Rows matching every given filter, in file order.
+
+        Args:
+            priority: 1/'1'/'p1', or a list of them
+            service: Service title (case-insensitive), or a list of titles
+            text (str): Case-insensitive substring searched in the title, control title
+                and recommendation
+            columns (list, optional): Only these columns
+            limit (int, optional): At most this many rows
+
+        Returns:
+            pd.DataFrame: The matching rows
+        """
+        import numpy as np
+
+        positions = None
+        if priority is not None:
+            positions = self._positions(self.by_priority, [priority_key(p) for p in _as_list(priority)])
+        if service is not None:
+            matched = self._positions(self.by_service, [str(s).strip().casefold() for s in _as_list(service)])
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+        if text:
+            search = self._search if positions is None else self._search.iloc[positions]
+            hits = search.str.contains(text.casefold(), regex=False).to_numpy()
+            positions = np.flatnonzero(hits) if positions is None else positions[hits]
+
+        result = self.df if positions is None else self.df.iloc[positions]
+        if columns:
+            result = result[[column for column in columns if column in result.columns]]
+        return result if limit is None else result.head(limit)
+
+    def priorities(self):
+        return sorted(self.by_priority)
+
+    def services(self):
+        """
+        Service titles with their row counts
+        """
+        counts = self.df['title'].value_counts(sort=False) if 'title' in self.df.columns else {}
+        return dict(sorted(counts.items()))
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def load_catalog(paths=None):
+    """
+    Catalog for the given CSV files (the two default lists when omitted), built
+    once per process and rebuilt only when one of the files changes.
+    """
+    paths = tuple(os.path.abspath(path) for path in _as_list(paths or DEFAULT_FILES))
+    mtimes = tuple(os.path.getmtime(path) for path in paths)
+    with _catalogs_lock:
+        entry = _catalogs.get(paths)
+        if entry is None or entry[0] != mtimes:
+            entry = _catalogs[paths] = (mtimes, ControlCatalog(list(paths)))
+    return entry[1]
+
+
+def parse_query(line):
+    """
+    Turn 'p=1 s=EC2 encrypt at rest' into query() keyword arguments
+    """
+    keys = {'p': 'priority', 'priority': 'priority', 's': 'service', 'service': 'service',
+            't': 'text', 'text': 'text'}
+    query, words = {}, []
+    for token in shlex.split(line):
+        name, sep, value = token.partition('=')
+        if sep and name.lower() in keys:
+            field = keys[name.lower()]
+            if field == 'text':
+                words.append(value)
+            else:
+                query.setdefault(field, []).append(value)
+        else:
+            words.append(token)
+    if words:
+        query['text'] = ' '.join(words)
+    return query
+
+
+def print_rows(df, columns=DEFAULT_COLUMNS):
+    shown = render_table(df, columns)
+    print(f"{len(df)} row(s)" if shown == len(df) else f"{shown} of {len(df)} row(s)")
+
+
+def interactive(catalog, columns=DEFAULT_COLUMNS):
+    """
+    Answer queries typed at a prompt until 'quit' or end of input
+    """
+    print(f"{len(catalog.df)} controls loaded from {', '.join(os.path.basename(p) for p in catalog.paths)}. "
+          f"Query with p=<priority> s=<service> <text>; 'services', 'priorities' or 'quit'.")
+    while True:
+        try:
+            line = input('> ').strip()
+        except EOFError:
+            break
+        if not line:
+            continue
+        if line in ('quit', 'exit', 'q'):
+            break
+        if line == 'services':
+            for service, count in catalog.services().items():
+                print(f"{count:6d}  {service}")
+            continue
+        if line == 'priorities':
+            print(', '.join(catalog.priorities()))
+            continue
+        try:
+            print_rows(catalog.query(**parse_query(line)), columns)
+        except ValueError as e:
+            print(f"Invalid query: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the control priority lists from memory.")
+    parser.add_argument('files', nargs='*', help="Priority list CSVs (default: centralfile.csv and input_file_priority.csv)")
+    parser.add_argument('-p', '--priority', nargs='+')
+    parser.add_argument('-s', '--service', nargs='+')
+    parser.add_argument('-t', '--text')
+    parser.add_argument('--columns', nargs='+', default=DEFAULT_COLUMNS)
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog(args.files or None)
+    if args.priority is None and args.service is None and args.text is None:
+        interactive(catalog, args.columns)
+        return 0
+
+    print_rows(catalog.query(args.priority, args.service, args.text, limit=args.limit), args.columns)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -1,89 +1,60 @@
-import pandas as pd
 import os
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-
-# Define color fills for Excel
-color_fills = {
-    "red": PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid"),
-    "green": PatternFill(start_color="00FF00", end_color="00FF00", fill_type="solid"),
-    "orange": PatternFill(start_color="FFA500", end_color="FFA500", fill_type="solid"),
-    "yellow": PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid"),
-    "white": PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-}
-
-# Define service categories
-categories = {
-    'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
-    'Compute': ['Auto Scaling', 'EC2', 'ECS', 'EKS', 'Lambda', 'EMR', 'Step Functions'],
-    'Storage': ['EBS', 'ECR', 'S3', 'DLM', 'Backup'],
-    'Network': ['API Gateway', 'CloudFront', 'Route 53', 'VPC', 'ELB', 'ElasticCache', 'CloudTrail'],
-    'Database': ['RDS', 'DynamoDB', 'Athena', 'Glue'],
-    'Other': ['CloudFormation', 'CodeDeploy', 'Config', 'SNS', 'SQS', 'WorkSpaces', 'EventBridge', 'Config']
-}
+from annotation_store import load_annotations
+from control_index import ControlIndex
+from report_io import is_columnar, read_columnar, read_csv, read_excel, read_report, write_columnar
+from run_profile import RunProfile, profiled
+from service_categories import partition
+
+# Cell colour per annotated priority
+PRIORITY_COLORS = {"High": "red", "Medium": "orange", "Low": "yellow"}
 
 def load_input_file(input_file):
     """
     Load input file (CSV or Excel) with error handling
     """
     try:
-        if input_file.endswith(".csv"):
-            return pd.read_csv(input_file, low_memory=False)
+        if is_columnar(input_file):
+            return read_columnar(input_file)
+        elif input_file.endswith(".csv"):
+            return read_csv(input_file)
         elif input_file.endswith((".xlsx", ".xls")):
-            return pd.read_excel(input_file, engine='openpyxl')
+            return read_excel(input_file)
         else:
-            raise ValueError("Unsupported file type. Please use CSV or Excel files.")
+            raise ValueError("Unsupported file type. Please use CSV, Excel, Parquet or Arrow files.")
     except Exception as e:
         print(f"Error loading input file: {e}")
         raise
 
 def load_priority_database(priority_file="PowerPipeControls_Annotations.xlsx"):
     """
-    Load priority database with error handling
+    Load priority database with error handling. It is read through the
+    memory-mapped annotation store, so worker processes share one copy.
     """
     try:
-        return pd.read_excel(priority_file)
+        return load_annotations(priority_file)
     except Exception as e:
         print(f"Error loading priority database: {e}")
         raise
 
-def update_priority_and_recommendation(df_input, df_priority):
+def update_priority_and_recommendation(df_input, df_priority, fuzzy=None):
     """
-    Update input DataFrame with priority and recommendations from database
+    Update input DataFrame with priority and recommendations from database.
+    Titles are matched on their normalized form through a ControlIndex built once
+    per priority database; fuzzy enables the trigram fallback (default REPORT_FUZZY_MATCH).
     """
-    for idx, row in df_input.iterrows():
-        control_title = row.get("control_title", "")
-        status = row.get("status", "")
-
-        # Search for the control_title in the priority database
-        matching_row = df_priority[df_priority["control_title"] == control_title]
-
-        if not matching_row.empty:
-            priority = matching_row.iloc[0]["priority"]
-            recommendation = matching_row.iloc[0]["Recommendation Steps/Approach"]
-
-            # Assign priority and recommendation
-            if status in ["ok", "info", "skip"]:
-                df_input.at[idx, "priority"] = "Safe/Well Architected"
-                df_input.at[idx, "Recommendation Steps/Approach"] = recommendation
-                df_input.at[idx, "priority_color"] = "green"
-            else:
-                df_input.at[idx, "priority"] = priority
-                df_input.at[idx, "Recommendation Steps/Approach"] = recommendation
-                
-                # Assign color based on priority
-                if priority == "High":
-                    df_input.at[idx, "priority_color"] = "red"
-                elif priority == "Medium":
-                    df_input.at[idx, "priority_color"] = "orange"
-                elif priority == "Low":
-                    df_input.at[idx, "priority_color"] = "yellow"
-        else:
-            # If no match is found, set default values
-            df_input.at[idx, "priority"] = "No data"
-            df_input.at[idx, "Recommendation Steps/Approach"] = "No recommendation available"
-            df_input.at[idx, "priority_color"] = "white"
+    index = ControlIndex.for_annotations(df_priority, fuzzy=fuzzy)
+    matched, found = index.match(df_input["control_title"], ["priority", "Recommendation Steps/Approach"])
+    safe = found & df_input["status"].isin(["ok", "info", "skip"])
+
+    # Assign priority and recommendation; safe controls are marked as such
+    df_input["priority"] = matched["priority"].where(~safe, "Safe/Well Architected").where(found, "No data")
+    df_input["Recommendation Steps/Approach"] = matched["Recommendation Steps/Approach"].where(
+        found, "No recommendation available")
+
+    # Assign color based on priority
+    colors = matched["priority"].map(PRIORITY_COLORS).where(~safe, "green")
+    df_input["priority_color"] = colors.where(found, "white")
 
     return df_input
 
@@ -103,20 +74,17 @@ def create_simplified_report(df_input, final_report_file):
     safe_df = safe_df.drop(columns=['fixed', 'feedback'])
     unsafe_df = unsafe_df.drop(columns=['fixed', 'feedback'])
 
-    # Initialize a dictionary to hold DataFrames for each category
-    categorized_data = {category: pd.DataFrame() for category in categories}
-
-    # Process each category and filter relevant services
-    for category, services in categories.items():
-        categorized_data[category] = unsafe_df[unsafe_df['title'].isin(services)]
+    # Split the open issues into one DataFrame per service category
+    categorized_data = partition(unsafe_df)
 
     return safe_df, unsafe_df, categorized_data
 
-def write_output_file(safe_df, unsafe_df, categorized_data, final_report_file, df_input):
+def write_output_file(safe_df, unsafe_df, categorized_data, final_report_file, df_input, profile=None):
     """
     Write output file with multiple sheets and formatting
     """
-    with pd.ExcelWriter(final_report_file, engine='xlsxwriter') as writer:
+    profile = profile or RunProfile('create_one.write_output_file')
+    with profile.excel_writer(final_report_file, engine='xlsxwriter') as writer:
         workbook = writer.book
 
         # Define formats
@@ -149,62 +117,90 @@ def write_output_file(safe_df, unsafe_df, categorized_data, final_report_file, d
 
     print(f"Final simplified report saved as {final_report_file}")
 
-def main():
-    # Ask the user to input the report file name
-    input_file = input("Enter the input file name (CSV or Excel): ").strip()
+def annotate_file(input_file, df_priority, output_dir=None, profile=None):
+    """
+    Enrich one input file with an already loaded priority database and build its report.
+    A stage profile is written next to the report.
+    Returns (report path, enriched intermediate path).
+    """
+    profile = profile or RunProfile('create_one.annotate')
 
     # Get the input file's base name and create unique output file name
     base_name = os.path.splitext(os.path.basename(input_file))[0]
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    final_report_file = f"{base_name}_comprehensive_report_{timestamp}.xlsx"
+    output_dir = output_dir or '.'
+    final_report_file = os.path.join(output_dir, f"{base_name}_comprehensive_report_{timestamp}.xlsx")
+    intermediate_file = os.path.join(output_dir, f"{base_name}_with_priorities_{timestamp}.parquet")
 
-    try:
-        # Load input file and priority database
+    # Load input file
+    with profile.stage('load_input') as stage:
         df_input = load_input_file(input_file)
-        df_priority = load_priority_database()
+        stage['rows'] = len(df_input)
 
-        # Update priority and recommendations
+    # Update priority and recommendations
+    with profile.stage('enrich', rows=len(df_input)) as stage:
         updated_df = update_priority_and_recommendation(df_input, df_priority)
+        stage['matched'] = int((updated_df["priority"] != "No data").sum())
+
+    # Keep the enriched data in columnar form for the next stage
+    with profile.stage('write_intermediate', rows=len(updated_df)):
+        write_columnar(updated_df, intermediate_file)
+    print(f"Enriched intermediate saved as {intermediate_file}")
 
-        # Create simplified report
+    # Create simplified report
+    with profile.stage('categorize', rows=len(updated_df)):
         safe_df, unsafe_df, categorized_data = create_simplified_report(updated_df, final_report_file)
 
-        # Write output file
-        write_output_file(safe_df, unsafe_df, categorized_data, final_report_file, updated_df)
+    # Write output file
+    write_output_file(safe_df, unsafe_df, categorized_data, final_report_file, updated_df, profile)
+
+    profile.write(final_report_file)
+    return final_report_file, intermediate_file
+
+def annotate_input(input_file=None, priority_file="PowerPipeControls_Annotations.xlsx", output_dir=None):
+    """
+    Load the priority database, then enrich the input file and build its report.
+    Prompts for the input file if it is not given.
+    Returns (report path, enriched intermediate path), or None if an error occurred.
+    """
+    # Ask the user to input the report file name
+    if input_file is None:
+        input_file = input("Enter the input file name (CSV or Excel): ").strip()
+
+    profile = RunProfile('create_one.annotate')
+    try:
+        # Load priority database, then enrich and report
+        with profile.stage('load_priority_database') as stage:
+            df_priority = load_priority_database(priority_file)
+            stage['rows'] = len(df_priority)
+        return annotate_file(input_file, df_priority, output_dir, profile)
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        return None
 
-if __name__ == "__main__":
-    main()
+def annotate_main(input_file=None, priority_file="PowerPipeControls_Annotations.xlsx", output_dir=None):
+    """
+    Build the comprehensive report. Prompts only for arguments that are not given.
+    Returns the report path, or None if an error occurred.
+    """
+    annotated = annotate_input(input_file, priority_file, output_dir)
+    return annotated[0] if annotated else None
 
 ###the output from this above program get used as input in this below program
-import pandas as pd
-import os
-from datetime import datetime
-import xlsxwriter
-
-# Define service categories
-categories = {
-    'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
-    'Compute': ['Auto Scaling', 'EC2', 'ECS', 'EKS', 'Lambda', 'EMR', 'Step Functions'],
-    'Storage': ['EBS', 'ECR', 'S3', 'DLM', 'Backup'],
-    'Network': ['API Gateway', 'CloudFront', 'Route 53', 'VPC', 'ELB', 'ElasticCache', 'CloudTrail'],
-    'Database': ['RDS', 'DynamoDB', 'Athena', 'Glue'],
-    'Other': ['CloudFormation', 'CodeDeploy', 'Config', 'SNS', 'SQS', 'WorkSpaces', 'EventBridge', 'Config']
-}
 
 # Map numerical priorities to words
 priority_map = {1: "High", 2: "Medium", 3: "Low"}
 
-def create_simplified_report_with_pivot(report_file, final_report_file):
-    # Read input report file (CSV or Excel)
-    if report_file.endswith('.csv'):
-        df = pd.read_csv(report_file)
-    elif report_file.endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(report_file)
-    else:
-        raise ValueError("Unsupported file format. Please provide a CSV or Excel file.")
+def create_simplified_report_with_pivot(report_file, final_report_file, profile=None):
+    import pandas as pd
+
+    profile = profile or RunProfile('create_one.pivot')
+
+    # Read input report file (CSV, Excel, Parquet or Arrow)
+    with profile.stage('load_report') as stage:
+        df = read_report(report_file)
+        stage['rows'] = len(df)
     
     # Ensure required columns exist
     required_columns = [
@@ -239,7 +235,7 @@ def create_simplified_report_with_pivot(report_file, final_report_file):
     open_issues_df = df[df['is_open_issue'] >= 1]
 
     # Create Excel writer
-    with pd.ExcelWriter(final_report_file, engine='xlsxwriter') as writer:
+    with profile.excel_writer(final_report_file, engine='xlsxwriter') as writer:
         # Write Raw Data Sheet
         raw_data_df.to_excel(writer, sheet_name='Raw Data', index=False)
 
@@ -252,8 +248,7 @@ def create_simplified_report_with_pivot(report_file, final_report_file):
         sr_no = 1
 
         # Process each service category
-        for service in categories.keys():
-            service_df = open_issues_df[open_issues_df['title'].isin(categories[service])]
+        for service, service_df in partition(open_issues_df).items():
             
             # Group by Control Title and sum Open Issues
             service_grouped = service_df.groupby(
@@ -393,7 +388,8 @@ def create_simplified_report_with_pivot(report_file, final_report_file):
     summary_df = pd.concat([summary_df, total_row], ignore_index=True)
 
     # Create Excel writer
-    with pd.ExcelWriter(final_report_file, engine='xlsxwriter') as writer:
+    with profile.stage('priority_chart_workbook', rows=len(summary_df)), \
+            pd.ExcelWriter(final_report_file, engine='xlsxwriter') as writer:
         workbook = writer.book
 
         # Write Priority Summary Sheet
@@ -432,9 +428,14 @@ def create_simplified_report_with_pivot(report_file, final_report_file):
       
     print(f"Final report with pivot table and charts saved as {final_report_file}")
 
-def main():
+def main(report_file=None, create_report=None, output_dir=None):
+    """
+    Build the report with pivot tables and charts. Prompts only for arguments that are not given.
+    Returns the report path, or None if it was skipped or failed.
+    """
     # Ask the user to input the report file name
-    report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv): ").strip()
+    if report_file is None:
+        report_file = input("Enter the report file name (e.g., aws_compliance_benchmark_all_controls_benchmark_vested_with_priorities.csv or .parquet): ").strip()
     
     # Get the input file's base name (without path) and extension
     base_name = os.path.splitext(os.path.basename(report_file))[0]
@@ -444,14 +445,18 @@ def main():
     unique_file_name = f"{base_name}_comprehensive_report_{timestamp}.xlsx"
     
     # Set the output path to the reports directory
-    reports_directory = os.path.dirname(os.path.abspath(__file__))  # Get the current script's directory
+    reports_directory = output_dir or os.path.dirname(os.path.abspath(__file__))  # Default to the current script's directory
     final_report_file = os.path.join(reports_directory, unique_file_name)
 
     # Ask if the user wants to create the simplified report
-    create_report = input("Do you want to create the comprehensive report? (yes/no): ").strip().lower()
-    if create_report == 'yes':
+    if create_report is None:
+        create_report = input("Do you want to create the comprehensive report? (yes/no): ").strip().lower() == 'yes'
+    if create_report:
+        profile = RunProfile('create_one.pivot')
         try:
-            create_simplified_report_with_pivot(report_file, final_report_file)
+            create_simplified_report_with_pivot(report_file, final_report_file, profile)
+            profile.write(final_report_file)
+            return final_report_file
         except ValueError as e:
             print(e)
         except KeyError as e:
@@ -460,6 +465,17 @@ def main():
             print(f"An error occurred: {e}")
     else:
         print("Report creation skipped.")
+    return None
+
+def run_both():
+    """
+    Run the two programs in turn: annotate an input file, then build the
+    pivot report from the enriched data the first one wrote
+    """
+    annotated = annotate_input()
+    if annotated is None:
+        return None
+    return main(annotated[1])
 
 if __name__ == "__main__":
-    main()
+    profiled(run_both)()
@@ -0,0 +1,168 @@
+"""
+Fill engine for pre-built docx templates.
+
+Building a document with python-docx creates every paragraph, table and cell
+as XML objects one call at a time. For documents that only differ in their
+numbers, the layout can be built once as a template and each copy produced
+by filling it in:
+
+- {{name}} in a text run is replaced by values['name']
+- a table row holding {{table.field}} markers is a prototype row: it is
+  repeated once per item of tables['table'], with {{table.field}} replaced
+  by item['field']
+
+The template's word/document.xml is compiled once into static XML, value
+slots and row blocks; filling it is string joining, and the other parts of
+the package are copied unchanged.
+
+    template = load_template('overview_template.docx')
+    template.save('acme.docx', {'client': 'Acme'}, {'services': [{'service': 'EC2', 'open_issues': 12}]})
+"""
+import os
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+
+DOCUMENT_PART = 'word/document.xml'
+
+_FIELD = re.compile(r'\{\{\s*([\w.]+)\s*\}\}')
+_ROW = re.compile(r'<w:tr[\s>].*?</w:tr>', re.DOTALL)
+# Characters XML 1.0 does not allow; scanner output occasionally carries them
+_INVALID_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def format_value(value):
+    """
+    Text for a field: integers with thousands separators, None blank
+    """
+    if value is None:
+        return ''
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}"
+    return str(value)
+
+
+def _xml_text(value):
+    return escape(_INVALID_XML.sub('', format_value(value)))
+
+
+def _compile_fields(xml):
+    """
+    Split XML into static strings and field names, alternating, starting and ending with a string
+    """
+    return _FIELD.split(xml)
+
+
+class DocxTemplate:
+    """
+    A docx template compiled for repeated filling.
+
+    Args:
+        path (str): Template document with {{name}} and {{table.field}} markers
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with zipfile.ZipFile(path) as package:
+            self.parts = [(info, package.read(info)) for info in package.infolist()]
+        xml = dict((info.filename, data) for info, data in self.parts)[DOCUMENT_PART].decode('utf-8')
+        # Filled values may start or end with spaces, which Word drops unless told to keep them
+        xml = xml.replace('<w:t>', '<w:t xml:space="preserve">')
+
+        # Compile into ('xml', fields) chunks and ('rows', table, fields) blocks,
+        # where fields alternate static XML and field names
+        self.blocks = []
+        position = 0
+        for row in _ROW.finditer(xml):
+            tables = {name.split('.', 1)[0] for name in _FIELD.findall(row.group()) if '.' in name}
+            if not tables:
+                continue
+            if len(tables) > 1:
+                raise ValueError(f"Template row mixes fields of tables {', '.join(sorted(tables))}")
+            self.blocks.append(('xml', _compile_fields(xml[position:row.start()])))
+            self.blocks.append(('rows', tables.pop(), _compile_fields(row.group())))
+            position = row.end()
+        self.blocks.append(('xml', _compile_fields(xml[position:])))
+
+    @property
+    def fields(self):
+        """
+        Field names the template expects, table fields as table.field
+        """
+        names = set()
+        for block in self.blocks:
+            names.update(block[-1][1::2])
+        return sorted(names)
+
+    @staticmethod
+    def _fill(fields, lookup):
+        out = list(fields)
+        for i in range(1, len(out), 2):
+            out[i] = _xml_text(lookup(out[i]))
+        return ''.join(out)
+
+    def render(self, values, tables=None):
+        """
+        The filled word/document.xml as text.
+
+        Args:
+            values (dict): Field name -> value
+            tables (dict, optional): Table name -> list of row dicts
+
+        Raises:
+            ValueError: A field or table of the template has no value
+        """
+        tables = tables or {}
+
+        def value(name):
+            if name not in values:
+                raise ValueError(f"Template field {name} has no value")
+            return values[name]
+
+        out = []
+        for block in self.blocks:
+            if block[0] == 'xml':
+                out.append(self._fill(block[1], value))
+                continue
+            _, table, fields = block
+            if table not in tables:
+                raise ValueError(f"Template table {table} has no rows")
+            for item in tables[table]:
+                def cell(name, item=item):
+                    table_name, _, field = name.partition('.')
+                    if table_name != table:
+                        return value(name)
+                    if field not in item:
+                        raise ValueError(f"Template field {name} has no value")
+                    return item[field]
+                out.append(self._fill(fields, cell))
+        return ''.join(out)
+
+    def save(self, output_file, values, tables=None):
+        """
+        Write a filled copy of the template. Returns output_file.
+        """
+        document = self.render(values, tables).encode('utf-8')
+        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as package:
+            for info, data in self.parts:
+                package.writestr(info.filename, document if info.filename == DOCUMENT_PART else data)
+        return output_file
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def load_template(path):
+    """
+    Compiled template for a docx file, built once per process and rebuilt
+    only when the file changes
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _templates_lock:
+        entry = _templates.get(path)
+        if entry is None or entry[0] != mtime:
+            entry = _templates[path] = (mtime, DocxTemplate(path))
+    return entry[1]
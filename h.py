@@ -1,18 +1,11 @@
-import pandas as pd
 import os
 import sys
 from datetime import datetime
-import xlsxwriter
-
-# Define service categories
-CATEGORIES = {
-    'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
-    'Compute': ['Auto Scaling', 'EC2', 'ECS', 'EKS', 'Lambda', 'EMR', 'Step Functions'],
-    'Storage': ['EBS', 'ECR', 'S3', 'DLM', 'Backup'],
-    'Network': ['API Gateway', 'CloudFront', 'Route 53', 'VPC', 'ELB', 'ElasticCache', 'CloudTrail'],
-    'Database': ['RDS', 'DynamoDB', 'Athena', 'Glue'],
-    'Other': ['CloudFormation', 'CodeDeploy', 'Config', 'SNS', 'SQS', 'WorkSpaces', 'EventBridge']
-}
+from annotation_store import load_annotations
+from control_index import ControlIndex
+from report_io import is_columnar, read_columnar, read_csv, read_excel
+from run_profile import RunProfile, profiled
+from service_categories import partition
 
 # Priority mapping
 PRIORITY_MAP = {1: "High", 2: "Medium", 3: "Low"}
@@ -25,18 +18,24 @@ COLOR_MAP = {
 }
 
 class AWSComplianceReporter:
-    def __init__(self, input_file, priority_file="PowerPipeControls_Annotations.xlsx"):
+    def __init__(self, input_file, priority_file="PowerPipeControls_Annotations.xlsx", priority_df=None):
         """
         Initialize the AWS Compliance Reporter
         
         Args:
-            input_file (str): Path to the input CSV/Excel file
+            input_file (str): Path to the input CSV/Excel/Parquet/Arrow file
             priority_file (str, optional): Path to the priority annotations file
+            priority_df (pd.DataFrame, optional): Already loaded annotations; priority_file is not read
         """
         self.input_file = input_file
         self.priority_file = priority_file
-        self.df = self._load_input_file()
-        self.priority_df = self._load_priority_database()
+        self.profile = RunProfile('h.comprehensive_report')
+        with self.profile.stage('load_input') as stage:
+            self.df = self._load_input_file()
+            stage['rows'] = len(self.df)
+        with self.profile.stage('load_priority_database') as stage:
+            self.priority_df = self._load_priority_database() if priority_df is None else priority_df
+            stage['rows'] = len(self.priority_df)
         
     def _load_input_file(self):
         """
@@ -46,25 +45,27 @@ class AWSComplianceReporter:
             pd.DataFrame: Loaded dataframe
         """
         try:
-            if self.input_file.endswith(".csv"):
-                return pd.read_csv(self.input_file, low_memory=False)
+            if is_columnar(self.input_file):
+                return read_columnar(self.input_file)
+            elif self.input_file.endswith(".csv"):
+                return read_csv(self.input_file)
             elif self.input_file.endswith((".xlsx", ".xls")):
-                return pd.read_excel(self.input_file, engine='openpyxl')
+                return read_excel(self.input_file)
             else:
-                raise ValueError("Unsupported file type. Use CSV or Excel.")
+                raise ValueError("Unsupported file type. Use CSV, Excel, Parquet or Arrow.")
         except Exception as e:
             print(f"Error loading input file: {e}")
             sys.exit(1)
 
     def _load_priority_database(self):
         """
-        Load priority database
+        Load priority database through the memory-mapped annotation store
         
         Returns:
             pd.DataFrame: Priority database
         """
         try:
-            return pd.read_excel(self.priority_file)
+            return load_annotations(self.priority_file)
         except Exception as e:
             print(f"Error loading priority database: {e}")
             sys.exit(1)
@@ -76,44 +77,38 @@ class AWSComplianceReporter:
         Returns:
             pd.DataFrame: Enriched dataframe
         """
-        for idx, row in self.df.iterrows():
-            control_title = row.get("control_title", "")
-            status = row.get("status", "")
-
-            # Find matching priority row
-            matching_row = self.priority_df[self.priority_df["control_title"] == control_title]
-
-            if not matching_row.empty:
-                priority = matching_row.iloc[0]["priority"]
-                recommendation = matching_row.iloc[0]["Recommendation Steps/Approach"]
-
-                # Assign priority and recommendation
-                if status in ["ok", "info", "skip"]:
-                    self.df.at[idx, "priority"] = "Safe"
-                    self.df.at[idx, "Recommendation Steps/Approach"] = recommendation
-                else:
-                    self.df.at[idx, "priority"] = priority
-                    self.df.at[idx, "Recommendation Steps/Approach"] = recommendation
-            else:
-                # Default values if no match
-                self.df.at[idx, "priority"] = "No Priority"
-                self.df.at[idx, "Recommendation Steps/Approach"] = "No recommendation available"
+        index = ControlIndex.for_annotations(self.priority_df)
+        matched, found = index.match(self.df["control_title"], ["priority", "Recommendation Steps/Approach"])
+        safe = found & self.df["status"].isin(["ok", "info", "skip"])
+
+        # Assign priority and recommendation; unmatched rows get the defaults
+        self.df["priority"] = matched["priority"].where(~safe, "Safe").where(found, "No Priority")
+        self.df["Recommendation Steps/Approach"] = matched["Recommendation Steps/Approach"].where(
+            found, "No recommendation available")
 
         return self.df
 
-    def generate_comprehensive_report(self):
+    def generate_comprehensive_report(self, output_dir=None):
         """
         Generate comprehensive report with multiple analysis sheets
+
+        Args:
+            output_dir (str, optional): Directory for the report, defaults to the working directory
+
+        Returns:
+            str: Path of the generated report
         """
         # Enrich data first
-        enriched_df = self.enrich_data()
+        with self.profile.stage('enrich', rows=len(self.df)) as stage:
+            enriched_df = self.enrich_data()
+            stage['matched'] = int((enriched_df["priority"] != "No Priority").sum())
 
         # Generate unique filename
         base_name = os.path.splitext(os.path.basename(self.input_file))[0]
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = f"{base_name}_comprehensive_report_{timestamp}.xlsx"
+        output_file = os.path.join(output_dir or '.', f"{base_name}_comprehensive_report_{timestamp}.xlsx")
 
-        with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+        with self.profile.excel_writer(output_file, engine='xlsxwriter') as writer:
             workbook = writer.book
 
             # Raw Data Sheet
@@ -138,16 +133,19 @@ class AWSComplianceReporter:
             self._create_pivot_analysis(enriched_df, writer, workbook)
 
         print(f"Comprehensive report generated: {output_file}")
+        self.profile.write(output_file)
+        return output_file
 
     def _create_service_category_analysis(self, open_issues_df, writer, workbook):
         """
         Create service category analysis sheet
         """
+        import pandas as pd
+
         service_summary = []
         sr_no = 1
 
-        for service_category, services in CATEGORIES.items():
-            category_df = open_issues_df[open_issues_df['title'].isin(services)]
+        for service_category, category_df in partition(open_issues_df).items():
             
             # Skip empty categories
             if category_df.empty:
@@ -188,6 +186,8 @@ class AWSComplianceReporter:
         """
         Create priority summary sheet with chart
         """
+        import pandas as pd
+
         priority_counts = df['priority'].value_counts()
         summary_df = priority_counts.reset_index()
         summary_df.columns = ['Priority', 'Count']
@@ -221,6 +221,8 @@ class AWSComplianceReporter:
         """
         Create pivot tables and analysis
         """
+        import pandas as pd
+
         # Pivot by Service
         service_pivot = pd.pivot_table(
             df, 
@@ -253,21 +255,28 @@ class AWSComplianceReporter:
         for col_num, value in enumerate(self.df.columns):
             worksheet.write(0, col_num, value, header_format)
 
-def main():
+def main(input_file=None, priority_file=None, output_dir=None):
+    """
+    Run the reporting tool. Prompts only for arguments that are not given.
+    Returns the report path, or None if an error occurred.
+    """
     print("AWS Compliance Reporting Tool")
     
     # Input file selection
-    input_file = input("Enter input compliance report file (CSV/Excel): ").strip()
+    if input_file is None:
+        input_file = input("Enter input compliance report file (CSV/Excel/Parquet): ").strip()
     
     try:
-        priority_file = input("Enter priority annotations file (default: PowerPipeControls_Annotations.xlsx): ").strip() or "PowerPipeControls_Annotations.xlsx"
+        if priority_file is None:
+            priority_file = input("Enter priority annotations file (default: PowerPipeControls_Annotations.xlsx): ").strip() or "PowerPipeControls_Annotations.xlsx"
         
         # Create reporter and generate report
         reporter = AWSComplianceReporter(input_file, priority_file)
-        reporter.generate_comprehensive_report()
+        return reporter.generate_comprehensive_report(output_dir)
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        return None
 
 if __name__ == "__main__":
-    main()
+    profiled(main)()
@@ -0,0 +1,254 @@
+"""
+Incremental re-enrichment after an annotation edit.
+
+Instead of re-running enrichment over every stored report, compare two
+versions of the annotations, find the control_titles whose priority,
+recommendation or cost changed, and patch only those rows in previously
+enriched outputs. Files without affected rows are not rewritten.
+
+Two annotation layouts are supported, matching the two enrichment paths:
+
+- annotations: a workbook like PowerPipeControls_Annotations.xlsx, applied
+  with create_one.update_priority_and_recommendation (titles compared in
+  their normalized form, first match wins)
+- lists: a folder of numbered priority lists (optimizer_locked/ex1,
+  optimizer_locked/priority_locked), applied like the adders: list 1, 2, 3
+  in order, priority = list number, the last match wins
+
+    python incremental_enrichment.py --old annotations_v1.xlsx --new PowerPipeControls_Annotations.xlsx reports/*.parquet
+    python incremental_enrichment.py --old ex1_backup/ --new optimizer_locked/ex1 reports/*_with_priorities.csv
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+
+from control_index import FUZZY_MATCH, normalize_key, normalize_keys
+from report_io import (columnar_schema, is_columnar, read_columnar, read_csv, read_excel, read_report,
+                       write_columnar, write_report)
+from run_profile import profiled
+from script_loader import load_stage
+
+RECOMMENDATION = 'Recommendation Steps/Approach'
+
+# Annotation columns compared between versions, per layout
+ANNOTATION_COLUMNS = {
+    'annotations': ['priority', RECOMMENDATION],
+    'lists': ['priority', RECOMMENDATION, 'COST'],
+}
+
+
+def detect_scheme(path):
+    """
+    A folder holds priority lists; a single file is an annotations workbook
+    """
+    return 'lists' if os.path.isdir(path) else 'annotations'
+
+
+def read_table(path):
+    if is_columnar(path):
+        return read_columnar(path)
+    if path.endswith('.csv'):
+        return read_csv(path)
+    if path.endswith(('.xlsx', '.xls')):
+        return read_excel(path)
+    raise ValueError("Unsupported file type. Please use CSV, Excel, Parquet or Arrow files.")
+
+
+def load_priority_lists(folder):
+    """
+    Read numbered priority lists (1_priority_expe.csv, priority2_control_list.csv, ...)
+    into one frame in the order the adders apply them
+    """
+    import pandas as pd
+
+    frames = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.csv'))):
+        match = re.search(r'\d', os.path.basename(path))
+        if not match:
+            continue
+        df = read_csv(path)
+        df['priority'] = int(match.group())
+        frames.append(df)
+    if not frames:
+        raise ValueError(f"No numbered priority lists found in {folder}")
+    lists = pd.concat(frames, ignore_index=True)
+    return lists.sort_values('priority', kind='stable')
+
+
+def load_annotation_version(path, scheme=None):
+    """
+    Load one annotation version as the effective mapping control_title -> annotation columns.
+    A Parquet/Arrow file written by save_snapshot is loaded as is.
+    """
+    if is_columnar(path):
+        return read_columnar(path).set_index('control_title')
+
+    scheme = scheme or detect_scheme(path)
+    if scheme == 'lists':
+        # Later lists override earlier ones, like the adders' assignment loop
+        df = load_priority_lists(path).drop_duplicates('control_title', keep='last')
+    else:
+        # update_priority_and_recommendation uses the first row per normalized title
+        df = read_table(path)
+        df = df[~normalize_keys(df['control_title']).duplicated().to_numpy()]
+
+    columns = ANNOTATION_COLUMNS[scheme]
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+    return df.set_index('control_title')[columns]
+
+
+def save_snapshot(mapping, path):
+    """
+    Store an annotation version so the next edit can be diffed against it
+    """
+    write_columnar(mapping.reset_index(), path)
+    print(f"Annotation snapshot saved as {path}")
+
+
+def changed_controls(old, new):
+    """
+    Return the control_titles that were added, removed or edited between two versions
+    """
+    columns = [column for column in new.columns if column in old.columns]
+    added = new.index.difference(old.index)
+    removed = old.index.difference(new.index)
+
+    common = new.index.intersection(old.index)
+    old_values = old.loc[common, columns].fillna('').astype(str)
+    new_values = new.loc[common, columns].fillna('').astype(str)
+    edited = common[(old_values != new_values).any(axis=1).to_numpy()]
+
+    return set(added) | set(removed) | set(edited)
+
+
+def patch_annotations_rows(df, new_annotations):
+    """
+    Recompute the affected rows with create_one's enrichment
+    """
+    annotate = load_stage('annotate')
+    return annotate.update_priority_and_recommendation(df, new_annotations.reset_index())
+
+
+def patch_list_rows(df, new_lists):
+    """
+    Recompute the affected rows like the adders do: unmatched rows get no priority
+    """
+    matched = new_lists.reindex(df['control_title'])
+    for column in ['priority', RECOMMENDATION, 'COST']:
+        if column in matched.columns:
+            df[column] = matched[column].to_numpy()
+    return df
+
+
+def patch_file(path, changed, new_mapping, scheme):
+    """
+    Patch the rows of one enriched output whose control_title changed.
+    Returns the number of rows patched; the file is only rewritten when that is not 0.
+    """
+    import pandas as pd
+
+    df = read_report(path)
+    if 'control_title' not in df.columns:
+        print(f"Skipping {path}: no control_title column")
+        return 0
+
+    if scheme == 'lists':
+        affected = df['control_title'].isin(changed)
+    else:
+        # Annotations are matched on the normalized title, see control_index
+        keys = normalize_keys(df['control_title'])
+        affected = keys.isin({normalize_key(title) for title in changed})
+        if FUZZY_MATCH:
+            # Rows without an exact match may be fuzzy matched to any control
+            affected |= ~keys.isin(normalize_keys(new_mapping.index.to_series()))
+    count = int(affected.sum())
+    if not count:
+        return 0
+
+    subset = df.loc[affected].copy()
+    if scheme == 'lists':
+        subset = patch_list_rows(subset, new_mapping)
+    else:
+        subset = patch_annotations_rows(subset, new_mapping)
+
+    widened = set()
+    for column in subset.columns:
+        values = subset[column]
+        if column not in df.columns:
+            df[column] = values.iloc[0:0].reindex(df.index)
+        elif df[column].dtype != values.dtype:
+            # Keep the column's type, so a patched file has the schema of a full run
+            try:
+                values = values.astype(df[column].dtype)
+            except (TypeError, ValueError):
+                # The new values do not fit (e.g. 'No data' in a numeric column):
+                # widen to the type both share rather than to object
+                common = pd.concat([df[column].iloc[0:0], values.iloc[0:0]]).dtype
+                df[column] = df[column].astype(common)
+                values = values.astype(common)
+                widened.add(column)
+        df.loc[affected, column] = values
+
+    # Parquet/Arrow files keep their column types, as a full enrichment run would
+    # write them; widened columns take their new type, as a full run would too
+    schema = columnar_schema(path) if is_columnar(path) else None
+    for column in widened:
+        if schema is not None and column in schema.names:
+            schema = schema.remove(schema.get_field_index(column))
+
+    # Write next to the original and swap, so a failure never leaves a half-written report
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp_{os.path.basename(path)}")
+    write_report(df, tmp_path, schema)
+    os.replace(tmp_path, path)
+    return count
+
+
+def reenrich(old_path, new_path, report_files, scheme=None):
+    """
+    Patch every report for the annotation changes between old_path and new_path.
+    Returns {report file: rows patched}.
+    """
+    scheme = scheme or detect_scheme(new_path)
+    old = load_annotation_version(old_path, scheme)
+    new = load_annotation_version(new_path, scheme)
+
+    changed = changed_controls(old, new)
+    print(f"{len(changed)} control(s) changed between the annotation versions")
+    if not changed:
+        return {path: 0 for path in report_files}
+
+    patched = {}
+    for path in report_files:
+        patched[path] = patch_file(path, changed, new, scheme)
+        if patched[path]:
+            print(f"Patched {patched[path]} row(s) in {path}")
+    return patched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Patch enriched reports for changed annotations only.")
+    parser.add_argument('reports', nargs='+', help="Enriched outputs (CSV, Excel, Parquet or Arrow) or glob patterns")
+    parser.add_argument('--old', required=True, help="Previous annotations: workbook, priority list folder or snapshot")
+    parser.add_argument('--new', required=True, help="Current annotations: workbook or priority list folder")
+    parser.add_argument('--scheme', choices=sorted(ANNOTATION_COLUMNS),
+                        help="Annotation layout (default: lists for a folder, annotations for a file)")
+    parser.add_argument('--snapshot', help="Save the new version here for the next incremental run")
+    args = parser.parse_args(argv)
+
+    report_files = sorted({path for pattern in args.reports for path in glob.glob(pattern)})
+    if not report_files:
+        print("No report files found.")
+        return 1
+
+    reenrich(args.old, args.new, report_files, args.scheme)
+    if args.snapshot:
+        save_snapshot(load_annotation_version(args.new, args.scheme), args.snapshot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -0,0 +1,421 @@
+"""
+Persistent job queue for report generation, backed by SQLite, with a pool of
+worker processes.
+
+Analysts submit jobs; N workers (one per core by default) take them from the
+queue, so reports submitted at the same time share the machine instead of
+fighting over it from separate shells. Scheduling is fair per submitter: the
+next job goes to the submitter with the fewest running jobs, then the one
+served least recently, then the oldest job. Failed jobs are retried with
+backoff up to max_attempts. A running job holds a lease that its worker renews
+every HEARTBEAT_SECONDS; jobs whose worker died, or whose lease ran out (the
+worker hangs, or died and the OS gave its pid to another process), are put
+back in the queue. Ctrl-C lets the workers finish their current job.
+
+    python job_queue.py submit annotate scan_a.csv -o out --submitter alice
+    python job_queue.py submit report scan_b.parquet -o out
+    python job_queue.py work -j 4
+    python job_queue.py status
+    python job_queue.py status 12
+
+Job kinds are the report daemon's report endpoints: annotate and report.
+Each worker keeps its libraries warm and maps the
+shared annotation store (annotation_store.py) rather than loading its own copy.
+"""
+import argparse
+import getpass
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from annotation_store import build_store
+from run_profile import profiled
+
+DEFAULT_DB = os.environ.get('REPORT_QUEUE_DB', 'report_jobs.sqlite')
+JOB_KINDS = ('annotate', 'report')
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5  # doubled after every failed attempt
+POLL_SECONDS = 0.5
+HEARTBEAT_SECONDS = 10  # how often a worker renews the lease of its running job
+LEASE_SECONDS = 60  # a running job whose lease was not renewed for this long is orphaned
+STOP_TIMEOUT_SECONDS = 30  # on shutdown, workers still busy after this long are terminated
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    submitter TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    submitted_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    worker_pid INTEGER,
+    heartbeat_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, not_before);
+CREATE INDEX IF NOT EXISTS jobs_submitter ON jobs (submitter, status);
+"""
+
+# Next queued job: fewest running jobs for its submitter, then the submitter
+# served least recently, then the oldest job
+CLAIM_QUERY = """
+SELECT j.job_id FROM jobs j
+WHERE j.status = 'queued' AND j.not_before <= :now
+ORDER BY
+    (SELECT COUNT(*) FROM jobs r WHERE r.submitter = j.submitter AND r.status = 'running'),
+    COALESCE((SELECT MAX(s.started_at) FROM jobs s WHERE s.submitter = j.submitter AND s.started_at IS NOT NULL), ''),
+    j.job_id
+LIMIT 1
+"""
+
+
+def now_iso():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def connect(db_path=DEFAULT_DB):
+    """
+    Open (and create if needed) the queue database
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    if 'heartbeat_at' not in {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}:
+        # Queue created before job leases
+        try:
+            conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+        except sqlite3.OperationalError:
+            pass  # added by another process in the meantime
+    return conn
+
+
+def submit(conn, kind, params, submitter=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Queue one job. Returns the job id.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind {kind}; use one of {', '.join(JOB_KINDS)}")
+    cursor = conn.execute(
+        "INSERT INTO jobs (kind, params, submitter, max_attempts, submitted_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, json.dumps(params), submitter or getpass.getuser(), max_attempts, now_iso()))
+    return cursor.lastrowid
+
+
+def claim(conn, pid=None):
+    """
+    Atomically take the next job for this worker. Returns the job row, or None.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(CLAIM_QUERY, {'now': time.time()}).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("""
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, worker_pid = ?,
+                heartbeat_at = ?
+            WHERE job_id = ?
+        """, (now_iso(), pid or os.getpid(), time.time(), row['job_id']))
+        job = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row['job_id'],)).fetchone()
+        conn.execute("COMMIT")
+        return job
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def keep_lease(db_path, job_id, stop, interval=HEARTBEAT_SECONDS):
+    """
+    Renew the lease of a running job until stop is set. Runs in a thread of the worker.
+    """
+    conn = connect(db_path)
+    try:
+        while not stop.wait(interval):
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'",
+                         (time.time(), job_id))
+    finally:
+        conn.close()
+
+
+def finish(conn, job_id, result):
+    conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, result = ?, error = NULL WHERE job_id = ?",
+                 (now_iso(), json.dumps(result), job_id))
+
+
+def fail(conn, job, error):
+    """
+    Record a failed attempt: back to the queue with backoff, or failed for good
+    after max_attempts.
+    """
+    if job['attempts'] < job['max_attempts']:
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (job['attempts'] - 1)
+        conn.execute("UPDATE jobs SET status = 'queued', not_before = ?, error = ?, worker_pid = NULL "
+                     "WHERE job_id = ?", (time.time() + delay, error, job['job_id']))
+    else:
+        conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE job_id = ?",
+                     (now_iso(), error, job['job_id']))
+
+
+def cancel(conn, job_id):
+    """
+    Cancel a job that has not started. Returns True if it was cancelled.
+    """
+    cursor = conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                          "WHERE job_id = ? AND status = 'queued'", (now_iso(), job_id))
+    return cursor.rowcount == 1
+
+
+def stop_on_sigterm():
+    """
+    Treat SIGTERM like Ctrl-C, so the pool and the daemon shut down cleanly
+    """
+    def handler(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, handler)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def requeue_orphans(conn, lease=LEASE_SECONDS):
+    """
+    Put running jobs back in the queue (counts as an attempt) when their worker
+    process is gone or their lease was not renewed within lease seconds. A pid
+    alone is not proof: the OS may have reused a dead worker's pid.
+    """
+    rows = conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+    expired = time.time() - lease
+    requeued = 0
+    for job in rows:
+        if not (job['worker_pid'] and pid_alive(job['worker_pid'])):
+            fail(conn, job, f"Worker {job['worker_pid']} stopped while running the job")
+        elif (job['heartbeat_at'] or 0) < expired:
+            fail(conn, job, f"Worker {job['worker_pid']} did not renew the job's lease for {lease}s")
+        else:
+            continue
+        requeued += 1
+    return requeued
+
+
+def job_status(conn, job_id=None, limit=50):
+    """
+    One job as a dict, or the most recent jobs as a list of dicts
+    """
+    if job_id is not None:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return None if row is None else _job_dict(row)
+    rows = conn.execute("SELECT * FROM jobs ORDER BY job_id DESC LIMIT ?", (limit,)).fetchall()
+    return [_job_dict(row) for row in rows]
+
+
+def _job_dict(row):
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def worker_loop(db_path, annotations, stop_event=None, poll=POLL_SECONDS):
+    """
+    Take jobs from the queue until stop_event is set. Runs in a worker process.
+    """
+    from report_daemon import ReportDaemon
+
+    # Ctrl-C reaches the whole process group; the pool sets stop_event instead,
+    # so the current job is finished rather than cut off
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    daemon = ReportDaemon(annotations)
+    daemon.warm()
+    conn = connect(db_path)
+    try:
+        # A job interrupted here stays 'running' and is requeued by the pool
+        while stop_event is None or not stop_event.is_set():
+            job = claim(conn)
+            if job is None:
+                time.sleep(poll)
+                continue
+            print(f"[worker {os.getpid()}] job {job['job_id']} {job['kind']} for {job['submitter']} "
+                  f"(attempt {job['attempts']}/{job['max_attempts']})")
+            if job['kind'] not in JOB_KINDS:
+                # Left in the database by an older version (e.g. 'run'); never retried
+                conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE job_id = ?",
+                             (now_iso(), f"Unknown job kind {job['kind']}", job['job_id']))
+                continue
+            start = time.perf_counter()
+            stop_lease = threading.Event()
+            lease = threading.Thread(target=keep_lease, args=(db_path, job['job_id'], stop_lease), daemon=True)
+            lease.start()
+            try:
+                result = getattr(daemon, job['kind'])(**json.loads(job['params']))
+            except SystemExit:
+                fail(conn, job, "Stage exited with an error")
+            except Exception as e:
+                fail(conn, job, f"{type(e).__name__}: {e}")
+            else:
+                result['seconds'] = round(time.perf_counter() - start, 4)
+                finish(conn, job['job_id'], result)
+            finally:
+                stop_lease.set()
+                lease.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+class WorkerPool:
+    """
+    N worker processes on one queue. Dead workers are replaced, and jobs of dead
+    workers or with an expired lease are requeued.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB, workers=None, annotations="PowerPipeControls_Annotations.xlsx"):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self.annotations = annotations
+        self.stop_event = multiprocessing.Event()
+        self.processes = []
+
+    def _spawn(self):
+        process = multiprocessing.Process(target=worker_loop, args=(self.db_path, self.annotations, self.stop_event),
+                                          daemon=True)
+        process.start()
+        return process
+
+    def start(self):
+        conn = connect(self.db_path)
+        try:
+            requeued = requeue_orphans(conn)
+        finally:
+            conn.close()
+        if requeued:
+            print(f"Requeued {requeued} job(s) left running by a previous pool")
+        if os.path.exists(self.annotations):
+            # Build the store once here instead of in every worker
+            build_store(self.annotations)
+        self.processes = [self._spawn() for _ in range(self.workers)]
+        print(f"Started {self.workers} worker(s) on {self.db_path}")
+
+    def check(self):
+        """
+        Replace dead workers and requeue orphaned jobs, those of dead workers
+        and those whose lease expired
+        """
+        if self.stop_event.is_set():
+            return
+        dead = [process for process in self.processes if not process.is_alive()]
+        for process in dead:
+            process.join()
+        self.processes = [process for process in self.processes if process.is_alive()]
+        conn = connect(self.db_path)
+        try:
+            requeued = requeue_orphans(conn)
+        finally:
+            conn.close()
+        if requeued:
+            print(f"Requeued {requeued} orphaned job(s)")
+        self.processes += [self._spawn() for _ in dead]
+
+    def stop(self, timeout=STOP_TIMEOUT_SECONDS):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def run_forever(self, interval=2):
+        self.start()
+        stop_on_sigterm()
+        try:
+            while True:
+                time.sleep(interval)
+                self.check()
+        except KeyboardInterrupt:
+            print(f"Stopping workers after their current job (at most {STOP_TIMEOUT_SECONDS}s)...")
+        finally:
+            self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Queue report jobs and run them on a worker pool.")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Queue database (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sub = subparsers.add_parser('submit', help="Queue a job")
+    sub.add_argument('kind', choices=['annotate', 'report'])
+    sub.add_argument('input_files', nargs='+')
+    sub.add_argument('-o', '--output-dir')
+    sub.add_argument('--annotations', help="Annotations workbook (default: the workers' one)")
+    sub.add_argument('--submitter', help="Name used for fair scheduling (default: current user)")
+    sub.add_argument('--attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help="Attempts before a job fails")
+
+    sub = subparsers.add_parser('work', help="Run the worker pool")
+    sub.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: number of CPUs)")
+    sub.add_argument('--annotations', default="PowerPipeControls_Annotations.xlsx")
+
+    sub = subparsers.add_parser('status', help="Show recent jobs or one job")
+    sub.add_argument('job_id', type=int, nargs='?')
+    sub.add_argument('--limit', type=int, default=50)
+
+    sub = subparsers.add_parser('cancel', help="Cancel queued jobs")
+    sub.add_argument('job_ids', type=int, nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'work':
+        WorkerPool(args.db, args.workers, args.annotations).run_forever()
+        return 0
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'submit':
+            for path in args.input_files:
+                params = {'input_file': os.path.abspath(path),
+                          'output_dir': os.path.abspath(args.output_dir) if args.output_dir else None}
+                if args.annotations:
+                    params['annotations'] = os.path.abspath(args.annotations)
+                job_id = submit(conn, args.kind, params, args.submitter, args.attempts)
+                print(f"Queued job {job_id}: {args.kind} {path}")
+        elif args.command == 'status':
+            if args.job_id is not None:
+                job = job_status(conn, args.job_id)
+                if job is None:
+                    print(f"No job {args.job_id}")
+                    return 1
+                print(json.dumps(job, indent=2))
+            else:
+                for job in job_status(conn, limit=args.limit):
+                    print(f"{job['job_id']:>6}  {job['status']:<9}  {job['kind']:<8}  {job['submitter']:<12}  "
+                          f"attempts {job['attempts']}/{job['max_attempts']}  {job['params'].get('input_file', '')}")
+        elif args.command == 'cancel':
+            for job_id in args.job_ids:
+                print(f"Job {job_id} {'cancelled' if cancel(conn, job_id) else 'is not queued'}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -0,0 +1,397 @@
+"""
+Run the report pipeline as a DAG of stages with skip-if-unchanged caching.
+
+    enrich -> optimize -> analyse -> overview
+    annotate -> pivot
+
+Every stage writes into its own folder under the work directory. A stage is
+skipped when its cache key -- the content hash of the stage script and of the
+shared modules at the repository root, its parameters, its input files and
+the outputs of the stages it depends on --
+matches the key recorded in pipeline_state.json by the previous run and its
+outputs are still on disk. Stages whose dependencies are done run
+concurrently in a process pool.
+
+    python pipeline_runner.py scan.csv --annotations PowerPipeControls_Annotations.xlsx --client Acme -j 4
+"""
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from report_cli import DEFAULT_PRIORITY_DIR, run_stage
+from report_io import file_hash
+from run_profile import profiled
+from script_loader import REPO_ROOT, SCRIPTS
+
+STATE_FILE = 'pipeline_state.json'
+
+
+class StageOutput:
+    """
+    Reference to the files a finished stage wrote, selected by a glob pattern
+    """
+
+    def __init__(self, stage, pattern='*'):
+        self.stage = stage
+        self.pattern = pattern
+
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    Args:
+        name (str): Stage name, also the name of its output folder
+        script (str): Stage key in script_loader.SCRIPTS
+        function (str): Function of the script to call
+        inputs (dict): Keyword argument -> file/folder path or StageOutput
+        params (dict): Extra keyword arguments passed unchanged
+        output_arg (str): Keyword argument that receives the stage folder
+        output_name (str, optional): When set, output_arg receives this file
+            name inside the stage folder instead of the folder itself
+    """
+
+    def __init__(self, name, script, function, inputs, params=None, output_arg='output_dir', output_name=None):
+        self.name = name
+        self.script = script
+        self.function = function
+        self.inputs = inputs
+        self.params = params or {}
+        self.output_arg = output_arg
+        self.output_name = output_name
+
+    @property
+    def deps(self):
+        return [value.stage for value in self.inputs.values() if isinstance(value, StageOutput)]
+
+
+def default_stages(input_file, annotations=None, priority_dir=DEFAULT_PRIORITY_DIR, client=None):
+    """
+    Build the documented report flow for one Powerpipe export.
+    Stages whose source (annotations workbook, client name) is not given are left out.
+    """
+    stages = [
+        Stage('enrich', 'enrich-non-ai', 'main',
+              {'report_file': input_file, 'priority_dir': priority_dir},
+              {'output_format': 'parquet', 'create_files': False},
+              output_arg='reports_folder'),
+        Stage('optimize', 'optimize', 'main',
+              {'report_file': StageOutput('enrich', '*_with_priorities.parquet')},
+              {'create_report': True}),
+        Stage('analyse', 'analyse', 'main',
+              {'report_file': StageOutput('optimize', '*.csv')},
+              {'create_report': True}),
+    ]
+    if annotations:
+        stages += [
+            Stage('annotate', 'annotate', 'annotate_main',
+                  {'input_file': input_file, 'priority_file': annotations}),
+            # The first program's output feeds the second one in create_one.py
+            Stage('pivot', 'pivot', 'main',
+                  {'report_file': StageOutput('annotate', '*_with_priorities_*.parquet')},
+                  {'create_report': True}),
+        ]
+    if client:
+        # The statistics come from the summary the analyse stage wrote, not the workbook
+        stages.append(Stage('overview', 'overview', 'create_report_overview_template',
+                            {'summary_file': StageOutput('analyse', '*_summary.json')},
+                            {'client_name': client}, output_arg='output_file',
+                            output_name='AWS_Report_Overview_Template.docx'))
+    return stages
+
+
+def path_hash(path):
+    """
+    Content hash of a file, or of every file in a folder
+    """
+    if not os.path.isdir(path):
+        return file_hash(path)
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(file_hash(file_path).encode())
+    return digest.hexdigest()
+
+
+def code_version():
+    """
+    Content hash of the modules at the repository root. The stage scripts
+    import them (report_io, control_index, ...), so editing any of them
+    invalidates every stage.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(glob.escape(REPO_ROOT), '*.py'))):
+        digest.update(os.path.basename(path).encode())
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+class PipelineRunner:
+    """
+    Schedules the stages of a DAG, skipping the ones whose inputs did not change
+    """
+
+    def __init__(self, stages, workdir, workers=1, force=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.workdir = workdir
+        self.workers = workers
+        self.force = force
+        self.state_path = os.path.join(workdir, STATE_FILE)
+        self.state = self.load_state()
+        self.code_version = code_version()
+        self.check_graph()
+
+    def check_graph(self):
+        """
+        Reject unknown dependencies and cycles before anything runs
+        """
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dep}")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        os.makedirs(self.workdir, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def stage_dir(self, name):
+        return os.path.join(self.workdir, name)
+
+    def stage_outputs(self, name, pattern='*'):
+        """
+        Output files recorded for a finished stage, optionally filtered by pattern
+        """
+        outputs = self.state.get(name, {}).get('outputs', {})
+        return [os.path.join(self.stage_dir(name), relative) for relative in sorted(outputs)
+                if fnmatch.fnmatch(os.path.basename(relative), pattern)]
+
+    def resolve_inputs(self, stage):
+        """
+        Turn the stage inputs into keyword arguments and their content hashes
+        """
+        kwargs, hashes = {}, {}
+        for arg, value in stage.inputs.items():
+            if isinstance(value, StageOutput):
+                matches = self.stage_outputs(value.stage, value.pattern)
+                if not matches:
+                    raise FileNotFoundError(f"Stage {value.stage} produced no file matching {value.pattern}")
+                kwargs[arg] = matches[0]
+                # Upstream names carry timestamps, so only the recorded content hash counts
+                relative = os.path.relpath(matches[0], self.stage_dir(value.stage))
+                hashes[arg] = self.state[value.stage]['outputs'][relative]['hash']
+            else:
+                kwargs[arg] = value
+                hashes[arg] = path_hash(value)
+        return kwargs, hashes
+
+    def cache_key(self, stage, input_hashes):
+        script_path = os.path.join(REPO_ROOT, SCRIPTS[stage.script])
+        payload = json.dumps({
+            'script': file_hash(script_path),
+            'code': self.code_version,
+            'function': stage.function,
+            'params': stage.params,
+            'output_name': stage.output_name,
+            'inputs': input_hashes,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def outputs_intact(self, name):
+        """
+        True if every recorded output is still on disk unchanged
+        """
+        outputs = self.state.get(name, {}).get('outputs')
+        if not outputs:
+            return False
+        for relative, info in outputs.items():
+            path = os.path.join(self.stage_dir(name), relative)
+            if not os.path.exists(path):
+                return False
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) != (info['size'], info['mtime_ns']) \
+                    and file_hash(path) != info['hash']:
+                return False
+        return True
+
+    def record_outputs(self, name):
+        outputs = {}
+        stage_dir = self.stage_dir(name)
+        for root, _, files in os.walk(stage_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                outputs[os.path.relpath(path, stage_dir)] = {
+                    'hash': file_hash(path),
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                }
+        return outputs
+
+    def select(self, targets=None):
+        """
+        Stages needed to build the targets, dependencies included
+        """
+        if not targets:
+            return set(self.stages)
+        selected = set()
+
+        def add(name):
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                for dep in self.stages[name].deps:
+                    add(dep)
+
+        for target in targets:
+            add(target)
+        return selected
+
+    def run(self, targets=None):
+        """
+        Run the selected stages. Returns {stage: 'ran' | 'skipped' | 'failed' | 'blocked'}.
+        """
+        pending = self.select(targets)
+        status = {}
+        running = {}
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+        try:
+            while pending or running:
+                # Start (or skip) every stage whose dependencies are finished
+                for name in sorted(pending):
+                    stage = self.stages[name]
+                    dep_status = [status.get(dep) for dep in stage.deps]
+                    if any(s in ('failed', 'blocked') for s in dep_status):
+                        status[name] = 'blocked'
+                        pending.discard(name)
+                        print(f"[{name}] blocked by a failed dependency")
+                        continue
+                    if not all(s in ('ran', 'skipped') for s in dep_status):
+                        continue
+                    pending.discard(name)
+
+                    try:
+                        kwargs, input_hashes = self.resolve_inputs(stage)
+                    except (OSError, KeyError) as e:
+                        status[name] = 'failed'
+                        print(f"[{name}] cannot resolve inputs: {e}")
+                        continue
+                    key = self.cache_key(stage, input_hashes)
+                    if not self.force and self.state.get(name, {}).get('key') == key and self.outputs_intact(name):
+                        status[name] = 'skipped'
+                        print(f"[{name}] up to date, skipped")
+                        continue
+
+                    kwargs.update(stage.params)
+                    stage_dir = self.stage_dir(name)
+                    kwargs[stage.output_arg] = os.path.join(stage_dir, stage.output_name) if stage.output_name else stage_dir
+                    print(f"[{name}] running")
+                    args = (stage.script, stage.function, stage_dir, kwargs)
+                    if executor:
+                        running[executor.submit(execute_stage, *args)] = (name, key, time.perf_counter())
+                    else:
+                        start = time.perf_counter()
+                        self.finish(name, key, execute_stage(*args), start, status)
+
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name, key, start = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            print(f"[{name}] {e}")
+                            result = None
+                        self.finish(name, key, result, start, status)
+        finally:
+            if executor:
+                executor.shutdown()
+        return status
+
+    def finish(self, name, key, result, start, status):
+        elapsed = time.perf_counter() - start
+        if result is None:
+            status[name] = 'failed'
+            self.state.pop(name, None)
+            print(f"[{name}] failed after {elapsed:.1f}s")
+        else:
+            status[name] = 'ran'
+            self.state[name] = {'key': key, 'outputs': self.record_outputs(name)}
+            print(f"[{name}] done in {elapsed:.1f}s")
+        self.save_state()
+
+
+def execute_stage(script, function, stage_dir, kwargs):
+    """
+    Run one stage into a clean output folder. Runs in a worker process.
+    """
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    os.makedirs(stage_dir, exist_ok=True)
+    return run_stage(script, function, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the report pipeline, redoing only stages whose inputs changed.")
+    parser.add_argument('input_file', help="Powerpipe export (CSV, Excel, Parquet or Arrow)")
+    parser.add_argument('--annotations', help="Annotations workbook for the annotate/pivot stages")
+    parser.add_argument('--priority-dir', default=DEFAULT_PRIORITY_DIR,
+                        help="Folder holding 1/2/3_priority_expe.csv for the enrich stage")
+    parser.add_argument('--client', help="Client name for the overview stage")
+    parser.add_argument('--workdir', help="Folder for stage outputs and the cache state "
+                                          "(default: <input name>_pipeline next to the input)")
+    parser.add_argument('--stages', nargs='+', help="Only build these stages and what they depend on")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="Run up to this many stages at once")
+    parser.add_argument('--force', action='store_true', help="Rerun every selected stage")
+    args = parser.parse_args(argv)
+
+    input_file = os.path.abspath(args.input_file)
+    workdir = args.workdir or f"{os.path.splitext(input_file)[0]}_pipeline"
+    stages = default_stages(input_file,
+                            annotations=os.path.abspath(args.annotations) if args.annotations else None,
+                            priority_dir=os.path.abspath(args.priority_dir), client=args.client)
+
+    runner = PipelineRunner(stages, os.path.abspath(workdir), workers=args.jobs, force=args.force)
+    status = runner.run(args.stages)
+
+    for name in sorted(status):
+        print(f"{name}: {status[name]}")
+    return 1 if any(s in ('failed', 'blocked') for s in status.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -0,0 +1,233 @@
+"""
+Non-interactive command line for the report pipeline.
+
+Every stage that normally prompts with input() is exposed as a subcommand whose
+answers come from flags, so reports can be produced unattended and in parallel:
+
+    python report_cli.py annotate scan_a.csv scan_b.csv -j 4 --output-dir out
+    python report_cli.py enrich out/*_with_priorities_*.parquet --variant ai --format parquet
+    python report_cli.py filter centralfile.csv -p 1 2 3 --save filtered/central --table
+    python report_cli.py overview AWS_Report_Overview_Template.docx --client "Acme" --summary out/scan_summary.json
+    python report_cli.py overview overviews/overview.docx --client Acme Globex --summary acme_summary.json globex_summary.json
+"""
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from script_loader import CONTAINS_DIR, REPO_ROOT, load_stage
+from run_profile import profiled
+
+ENRICH_VARIANTS = {
+    'non-ai': 'enrich-non-ai',
+    'ai': 'enrich-ai',
+    'ai-masked': 'enrich-ai-masked',
+}
+
+FILTER_LEVELS = {
+    'full': 'filter',
+    '1': 'filter-level1',
+    '2': 'filter-level2',
+}
+
+DEFAULT_PRIORITY_DIR = os.path.join(REPO_ROOT, CONTAINS_DIR, 'optimizer_locked', 'ex1')
+
+
+def run_stage(stage, function_name, *args, **kwargs):
+    """
+    Load a stage script and call one of its functions.
+    Runs in the worker process when jobs are spread across processes.
+    Returns the function's result, or None if it exited or raised.
+    """
+    try:
+        module = load_stage(stage)
+        return getattr(module, function_name)(*args, **kwargs)
+    except SystemExit:
+        # Some loaders call sys.exit(1) on bad input
+        print(f"[{stage}] {args[0] if args else ''}: stage exited with an error")
+    except Exception as e:
+        print(f"[{stage}] {args[0] if args else ''}: {e}")
+    return None
+
+
+def run_filter(stage, file_path, priority, save_prefix=None, table=False):
+    """
+    Filter one file by one priority without prompting.
+    Returns the saved CSV path, or the input path when nothing was saved.
+    """
+    csv_filename = table_filename = None
+    if save_prefix:
+        csv_filename = f"{save_prefix}_p{priority}.csv"
+        if table:
+            table_filename = f"{save_prefix}_p{priority}.txt"
+        os.makedirs(os.path.dirname(os.path.abspath(csv_filename)), exist_ok=True)
+    result = run_stage(stage, 'filter_checks_by_priority', file_path, priority,
+                       csv_filename=csv_filename, table_filename=table_filename, prompt=False)
+    if result is None:
+        return None
+    return csv_filename or file_path
+
+
+def run_jobs(jobs, workers):
+    """
+    Run (function, args, kwargs) jobs, in a process pool when workers > 1.
+    Returns the results in job order.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        return [function(*args, **kwargs) for function, args, kwargs in jobs]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = [executor.submit(function, *args, **kwargs) for function, args, kwargs in jobs]
+        return [future.result() for future in futures]
+
+
+def overview_path(args, client):
+    """
+    Output file of one client's overview: output_file itself for a single
+    client, <output_file name>_<client>.docx next to it for several
+    """
+    if len(args.client) == 1:
+        return args.output_file
+    stem, extension = os.path.splitext(args.output_file)
+    client = re.sub(r'[^\w.-]+', '_', client)
+    return f"{stem}_{client}{extension or '.docx'}"
+
+
+def build_jobs(args):
+    """
+    Turn the parsed command line into a list of jobs
+    """
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.command == 'annotate':
+        return [(run_stage, ('annotate', 'annotate_main', path),
+                 {'priority_file': args.priority_file, 'output_dir': args.output_dir})
+                for path in args.files]
+
+    if args.command == 'report':
+        return [(run_stage, ('report', 'main', path),
+                 {'priority_file': args.priority_file, 'output_dir': args.output_dir})
+                for path in args.files]
+
+    if args.command in ('pivot', 'optimize', 'simplify', 'charts', 'analyse'):
+        return [(run_stage, (args.command, 'main', path),
+                 {'create_report': True, 'output_dir': args.output_dir})
+                for path in args.files]
+
+    if args.command == 'enrich':
+        return [(run_stage, (ENRICH_VARIANTS[args.variant], 'main', path),
+                 {'output_format': args.format, 'create_files': args.split_priorities,
+                  'priority_dir': args.priority_dir, 'reports_folder': args.reports_folder})
+                for path in args.files]
+
+    if args.command == 'filter':
+        return [(run_filter, (FILTER_LEVELS[args.level], path, priority),
+                 {'save_prefix': args.save, 'table': args.table})
+                for path in args.files for priority in args.priority]
+
+    if args.command == 'overview':
+        summaries = args.summary or [None]
+        if len(summaries) not in (1, len(args.client)):
+            raise ValueError("Give one --summary for all clients or one per client.")
+        summaries = summaries * len(args.client) if len(summaries) == 1 else summaries
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_file)), exist_ok=True)
+        return [(run_stage, ('overview', 'create_report_overview_template', overview_path(args, client)),
+                 {'client_name': client, 'summary_file': summary_file})
+                for client, summary_file in zip(args.client, summaries)]
+
+    if args.command == 'convert':
+        # The converter does its own splitting across processes
+        return [(run_stage, ('convert', 'convert_file', args.input_file, args.output_file),
+                 {'workers': args.jobs})]
+
+    raise ValueError(f"Unsupported command: {args.command}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run report pipeline stages without prompts.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_stage(name, help_text, files_help="Input report files"):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('files', nargs='+', help=files_help)
+        sub.add_argument('-j', '--jobs', type=int, default=1,
+                         help="Process this many files in parallel (default: 1)")
+        sub.add_argument('-o', '--output-dir', default=None,
+                         help="Directory for the generated reports")
+        return sub
+
+    sub = add_stage('annotate', "Add priorities from the annotations workbook (create_one.py)")
+    sub.add_argument('--priority-file', default="PowerPipeControls_Annotations.xlsx")
+
+    sub = add_stage('report', "Build the comprehensive reporting-tool workbook (h.py)")
+    sub.add_argument('--priority-file', default="PowerPipeControls_Annotations.xlsx")
+
+    add_stage('pivot', "Build the pivot/chart workbook from an annotated report (create_one.py)")
+    add_stage('optimize', "Trim a report to the final optimized columns")
+    add_stage('simplify', "Build the safe/unsafe simplified workbook")
+    add_stage('charts', "Build the simplified workbook with pivot tables and charts")
+    add_stage('analyse', "Build the simplified workbook with the pivot analysis sheet")
+
+    sub = add_stage('enrich', "Add priorities and recommendations with one of the adders")
+    sub.add_argument('--variant', choices=sorted(ENRICH_VARIANTS), default='non-ai')
+    sub.add_argument('--format', choices=['csv', 'xlsx', 'parquet', 'arrow'], default='csv')
+    sub.add_argument('--split-priorities', action='store_true',
+                     help="Also write one file per priority level, in --format")
+    sub.add_argument('--priority-dir', default=DEFAULT_PRIORITY_DIR,
+                     help="Folder holding 1/2/3_priority_expe.csv")
+    sub.add_argument('--reports-folder', default='reports')
+
+    sub = add_stage('filter', "Filter checks by priority level", files_help="centralfile.csv, input_file_priority.csv, ...")
+    sub.add_argument('-p', '--priority', nargs='+', choices=['1', '2', '3'], required=True)
+    sub.add_argument('--level', choices=sorted(FILTER_LEVELS), default='full',
+                     help="Which filter tool to use (default: full)")
+    sub.add_argument('--save', metavar='PREFIX', default=None,
+                     help="Save each result as PREFIX_p<priority>.csv")
+    sub.add_argument('--table', action='store_true',
+                     help="With --save, also write the formatted table as .txt")
+
+    sub = subparsers.add_parser('overview', help="Write the report overview docx template")
+    sub.add_argument('output_file', nargs='?', default="AWS_Report_Overview_Template.docx")
+    sub.add_argument('--client', nargs='+', required=True,
+                     help="Client name shown in the report; several write one document per client")
+    sub.add_argument('--summary', nargs='+', default=None,
+                     help="Statistics to fill in: a _summary.json from the analyse stage, or a report file; "
+                          "one for all clients or one per client")
+    sub.add_argument('-j', '--jobs', type=int, default=1,
+                     help="Write this many documents in parallel (default: 1)")
+
+    sub = subparsers.add_parser('convert', help="Convert a tab separated dump to CSV")
+    sub.add_argument('input_file')
+    sub.add_argument('output_file')
+    sub.add_argument('-j', '--jobs', type=int, default=1)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not hasattr(args, 'output_dir'):
+        args.output_dir = None
+
+    try:
+        jobs = build_jobs(args)
+    except ValueError as e:
+        print(e)
+        return 1
+    workers = getattr(args, 'jobs', 1) if args.command != 'convert' else 1
+    results = run_jobs(jobs, workers)
+
+    failed = sum(result is None for result in results)
+    for result in results:
+        if result is not None:
+            print(f"Done: {result}")
+    if failed:
+        print(f"{failed} of {len(results)} job(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
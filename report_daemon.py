@@ -0,0 +1,426 @@
+"""
+Report daemon: a long-running local server that keeps pandas, the pipeline
+scripts and the annotation databases loaded between report requests.
+
+A one-off run pays interpreter start-up, library imports and annotation
+parsing before it does any work; the daemon pays them once, so a request for
+a small account only costs the enrichment and the workbook itself.
+
+    python report_daemon.py serve --annotations PowerPipeControls_Annotations.xlsx
+    python report_daemon.py submit annotate scan_a.csv -o out
+    python report_daemon.py submit report scan_a.csv -o out
+    curl -s -X POST localhost:8765/annotate -H 'Content-Type: application/json' \
+        -H "Authorization: Bearer $(cat ~/.cache/powerpipe_reports/daemon_token)" \
+        -d '{"input_file": "/data/scan_a.csv", "output_dir": "/data/out"}'
+
+Endpoints (JSON in, JSON out):
+
+    GET  /health     uptime, request counts, cached annotation files
+    POST /annotate   create_one annotate: {input_file, output_dir, annotations}
+    POST /report     h.py comprehensive report: {input_file, output_dir, annotations}
+    POST /reload     drop the cached annotations; they are re-read on next use
+    POST /query      control priority lists: {files, priority, service, text, columns, limit}
+
+With --workers N the daemon also runs a job_queue worker pool:
+
+    POST /jobs       queue a job: {kind, params, submitter, max_attempts}
+    GET  /jobs       recent jobs
+    GET  /jobs/<id>  one job's status and result
+
+Paths are resolved by the daemon, so clients should send absolute paths
+(submit does this). The server only listens on localhost by default, and
+every request must carry the shared token (Authorization: Bearer <token>)
+and a Host header naming the address the daemon is bound to; POST bodies
+must be sent as application/json. The token is REPORT_DAEMON_TOKEN, or the
+contents of REPORT_DAEMON_TOKEN_FILE (default ~/.cache/powerpipe_reports/
+daemon_token), which serve creates with a random token when it is missing.
+Together these keep web pages in a local browser, including DNS rebinding
+attacks, from driving the daemon.
+"""
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import job_queue
+from control_index import ControlIndex
+from control_query import DEFAULT_FILES, load_catalog
+from report_io import XLSX_CACHE_DIR
+from run_profile import profiled
+from script_loader import load_stage
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('REPORT_DAEMON_PORT', 8765))
+DEFAULT_ANNOTATIONS = "PowerPipeControls_Annotations.xlsx"
+TOKEN_FILE = os.environ.get('REPORT_DAEMON_TOKEN_FILE', os.path.join(XLSX_CACHE_DIR, 'daemon_token'))
+LOOPBACK_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+def load_token(path=TOKEN_FILE):
+    """
+    The shared request token: REPORT_DAEMON_TOKEN, else the token file's contents, else None
+    """
+    token = os.environ.get('REPORT_DAEMON_TOKEN')
+    if token:
+        return token.strip()
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def ensure_token(path=TOKEN_FILE):
+    """
+    The shared token, creating the token file (readable by the owner only) with
+    a random token when there is none yet
+    """
+    token = load_token(path)
+    if token:
+        return token
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another daemon created it first; use theirs
+        return load_token(path)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+
+def allowed_hosts(host):
+    """
+    Host header names accepted for a daemon bound to host
+    """
+    names = {host.lower()}
+    if host in LOOPBACK_HOSTS:
+        names |= LOOPBACK_HOSTS
+    elif host in ('', '0.0.0.0', '::'):
+        names |= LOOPBACK_HOSTS | {socket.gethostname().lower(), socket.getfqdn().lower()}
+    return names
+
+
+class AnnotationCache:
+    """
+    Loaded annotation databases, with their control title index, by path. An entry
+    is reloaded when the file's modification time changes, so edits to the workbook
+    are picked up.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != mtime:
+                df = load_stage('annotate').load_priority_database(path)
+                # Build the normalized title index now rather than on the first request
+                ControlIndex.for_annotations(df)
+                entry = self._entries[path] = (mtime, df)
+        return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def status(self):
+        with self._lock:
+            return {path: len(df) for path, (_, df) in self._entries.items()}
+
+
+class ReportDaemon:
+    """
+    The work behind the endpoints; shared by all request threads
+    """
+
+    def __init__(self, annotations=DEFAULT_ANNOTATIONS, queue_db=None):
+        self.annotations = annotations
+        self.queue_db = queue_db
+        self.cache = AnnotationCache()
+        self.started_at = time.time()
+        self.counts = {'ok': 0, 'error': 0}
+        self._counts_lock = threading.Lock()
+
+    def warm(self):
+        """
+        Import the libraries and scripts and load the default annotations up front
+        """
+        import pandas  # noqa: F401
+        import xlsxwriter  # noqa: F401
+
+        for stage in ('annotate', 'report'):
+            load_stage(stage)
+        if os.path.exists(self.annotations):
+            self.cache.get(self.annotations)
+            print(f"Annotations loaded from {self.annotations}")
+        if all(os.path.exists(path) for path in DEFAULT_FILES):
+            load_catalog()
+
+    def record(self, ok):
+        with self._counts_lock:
+            self.counts['ok' if ok else 'error'] += 1
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'requests': dict(self.counts),
+            'annotations': self.cache.status(),
+        }
+
+    def annotate(self, input_file, output_dir=None, annotations=None):
+        create_one = load_stage('annotate')
+        df_priority = self.cache.get(annotations or self.annotations)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        report_file, intermediate_file = create_one.annotate_file(input_file, df_priority, output_dir)
+        return {'output': report_file, 'intermediate': intermediate_file}
+
+    def report(self, input_file, output_dir=None, annotations=None):
+        h = load_stage('report')
+        annotations = annotations or self.annotations
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        reporter = h.AWSComplianceReporter(input_file, annotations, priority_df=self.cache.get(annotations))
+        return {'output': reporter.generate_comprehensive_report(output_dir)}
+
+    def query(self, files=None, priority=None, service=None, text=None, columns=None, limit=100):
+        rows = load_catalog(files).query(priority, service, text, columns)
+        shown = rows.head(limit) if limit else rows
+        # NaN is not valid JSON
+        records = shown.astype(object).where(shown.notna(), None).to_dict('records')
+        return {'count': len(rows), 'rows': records}
+
+    def reload(self):
+        self.cache.clear()
+        return {'status': 'reloaded'}
+
+    def submit_job(self, kind, params, submitter=None, max_attempts=job_queue.DEFAULT_MAX_ATTEMPTS):
+        conn = job_queue.connect(self.queue_db)
+        try:
+            return {'job_id': job_queue.submit(conn, kind, params, submitter, max_attempts)}
+        finally:
+            conn.close()
+
+    def jobs(self, job_id=None):
+        conn = job_queue.connect(self.queue_db)
+        try:
+            return job_queue.job_status(conn, job_id)
+        finally:
+            conn.close()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'ReportDaemon/1.0'
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _check_request(self):
+        """
+        Reject requests from anywhere but a client holding the token and
+        talking to the bound address. Sends the error and returns False.
+        """
+        try:
+            host = urllib.parse.urlsplit(f"//{self.headers.get('Host', '')}")
+            port = host.port
+        except ValueError:
+            port = None
+        if host.hostname not in self.server.allowed_hosts or port != self.server.server_port:
+            self._send(403, {'error': "Host not allowed"})
+            return False
+        if self.command == 'POST' and self.headers.get_content_type() != 'application/json':
+            self._send(415, {'error': "Request body must be application/json"})
+            return False
+        expected = f"Bearer {self.server.token}"
+        if not hmac.compare_digest(self.headers.get('Authorization', '').encode(), expected.encode()):
+            self._send(401, {'error': "Missing or wrong token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._check_request():
+            return
+        daemon = self.server.report_daemon
+        path = self.path.rstrip('/')
+        if path == '/health':
+            self._send(200, daemon.health())
+        elif path == '/jobs' and daemon.queue_db:
+            self._send(200, {'jobs': daemon.jobs()})
+        elif path.startswith('/jobs/') and daemon.queue_db and path[len('/jobs/'):].isdigit():
+            job = daemon.jobs(int(path[len('/jobs/'):]))
+            self._send(200 if job else 404, job or {'error': f"No job {path[len('/jobs/'):]}"})
+        else:
+            self._send(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if not self._check_request():
+            return
+        daemon = self.server.report_daemon
+        handlers = {
+            '/annotate': daemon.annotate,
+            '/report': daemon.report,
+            '/reload': daemon.reload,
+            '/query': daemon.query,
+        }
+        if daemon.queue_db:
+            handlers['/jobs'] = daemon.submit_job
+        handler = handlers.get(self.path.rstrip('/'))
+        if handler is None:
+            self._send(404, {'error': f"Unknown endpoint {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            self._send(400, {'error': f"Invalid JSON body: {e}"})
+            return
+
+        start = time.perf_counter()
+        try:
+            result = handler(**params)
+        except TypeError as e:
+            daemon.record(False)
+            self._send(400, {'error': str(e)})
+            return
+        except SystemExit:
+            # The loaders in h.py call sys.exit(1) on bad input
+            daemon.record(False)
+            self._send(500, {'error': "Stage exited with an error"})
+            return
+        except Exception as e:
+            daemon.record(False)
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        daemon.record(True)
+        result['seconds'] = round(time.perf_counter() - start, 4)
+        self._send(200, result)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, annotations=DEFAULT_ANNOTATIONS, warm=True,
+          workers=0, queue_db=job_queue.DEFAULT_DB, token_file=TOKEN_FILE):
+    """
+    Run the daemon until interrupted. With workers > 0 a job queue worker pool runs alongside.
+    """
+    token = ensure_token(token_file)
+    pool = None
+    if workers:
+        # Start the pool before the HTTP threads, so the forked workers are clean
+        pool = job_queue.WorkerPool(queue_db, workers, annotations)
+        pool.start()
+    daemon = ReportDaemon(annotations, queue_db if workers else None)
+    if warm:
+        daemon.warm()
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.report_daemon = daemon
+    server.token = token
+    server.allowed_hosts = allowed_hosts(host)
+    job_queue.stop_on_sigterm()
+    print(f"Report daemon listening on http://{host}:{server.server_port} "
+          f"(token from {'REPORT_DAEMON_TOKEN' if os.environ.get('REPORT_DAEMON_TOKEN') else token_file})")
+    try:
+        if pool is None:
+            server.serve_forever()
+        else:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            while True:
+                time.sleep(2)
+                pool.check()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        if pool is not None:
+            server.shutdown()
+            pool.stop()
+        server.server_close()
+
+
+def submit(endpoint, payload=None, url=None, timeout=3600, token=None):
+    """
+    Send one request to a running daemon, with the shared token (load_token()
+    unless given). Returns the decoded JSON response.
+    """
+    url = url or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+    data = None if payload is None else json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    token = token or load_token()
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    request = urllib.request.Request(f"{url}/{endpoint.lstrip('/')}", data=data, headers=headers,
+                                     method='GET' if payload is None else 'POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b'{}') or {'error': str(e)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep the report pipeline warm and serve report jobs over HTTP.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sub = subparsers.add_parser('serve', help="Start the daemon")
+    sub.add_argument('--host', default=DEFAULT_HOST)
+    sub.add_argument('--port', type=int, default=DEFAULT_PORT)
+    sub.add_argument('--annotations', default=DEFAULT_ANNOTATIONS,
+                     help="Annotations workbook loaded at start-up and used when a request names none")
+    sub.add_argument('--no-warm', action='store_true', help="Load libraries and annotations on first use")
+    sub.add_argument('--workers', type=int, default=0, help="Also run this many job queue workers")
+    sub.add_argument('--queue-db', default=job_queue.DEFAULT_DB)
+    sub.add_argument('--token-file', default=TOKEN_FILE,
+                     help="File holding the shared request token; created when missing")
+
+    sub = subparsers.add_parser('submit', help="Send a job to a running daemon")
+    sub.add_argument('endpoint', choices=['annotate', 'report', 'health', 'reload'])
+    sub.add_argument('input_file', nargs='?')
+    sub.add_argument('-o', '--output-dir')
+    sub.add_argument('--annotations')
+    sub.add_argument('--url', default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    sub.add_argument('--token-file', default=TOKEN_FILE, help="File holding the shared request token")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.host, args.port, args.annotations, warm=not args.no_warm,
+              workers=args.workers, queue_db=args.queue_db, token_file=args.token_file)
+        return 0
+
+    if args.endpoint == 'health':
+        result = submit('health', url=args.url, token=load_token(args.token_file))
+    elif args.endpoint == 'reload':
+        result = submit('reload', {}, url=args.url, token=load_token(args.token_file))
+    else:
+        if not args.input_file:
+            parser.error(f"{args.endpoint} needs an input file")
+        payload = {'input_file': os.path.abspath(args.input_file),
+                   'output_dir': os.path.abspath(args.output_dir) if args.output_dir else None}
+        if args.annotations:
+            payload['annotations'] = os.path.abspath(args.annotations)
+        result = submit(args.endpoint, payload, url=args.url, token=load_token(args.token_file))
+    print(json.dumps(result, indent=2))
+    return 1 if 'error' in result else 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -0,0 +1,571 @@
+import codecs
+import hashlib
+import os
+
+# pandas and pyarrow are imported inside the functions that use them, so
+# importing this module (and every script built on it) stays cheap.
+
+# Columnar intermediate formats used to hand data between pipeline stages.
+# CSV/Excel are only written at the final presentation step.
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+COLUMNAR_EXTENSIONS = PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+
+# Inputs larger than this are trimmed with a streaming copy instead of a full load
+STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
+
+# Explicit types for the columns of a Powerpipe export. Everything here is text;
+# account_id in particular must never be parsed as a number (leading zeros).
+# Columns that are not listed (e.g. priority, compliance tags) are inferred.
+POWERPIPE_DTYPES = {
+    'group_id': str,
+    'title': str,
+    'description': str,
+    'control_id': str,
+    'control_title': str,
+    'control_description': str,
+    'reason': str,
+    'resource': str,
+    'status': str,
+    'severity': str,
+    'account_id': str,
+    'region': str,
+    'Recommendation Steps/Approach': str,
+    'COST': str,
+}
+
+# Bytes inspected by detect_encoding instead of decoding the whole file
+ENCODING_SAMPLE_BYTES = 1024 * 1024
+# Reread with this when a file that sampled as UTF-8 has a bad byte further on
+# (cp1252 exports such as PowerPipeControls_PRC.csv); it decodes any byte
+FALLBACK_ENCODING = 'ISO-8859-1'
+
+# CSV reader backend, overridable with the REPORT_CSV_ENGINE environment variable
+DEFAULT_CSV_ENGINE = os.environ.get('REPORT_CSV_ENGINE', 'pyarrow')
+
+# Parsed workbooks are cached here as Parquet, keyed by the SHA-256 of the xlsx file
+XLSX_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR',
+                                os.path.join(os.path.expanduser('~'), '.cache', 'powerpipe_reports'))
+
+
+def is_columnar(path):
+    """
+    Return True if the path points to a Parquet or Arrow IPC intermediate file
+    """
+    return str(path).lower().endswith(COLUMNAR_EXTENSIONS)
+
+
+def with_extension(path, extension):
+    """
+    Swap the extension of a path, e.g. report.csv -> report.parquet
+    """
+    if not extension.startswith('.'):
+        extension = f".{extension}"
+    return f"{os.path.splitext(path)[0]}{extension}"
+
+
+def _filters_to_expression(filters):
+    """
+    Convert a list of (column, op, value) tuples into a pyarrow expression.
+    An expression object is passed through unchanged.
+    """
+    import pyarrow.compute as pc
+
+    if filters is None or isinstance(filters, pc.Expression):
+        return filters
+
+    expression = None
+    for column, op, value in filters:
+        field = pc.field(column)
+        if op in ('==', '='):
+            term = field == value
+        elif op == '!=':
+            term = field != value
+        elif op == '<':
+            term = field < value
+        elif op == '<=':
+            term = field <= value
+        elif op == '>':
+            term = field > value
+        elif op == '>=':
+            term = field >= value
+        elif op == 'in':
+            term = field.isin(list(value))
+        elif op == 'not in':
+            term = ~field.isin(list(value))
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def read_columnar(path, columns=None, filters=None):
+    """
+    Read a Parquet/Arrow intermediate file with column projection and predicate pushdown
+
+    Args:
+        path (str): Path to the .parquet/.arrow/.feather file
+        columns (list, optional): Only these columns are read; missing ones are ignored
+        filters (list, optional): Row predicates such as [('status', '==', 'alarm')]
+
+    Returns:
+        pd.DataFrame: Loaded dataframe
+    """
+    import pyarrow.dataset as ds
+
+    file_format = 'parquet' if str(path).lower().endswith(PARQUET_EXTENSIONS) else 'ipc'
+    dataset = ds.dataset(path, format=file_format)
+    if columns is not None:
+        columns = [col for col in columns if col in dataset.schema.names]
+    table = dataset.to_table(columns=columns, filter=_filters_to_expression(filters))
+    return table.to_pandas()
+
+
+def to_arrow_table(df, schema=None):
+    """
+    Convert a DataFrame to a pyarrow Table for the columnar files.
+    With schema (e.g. the file being rewritten), columns it lists are cast
+    back to its types where the values allow, so a read-modify-write keeps
+    the file's schema.
+    """
+    import pyarrow as pa
+
+    # Powerpipe exports can mix numbers and text in one column (e.g. priority 1/"High");
+    # only those columns are stored as strings, everything else keeps its type
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None:
+        for i, field in enumerate(table.schema):
+            if field.name not in schema.names or schema.field(field.name).type == field.type:
+                continue
+            try:
+                table = table.set_column(i, schema.field(field.name), table.column(i).cast(schema.field(field.name).type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                # The values no longer fit the old type; keep the new one
+                pass
+    return table
+
+
+def columnar_schema(path):
+    """
+    Arrow schema of a Parquet or Arrow IPC file, without reading its rows
+    """
+    import pyarrow.dataset as ds
+
+    file_format = 'parquet' if str(path).lower().endswith(PARQUET_EXTENSIONS) else 'ipc'
+    return ds.dataset(path, format=file_format).schema
+
+
+def write_columnar(df, path, schema=None):
+    """
+    Write a DataFrame as a Parquet or Arrow IPC intermediate file, keeping
+    the column types of schema where given (see to_arrow_table)
+    """
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    table = to_arrow_table(df, schema)
+    if str(path).lower().endswith(PARQUET_EXTENSIONS):
+        pq.write_table(table, path, compression='zstd')
+    else:
+        feather.write_feather(table, path, compression='lz4')
+    return path
+
+
+def detect_encoding(path, sample_bytes=ENCODING_SAMPLE_BYTES):
+    """
+    Detect the text encoding of a file from a sample of its first bytes.
+    Returns 'utf-8' (the fast path), 'utf-8-sig' for a BOM, or 'ISO-8859-1'.
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False tolerates a multi-byte character cut off at the end of the sample
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'ISO-8859-1'
+
+
+def _read_csv_pandas(path, columns=None, dtypes=None, encoding='utf-8'):
+    """
+    Single-threaded pandas C parser
+    """
+    import pandas as pd
+
+    usecols = None if columns is None else (lambda col: col in set(columns))
+    return pd.read_csv(path, usecols=usecols, dtype=dtypes, encoding=encoding, low_memory=False)
+
+
+def _read_csv_pyarrow(path, columns=None, dtypes=None, encoding='utf-8'):
+    """
+    Multithreaded Arrow CSV parser; blocks are parsed in parallel on all cores.
+    UTF-8 input is parsed without any transcoding step.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    read_options = pv.ReadOptions(use_threads=True, encoding=encoding)
+    # Recommendation text and reasons can contain line breaks inside quotes
+    parse_options = pv.ParseOptions(newlines_in_values=True)
+
+    header = read_header(path, encoding=encoding)
+    column_types = {col: pa.string() for col, dtype in (dtypes or {}).items()
+                    if col in header and dtype in (str, 'str', 'string')}
+    include_columns = None if columns is None else [col for col in header if col in set(columns)]
+    convert_options = pv.ConvertOptions(column_types=column_types, include_columns=include_columns,
+                                        strings_can_be_null=True)
+
+    table = pv.read_csv(path, read_options=read_options, parse_options=parse_options,
+                        convert_options=convert_options)
+    return table.to_pandas()
+
+
+# Pluggable CSV reader backends: name -> reader(path, columns, dtypes, encoding)
+CSV_ENGINES = {
+    'pandas': _read_csv_pandas,
+    'pyarrow': _read_csv_pyarrow,
+}
+
+
+def register_csv_engine(name, reader):
+    """
+    Register an additional CSV reader backend
+    """
+    CSV_ENGINES[name] = reader
+
+
+def read_csv(path, columns=None, dtypes=POWERPIPE_DTYPES, engine=None, encoding=None):
+    """
+    Read a Powerpipe CSV export with the configured reader backend
+
+    Args:
+        path (str): CSV file path
+        columns (list, optional): Only these columns are parsed
+        dtypes (dict, optional): Explicit column types, defaults to the Powerpipe schema
+        engine (str, optional): 'pyarrow' (multithreaded, default) or 'pandas'
+        encoding (str, optional): Detected from a sample of the file when omitted
+
+    Returns:
+        pd.DataFrame: Loaded dataframe
+    """
+    engine = engine or DEFAULT_CSV_ENGINE
+    if engine == 'pyarrow':
+        try:
+            import pyarrow.csv  # noqa: F401
+        except ImportError:
+            engine = 'pandas'
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unknown CSV engine: {engine}")
+
+    encoding = encoding or detect_encoding(path)
+    try:
+        return _read_csv_with(engine, path, columns, dtypes, encoding)
+    except UnicodeDecodeError:
+        # Only the first ENCODING_SAMPLE_BYTES were checked; the rest of the file
+        # is not UTF-8 after all, so read it all again as Latin-1
+        if encoding == FALLBACK_ENCODING:
+            raise
+        return _read_csv_with(engine, path, columns, dtypes, FALLBACK_ENCODING)
+
+
+def _read_csv_with(engine, path, columns, dtypes, encoding):
+    if engine != 'pyarrow':
+        return CSV_ENGINES[engine](path, columns=columns, dtypes=dtypes, encoding=encoding)
+
+    import pyarrow as pa
+
+    try:
+        return CSV_ENGINES[engine](path, columns=columns, dtypes=dtypes, encoding=encoding)
+    except pa.ArrowInvalid:
+        # Hand-edited lookup files (e.g. centralfile.csv) have short rows that
+        # Arrow rejects; the pandas parser pads them with missing values.
+        # Invalid UTF-8 also lands here and surfaces as UnicodeDecodeError from pandas
+        return _read_csv_pandas(path, columns=columns, dtypes=dtypes, encoding=encoding)
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file's contents, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_excel_sheet(path, sheet_name=0):
+    """
+    Parse one worksheet with the fastest available engine.
+    python-calamine (Rust) is used when installed; otherwise openpyxl in
+    read-only streaming mode, which walks the sheet XML row by row.
+    """
+    import pandas as pd
+
+    try:
+        import python_calamine  # noqa: F401
+        return pd.read_excel(path, sheet_name=sheet_name, engine='calamine')
+    except ImportError:
+        pass
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            worksheet = workbook.worksheets[sheet_name]
+        else:
+            worksheet = workbook[sheet_name]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = [f"Unnamed: {i}" if name is None else str(name) for i, name in enumerate(header)]
+        data = [row for row in rows if any(value is not None for value in row)]
+    finally:
+        workbook.close()
+    return pd.DataFrame(data, columns=columns)
+
+
+def read_excel(path, columns=None, sheet_name=0, use_cache=True):
+    """
+    Read an Excel workbook through the fast xlsx path.
+
+    The first read converts the sheet to a Parquet intermediate in
+    XLSX_CACHE_DIR, keyed by the file hash; later reads of the same
+    workbook load the cached Parquet with column projection instead of
+    parsing the xlsx again.
+    """
+    if not use_cache:
+        df = _read_excel_sheet(path, sheet_name=sheet_name)
+        if columns is not None:
+            df = df[[col for col in columns if col in df.columns]]
+        return df
+
+    cache_name = f"{file_hash(path)}_{sheet_name}"
+    cache_file = os.path.join(XLSX_CACHE_DIR, f"{cache_name}.parquet")
+    if not os.path.exists(cache_file):
+        df = _read_excel_sheet(path, sheet_name=sheet_name)
+        os.makedirs(XLSX_CACHE_DIR, exist_ok=True)
+        # Write to a temporary name first so a concurrent reader never sees a partial file
+        tmp_file = os.path.join(XLSX_CACHE_DIR, f"{cache_name}.{os.getpid()}.tmp.parquet")
+        write_columnar(df, tmp_file)
+        os.replace(tmp_file, cache_file)
+    return read_columnar(cache_file, columns=columns)
+
+
+def should_stream(path):
+    """
+    Return True if the file is large enough to be copied in chunks rather than loaded
+    """
+    if str(path).lower().endswith(('.xlsx', '.xls')):
+        return False
+    return os.path.getsize(path) > STREAMING_THRESHOLD_BYTES
+
+
+def read_header(path, encoding=None):
+    """
+    Return the column names of a pipeline file without loading its rows
+    """
+    if is_columnar(path):
+        return list(columnar_schema(path).names)
+    if path.endswith('.csv'):
+        import pandas as pd
+
+        return list(pd.read_csv(path, nrows=0, encoding=encoding or detect_encoding(path)).columns)
+    if path.endswith(('.xlsx', '.xls')):
+        return list(read_excel(path).columns)
+    raise ValueError("Unsupported file type. Use CSV, Excel, Parquet or Arrow.")
+
+
+def read_report(path, columns=None, filters=None):
+    """
+    Read a pipeline file (CSV, Excel, Parquet or Arrow) into a DataFrame.
+    Only the requested columns are parsed; they are returned in the requested
+    order and missing ones are skipped. Filters are pushed down for the
+    columnar formats and applied right after loading for CSV/Excel.
+    """
+    if is_columnar(path):
+        return read_columnar(path, columns=columns, filters=filters)
+
+    wanted = None
+    if columns is not None:
+        # Filter columns must be parsed even when they are not projected
+        wanted = set(columns) | {column for column, _, _ in (filters or [])}
+
+    if path.endswith('.csv'):
+        df = read_csv(path, columns=wanted)
+    elif path.endswith(('.xlsx', '.xls')):
+        df = read_excel(path, columns=None if wanted is None else list(wanted))
+    else:
+        raise ValueError("Unsupported file type. Use CSV, Excel, Parquet or Arrow.")
+
+    if filters is not None:
+        df = apply_filters(df, filters)
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+
+def stream_columns(src, dst, columns, chunksize=100_000, encoding=None):
+    """
+    Copy only the given columns from src to dst in a single pass with bounded memory.
+
+    CSV and columnar inputs are read chunk by chunk and every chunk is appended
+    to dst straight away, so a multi-GB export never has to fit in memory.
+    CSV values are carried through as text, exactly as they appear in the source.
+
+    Args:
+        src (str): Source CSV/Parquet/Arrow file
+        dst (str): Destination CSV/Parquet/Arrow file
+        columns (list): Columns to keep, in output order
+        chunksize (int): Rows per chunk
+        encoding (str, optional): CSV encoding, detected from a sample when omitted
+
+    Returns:
+        int: Number of rows copied
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    import pyarrow.parquet as pq
+
+    if is_columnar(src):
+        import pyarrow.dataset as ds
+
+        file_format = 'parquet' if str(src).lower().endswith(PARQUET_EXTENSIONS) else 'ipc'
+        scanner = ds.dataset(src, format=file_format).scanner(columns=columns, batch_size=chunksize)
+        chunks = (pa.Table.from_batches([batch], schema=scanner.projected_schema)
+                  for batch in scanner.to_batches())
+    elif src.endswith('.csv'):
+        encoding = encoding or detect_encoding(src)
+        frames = pd.read_csv(src, usecols=columns, dtype=str, keep_default_na=False,
+                             encoding=encoding, chunksize=chunksize)
+        chunks = (pa.Table.from_pandas(frame[columns], preserve_index=False) for frame in frames)
+    else:
+        raise ValueError("Streaming copy supports CSV, Parquet or Arrow input.")
+
+    rows = 0
+    writer = None
+    try:
+        for table in chunks:
+            if is_columnar(dst):
+                if writer is None:
+                    if str(dst).lower().endswith(PARQUET_EXTENSIONS):
+                        writer = pq.ParquetWriter(dst, table.schema, compression='zstd')
+                    else:
+                        writer = pa.ipc.new_file(dst, table.schema)
+                writer.write_table(table)
+            elif dst.endswith('.csv'):
+                table.to_pandas().to_csv(dst, mode='w' if rows == 0 else 'a',
+                                         header=rows == 0, index=False)
+            else:
+                raise ValueError("Streaming copy writes CSV, Parquet or Arrow output.")
+            rows += table.num_rows
+    except UnicodeDecodeError:
+        if encoding in (None, FALLBACK_ENCODING):
+            raise
+        # A bad byte past the sampled part: start over, rewriting dst from the top
+        if writer is not None:
+            writer.close()
+            writer = None
+        return stream_columns(src, dst, columns, chunksize, FALLBACK_ENCODING)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # An empty source still produces a file with the header
+    if rows == 0 and dst.endswith('.csv'):
+        pd.DataFrame(columns=columns).to_csv(dst, index=False)
+    return rows
+
+
+def apply_filters(df, filters):
+    """
+    Apply (column, op, value) filters to an in-memory DataFrame
+    """
+    import pandas as pd
+
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        series = df[column]
+        if op in ('==', '='):
+            mask &= series == value
+        elif op == '!=':
+            mask &= series != value
+        elif op == '<':
+            mask &= series < value
+        elif op == '<=':
+            mask &= series <= value
+        elif op == '>':
+            mask &= series > value
+        elif op == '>=':
+            mask &= series >= value
+        elif op == 'in':
+            mask &= series.isin(list(value))
+        elif op == 'not in':
+            mask &= ~series.isin(list(value))
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return df[mask]
+
+
+def write_report(df, path, schema=None):
+    """
+    Write a DataFrame to CSV, Excel, Parquet or Arrow based on the file extension.
+    schema only applies to Parquet/Arrow (see to_arrow_table).
+    """
+    if is_columnar(path):
+        write_columnar(df, path, schema)
+    elif path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    elif path.endswith(('.xlsx', '.xls')):
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError("Unsupported file type. Use CSV, Excel, Parquet or Arrow.")
+    return path
+
+
+def write_csv_chunks(chunks, path):
+    """
+    Write an iterable of DataFrames with the same columns to one CSV file.
+    Uses pyarrow's multithreaded CSV writer when installed, otherwise appends
+    with pandas. Returns the number of rows written.
+    """
+    rows = 0
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        for index, df in enumerate(chunks):
+            df.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+            rows += len(df)
+        return rows
+
+    writer = schema = None
+    try:
+        for df in chunks:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa_csv.CSVWriter(path, schema)
+            elif table.schema != schema:
+                # e.g. a column that is all null in one chunk
+                table = table.cast(schema)
+            writer.write_table(table)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
@@ -0,0 +1,170 @@
+"""
+Run statistics for the report overview document.
+
+The overview used to carry totals typed in by hand. summarize_report()
+computes them from the report DataFrame a stage already has in memory:
+rows and open issues (status 'alarm') per priority, open issues per service
+category, the services and controls with the most open issues. The result is
+plain JSON, written next to the stage's workbook as <report>_summary.json, so
+the overview stage reads a few kilobytes instead of reloading the workbook:
+
+    summary = summarize_report(df, report_file)
+    write_summary(summary, final_report_file)     # -> <report>_summary.json
+
+    python report_summary.py reports/scan_final_optimized_report.csv
+"""
+import argparse
+import json
+import os
+import sys
+
+from run_profile import profiled
+from service_categories import categorize
+
+OPEN_STATUS = 'alarm'
+TOP_SERVICES = 10
+TOP_CONTROLS = 25
+
+
+def priority_label(value):
+    """
+    Priority as text: 1.0 (a CSV round trip) becomes '1', missing becomes 'None'
+    """
+    if isinstance(value, float):
+        if value != value:
+            return 'None'
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip()
+
+
+def _counts(series):
+    """
+    Value counts as {priority label: count}, in priority order
+    """
+    counts = {}
+    for value, count in series.value_counts(dropna=False).items():
+        label = priority_label(value)
+        counts[label] = counts.get(label, 0) + int(count)
+    return dict(sorted(counts.items()))
+
+
+def summarize_report(df, report_file=None, top_services=TOP_SERVICES, top_controls=TOP_CONTROLS):
+    """
+    Aggregate a report for the overview document.
+
+    Args:
+        df (pd.DataFrame): Report with title, control_title, status and priority columns
+        report_file (str, optional): Report the rows came from, recorded as the source
+        top_services (int): Services listed by open issues
+        top_controls (int): Controls listed by open issues
+
+    Returns:
+        dict: JSON-serializable statistics
+    """
+    import pandas as pd
+
+    priority = df['priority'] if 'priority' in df.columns else pd.Series('None', index=df.index)
+    priority = priority.map(priority_label)
+    is_open = df['status'].eq(OPEN_STATUS) if 'status' in df.columns else pd.Series(False, index=df.index)
+    open_df = df[is_open]
+    open_priority = priority[is_open]
+
+    # Open issues per category, every category listed even when it has none
+    categories = categorize(df['title'])
+    open_categories = categories[is_open]
+    category_rows = []
+    for category in categories.cat.categories:
+        in_category = categories == category
+        category_rows.append({
+            'category': category,
+            'services': int(df.loc[in_category, 'title'].nunique()),
+            'controls': int(df.loc[in_category, 'control_title'].nunique()),
+            'open_issues': int((open_categories == category).sum()),
+        })
+
+    # Services with the most open issues, split by priority
+    by_service = pd.crosstab(open_df['title'], open_priority) if len(open_df) else pd.DataFrame()
+    services = []
+    if len(by_service):
+        totals = by_service.sum(axis=1).sort_values(ascending=False, kind='stable')
+        for service in totals.index[:top_services]:
+            services.append({
+                'service': service,
+                'open_issues': int(totals[service]),
+                'by_priority': {str(label): int(count) for label, count in by_service.loc[service].items() if count},
+            })
+
+    # Controls with the most open issues
+    controls = []
+    if len(open_df):
+        grouped = (pd.DataFrame({'service': open_df['title'], 'control_title': open_df['control_title'],
+                                 'priority': open_priority})
+                   .groupby(['service', 'control_title', 'priority'], sort=False).size()
+                   .sort_values(ascending=False, kind='stable').head(top_controls))
+        controls = [{'service': service, 'control_title': control_title, 'priority': label,
+                     'open_issues': int(count)}
+                    for (service, control_title, label), count in grouped.items()]
+
+    return {
+        'source': os.path.basename(report_file) if report_file else None,
+        'rows': int(len(df)),
+        'controls': int(df['control_title'].nunique()) if 'control_title' in df.columns else 0,
+        'open_issues': int(is_open.sum()),
+        'priority_counts': _counts(priority),
+        'open_by_priority': _counts(open_priority),
+        'categories': category_rows,
+        'top_services': services,
+        'top_controls': controls,
+    }
+
+
+def summary_path(report_path):
+    return f"{os.path.splitext(report_path)[0]}_summary.json"
+
+
+def write_summary(summary, report_path):
+    """
+    Write the summary as <report name>_summary.json next to the report.
+    Returns the path of the JSON file.
+    """
+    path = summary_path(report_path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return path
+
+
+def load_summary(path):
+    """
+    Summary from a _summary.json file, or computed from a report file
+    (CSV, Excel, Parquet or Arrow) when given one
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    from report_io import read_report
+
+    return summarize_report(read_report(path), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the overview statistics of a report.")
+    parser.add_argument('report_file', help="Report (CSV, Excel, Parquet or Arrow)")
+    parser.add_argument('-o', '--output', help="Write the JSON here instead of <report>_summary.json")
+    args = parser.parse_args(argv)
+
+    summary = load_summary(args.report_file)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        path = args.output
+    else:
+        path = write_summary(summary, args.report_file)
+    counts = ', '.join(f"priority {label}: {count}" for label, count in summary['priority_counts'].items())
+    print(f"{summary['rows']} rows ({counts}), {summary['open_issues']} open issues. Summary saved as {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -0,0 +1,246 @@
+"""
+Lightweight per-stage instrumentation for the report scripts.
+
+    profile = RunProfile('create_one.annotate')
+    with profile.stage('load_input') as stage:
+        df = load_input_file(input_file)
+        stage['rows'] = len(df)
+    with profile.excel_writer(final_report_file, engine='xlsxwriter') as writer:
+        ...
+    profile.write(final_report_file)   # -> <report>_profile.json
+
+Each stage records wall time, CPU time, rows processed and the change in
+resident memory. Set REPORT_RUN_PROFILE=0 to stop writing the JSON files.
+
+For hot-path detail, entry points are wrapped with profiled():
+
+    if __name__ == "__main__":
+        profiled(main)()
+
+Passing --profile on the command line then runs the whole script under a
+profiler without changing its other arguments:
+
+    python h.py --profile                    # cProfile -> h_<timestamp>.prof
+    python h.py --profile=slow_client.prof   # cProfile stats (python -m pstats / snakeviz)
+    python h.py --profile=slow_client.folded # sampled collapsed stacks (flamegraph.pl / speedscope)
+
+Work done in pool worker processes is not included.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_ENABLED = os.environ.get('REPORT_RUN_PROFILE', '1') != '0'
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB, or None if it cannot be read
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        # Linux without psutil: second field of statm is resident pages
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RunProfile:
+    """
+    Collects stage measurements for one run of a script
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.stages = []
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._rss_start = current_rss_mb()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measure the enclosed block. The yielded dict can be updated, e.g. stage['rows'] = len(df).
+        """
+        record = {'stage': name, 'rows': rows}
+        rss_before = current_rss_mb()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException:
+            record['error'] = True
+            raise
+        finally:
+            rss_after = current_rss_mb()
+            record['wall_s'] = round(time.perf_counter() - wall_start, 4)
+            record['cpu_s'] = round(time.process_time() - cpu_start, 4)
+            record['rss_mb'] = None if rss_after is None else round(rss_after, 1)
+            record['rss_delta_mb'] = None if rss_before is None or rss_after is None \
+                else round(rss_after - rss_before, 1)
+            if record['rows'] and record['wall_s']:
+                record['rows_per_s'] = round(record['rows'] / record['wall_s'])
+            self.stages.append(record)
+
+    @contextmanager
+    def excel_writer(self, path, **kwargs):
+        """
+        pd.ExcelWriter that times building the sheets and saving the workbook as separate stages
+        """
+        import pandas as pd
+
+        writer = pd.ExcelWriter(path, **kwargs)
+        try:
+            with self.stage('build_sheets'):
+                yield writer
+        except BaseException:
+            writer.close()
+            raise
+        with self.stage('save_workbook'):
+            writer.close()
+
+    def summary(self):
+        rss_now = current_rss_mb()
+        return {
+            'run': self.name,
+            'started_at': self.started_at,
+            'wall_s': round(time.perf_counter() - self._wall_start, 4),
+            'cpu_s': round(time.process_time() - self._cpu_start, 4),
+            'rss_start_mb': None if self._rss_start is None else round(self._rss_start, 1),
+            'rss_end_mb': None if rss_now is None else round(rss_now, 1),
+            'python': sys.version.split()[0],
+            'pid': os.getpid(),
+            'stages': self.stages,
+        }
+
+    def write(self, report_path):
+        """
+        Write the profile as <report name>_profile.json next to the report.
+        Returns the JSON path, or None when profiling output is disabled.
+        """
+        if not PROFILE_ENABLED or not report_path:
+            return None
+        profile_path = f"{os.path.splitext(report_path)[0]}_profile.json"
+        with open(profile_path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        return profile_path
+
+
+PROFILE_FLAG = '--profile'
+
+# Extensions written as collapsed stacks; anything else is cProfile stats
+COLLAPSED_EXTENSIONS = ('.folded', '.collapsed')
+PSTATS_EXTENSIONS = ('.prof', '.pstats')
+
+
+def pop_profile_arg(argv=None):
+    """
+    Remove --profile / --profile=PATH / --profile PATH from argv (sys.argv by default).
+    A separate PATH is only taken when it has a profile extension, so positional
+    arguments are never swallowed. Returns the path, '' for the default, or None.
+    """
+    argv = sys.argv if argv is None else argv
+    for index, arg in enumerate(argv[1:], start=1):
+        if arg == PROFILE_FLAG:
+            del argv[index]
+            if index < len(argv) and argv[index].lower().endswith(COLLAPSED_EXTENSIONS + PSTATS_EXTENSIONS):
+                return argv.pop(index)
+            return ''
+        if arg.startswith(PROFILE_FLAG + '='):
+            del argv[index]
+            return arg.split('=', 1)[1]
+    return None
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval and counts identical
+    stacks, in the collapsed format flamegraph tools read ("a;b;c 12").
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def profile_call(output, func, *args, **kwargs):
+    """
+    Run func under a profiler and write the result to output: collapsed stacks
+    for .folded/.collapsed, cProfile stats otherwise. Returns what func returns.
+    """
+    if output.lower().endswith(COLLAPSED_EXTENSIONS):
+        sampler = StackSampler().start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            sampler.write(output)
+            print(f"Collapsed stacks saved as {output} ({sum(sampler.counts.values())} samples)")
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(output)
+        print(f"Profile saved as {output} (view with: python -m pstats {output})")
+
+
+def profiled(main):
+    """
+    Wrap an entry point so that --profile on the command line profiles the call.
+    Without the flag the entry point runs unchanged.
+    """
+    def wrapper(*args, **kwargs):
+        output = pop_profile_arg()
+        if output is None:
+            return main(*args, **kwargs)
+        if not output:
+            script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or main.__name__
+            output = f"{script}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+        return profile_call(output, main, *args, **kwargs)
+
+    wrapper.__name__ = main.__name__
+    wrapper.__doc__ = main.__doc__
+    return wrapper
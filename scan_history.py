@@ -0,0 +1,253 @@
+"""
+Local scan history: ingest every run into SQLite and report what changed.
+
+Each ingested export (raw or enriched) becomes one run. Findings are keyed by
+account_id / resource / control_title, so comparing two scans is an indexed
+join inside SQLite instead of reloading every past workbook. For each account
+in a run the previous scan of that same account, by scan time, is used as
+the baseline, so older exports can be backfilled in any order:
+
+- new: alarm now, not an alarm (or not present) in the previous scan
+- fixed: alarm in the previous scan, not an alarm (or gone) now
+- still_open: alarm in both scans
+
+Accounts scanned for the first time have no baseline and are left out.
+
+    python scan_history.py ingest scan_2024_06.csv scan_2024_07.parquet
+    python scan_history.py runs
+    python scan_history.py delta -o delta.xlsx
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from report_io import file_hash, read_report
+from run_profile import profiled
+
+DEFAULT_DB = os.environ.get('REPORT_HISTORY_DB', 'scan_history.sqlite')
+
+KEY_COLUMNS = ['account_id', 'resource', 'control_title']
+VALUE_COLUMNS = ['title', 'region', 'status', 'severity', 'reason', 'priority']
+
+# A finding counts as open while its status is alarm, like the "unsafe" sheets
+OPEN_STATUS = 'alarm'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_file TEXT NOT NULL,
+    file_hash TEXT NOT NULL UNIQUE,
+    scanned_at TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    account_id TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    control_title TEXT NOT NULL,
+    title TEXT,
+    region TEXT,
+    status TEXT,
+    severity TEXT,
+    reason TEXT,
+    priority TEXT,
+    PRIMARY KEY (run_id, account_id, resource, control_title)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS findings_account_run ON findings (account_id, run_id);
+"""
+
+
+def connect(db_path=DEFAULT_DB):
+    """
+    Open (and create if needed) the history database
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def ingest(conn, report_file, scanned_at=None):
+    """
+    Store one export as a new run. A file that was already ingested (same
+    content hash) is not stored twice. Returns the run id.
+    """
+    digest = file_hash(report_file)
+    existing = conn.execute("SELECT run_id FROM runs WHERE file_hash = ?", (digest,)).fetchone()
+    if existing:
+        print(f"{report_file} already ingested as run {existing[0]}")
+        return existing[0]
+
+    # Only the key and value columns are parsed
+    df = read_report(report_file, columns=KEY_COLUMNS + VALUE_COLUMNS)
+    missing = [column for column in ['control_title', 'status'] if column not in df.columns]
+    if missing:
+        raise KeyError(f"Missing columns: {', '.join(missing)}")
+    for column in KEY_COLUMNS + VALUE_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    df[KEY_COLUMNS] = df[KEY_COLUMNS].fillna('').astype(str)
+    df[VALUE_COLUMNS] = df[VALUE_COLUMNS].astype(object).where(df[VALUE_COLUMNS].notna(), None)
+    df['priority'] = df['priority'].map(lambda value: None if value is None else str(value))
+    df = df.drop_duplicates(KEY_COLUMNS, keep='last')
+
+    if scanned_at is None:
+        scanned_at = datetime.fromtimestamp(os.path.getmtime(report_file)).isoformat(timespec='seconds')
+
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (source_file, file_hash, scanned_at, ingested_at, row_count) VALUES (?, ?, ?, ?, ?)",
+            (os.path.abspath(report_file), digest, scanned_at,
+             datetime.now().isoformat(timespec='seconds'), len(df)))
+        run_id = cursor.lastrowid
+        conn.executemany(
+            f"INSERT INTO findings (run_id, {', '.join(KEY_COLUMNS + VALUE_COLUMNS)}) "
+            f"VALUES ({', '.join(['?'] * (1 + len(KEY_COLUMNS) + len(VALUE_COLUMNS)))})",
+            ((run_id, *row) for row in df[KEY_COLUMNS + VALUE_COLUMNS].itertuples(index=False, name=None)))
+    print(f"Ingested {report_file} as run {run_id} ({len(df)} findings)")
+    return run_id
+
+
+def list_runs(conn):
+    import pandas as pd
+
+    return pd.read_sql_query("SELECT * FROM runs ORDER BY run_id", conn)
+
+
+def latest_run(conn):
+    """
+    The most recent scan, by scan time rather than ingestion order
+    """
+    row = conn.execute("SELECT run_id FROM runs ORDER BY scanned_at DESC, run_id DESC LIMIT 1").fetchone()
+    if row is None:
+        raise ValueError("The history store has no runs yet")
+    return row[0]
+
+
+def delta(conn, run_id=None, baseline_run_id=None):
+    """
+    Compare a run with the previous scan of each of its accounts (or with
+    baseline_run_id). Returns a dict of DataFrames: new, fixed, still_open, summary.
+    """
+    import pandas as pd
+
+    run_id = run_id or latest_run(conn)
+
+    # Baseline run per account of the current run
+    if baseline_run_id is None:
+        conn.execute("DROP TABLE IF EXISTS temp.baseline")
+        # The latest scan of the account taken before this one; exports can be
+        # ingested out of order, so scan time decides, not run_id
+        conn.execute("""
+            CREATE TEMP TABLE baseline AS
+            SELECT account_id, run_id FROM (
+                SELECT a.account_id, (
+                    SELECT r.run_id FROM runs r
+                    WHERE r.scanned_at < (SELECT scanned_at FROM runs WHERE run_id = :run)
+                      AND EXISTS (SELECT 1 FROM findings f WHERE f.account_id = a.account_id AND f.run_id = r.run_id)
+                    ORDER BY r.scanned_at DESC, r.run_id DESC LIMIT 1
+                ) AS run_id
+                FROM (SELECT DISTINCT account_id FROM findings WHERE run_id = :run) a
+            ) WHERE run_id IS NOT NULL
+        """, {'run': run_id})
+    else:
+        conn.execute("DROP TABLE IF EXISTS temp.baseline")
+        conn.execute("""
+            CREATE TEMP TABLE baseline AS
+            SELECT DISTINCT account_id, :base AS run_id FROM findings WHERE run_id = :run
+        """, {'run': run_id, 'base': baseline_run_id})
+
+    current = "SELECT * FROM findings WHERE run_id = :run"
+    previous = "SELECT f.* FROM findings f JOIN baseline b ON f.account_id = b.account_id AND f.run_id = b.run_id"
+    keys = ' AND '.join(f"c.{column} = p.{column}" for column in KEY_COLUMNS)
+    columns = ', '.join(f"c.{column}" for column in KEY_COLUMNS + VALUE_COLUMNS)
+    params = {'run': run_id, 'open': OPEN_STATUS}
+
+    new = pd.read_sql_query(f"""
+        SELECT {columns}, p.status AS previous_status
+        FROM ({current}) c LEFT JOIN ({previous}) p ON {keys}
+        WHERE c.status = :open AND (p.status IS NULL OR p.status != :open)
+          AND c.account_id IN (SELECT account_id FROM baseline)
+    """, conn, params=params)
+
+    fixed = pd.read_sql_query(f"""
+        SELECT {', '.join(f"p.{column}" for column in KEY_COLUMNS + VALUE_COLUMNS)},
+               COALESCE(c.status, 'not in scan') AS current_status
+        FROM ({previous}) p LEFT JOIN ({current}) c ON {keys}
+        WHERE p.status = :open AND (c.status IS NULL OR c.status != :open)
+    """, conn, params=params)
+
+    still_open = pd.read_sql_query(f"""
+        SELECT {columns}, p.run_id AS previous_run
+        FROM ({current}) c JOIN ({previous}) p ON {keys}
+        WHERE c.status = :open AND p.status = :open
+    """, conn, params=params)
+
+    summary = pd.read_sql_query("""
+        SELECT b.account_id, b.run_id AS baseline_run, :run AS run
+        FROM baseline b ORDER BY b.account_id
+    """, conn, params=params)
+    for name, frame in (('new', new), ('fixed', fixed), ('still_open', still_open)):
+        counts = frame.groupby('account_id').size()
+        summary[name] = summary['account_id'].map(counts).fillna(0).astype(int)
+
+    return {'summary': summary, 'new': new, 'fixed': fixed, 'still_open': still_open}
+
+
+def write_delta_report(sheets, output_file):
+    """
+    Write the delta sheets to a workbook
+    """
+    import pandas as pd
+
+    with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+        header_format = writer.book.add_format({'bold': True, 'bg_color': '#4F81BD', 'font_color': 'white'})
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+            for col_num, value in enumerate(frame.columns.values):
+                writer.sheets[name].write(0, col_num, value, header_format)
+    print(f"Delta report saved as {output_file}")
+    return output_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Track Powerpipe scans over time.")
+    parser.add_argument('--db', default=DEFAULT_DB, help="History database (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sub = subparsers.add_parser('ingest', help="Add exports to the history")
+    sub.add_argument('files', nargs='+')
+    sub.add_argument('--scanned-at', help="Scan time (default: file modification time)")
+
+    subparsers.add_parser('runs', help="List ingested runs")
+
+    sub = subparsers.add_parser('delta', help="Write new / fixed / still open sheets")
+    sub.add_argument('--run', type=int, help="Run to report on (default: latest)")
+    sub.add_argument('--against', type=int, help="Baseline run (default: previous scan of each account)")
+    sub.add_argument('-o', '--output', help="Workbook to write (default: scan_delta_<run>_<timestamp>.xlsx)")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        if args.command == 'ingest':
+            for path in args.files:
+                ingest(conn, path, args.scanned_at)
+        elif args.command == 'runs':
+            print(list_runs(conn).to_string(index=False))
+        elif args.command == 'delta':
+            run_id = args.run or latest_run(conn)
+            sheets = delta(conn, run_id, args.against)
+            output = args.output or f"scan_delta_{run_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            write_delta_report(sheets, output)
+            print(sheets['summary'].to_string(index=False))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
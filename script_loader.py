@@ -0,0 +1,141 @@
+"""
+Loads the pipeline scripts for the tools at the repository root, and runs
+them from the command line.
+
+The scripts import the shared modules (report_io, run_profile, ...) from the
+repository root. Run directly, a script finds the root as the nearest parent
+folder holding this file; load_script and run_script put the root on sys.path
+themselves:
+
+    python script_loader.py enrich-non-ai                 # a stage, by name
+    python script_loader.py contains_report_generator_automation/csv_convertor/converter.py --profile
+"""
+import importlib.util
+import os
+import re
+import sys
+
+# Root of the repository; every pipeline script is addressed relative to it
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CONTAINS_DIR = 'contains_report_generator_automation'
+REPORT_MAKER_DIR = os.path.join(CONTAINS_DIR, 'reports', 'report_maker_exel_overview', 'report_maker_exel')
+FILTER_TOOL_DIR = os.path.join(CONTAINS_DIR, 'optimizer_locked', 'priority_seperater_file_tool')
+
+# Pipeline scripts by stage name. Most of the file names are not valid module
+# names (leading digits, spaces), so they are loaded by path rather than imported.
+SCRIPTS = {
+    'annotate': 'create_one.py',
+    'pivot': 'create_one.py',
+    'report': 'h.py',
+    'enrich-non-ai': os.path.join(CONTAINS_DIR, 'opt_non_AI_priority_recommandation_adder.py'),
+    'enrich-ai': os.path.join(CONTAINS_DIR, 'AI_integrated_priority_and_recommandation_adder.py'),
+    'enrich-ai-masked': os.path.join(CONTAINS_DIR, 'AI_integrated_priority_and_recommandation_adder_with_sensitivity_mask.py'),
+    'optimize': os.path.join(REPORT_MAKER_DIR, '1_report_optimizer_PCR.py'),
+    'simplify': os.path.join(REPORT_MAKER_DIR, '2nd_next_step_report_analyser.py'),
+    'charts': os.path.join(REPORT_MAKER_DIR, '3_upgrade_report_exel_create_grapgh.py'),
+    'analyse': os.path.join(REPORT_MAKER_DIR, 'analsis_prog.py'),
+    'filter': os.path.join(FILTER_TOOL_DIR, '3_contol_pcr.py'),
+    'filter-level1': os.path.join(FILTER_TOOL_DIR, 'priority_filter_tool_level1.py'),
+    'filter-level2': os.path.join(FILTER_TOOL_DIR, 'priority_filter_tool_level2.py'),
+    'overview': os.path.join(CONTAINS_DIR, 'reports', 'report_maker_exel_overview',
+                             'report_overview_template_creator', 'dynamic_report_overview.py'),
+    'convert': os.path.join(CONTAINS_DIR, 'csv_convertor', 'converter.py'),
+}
+
+
+def module_name(path):
+    """
+    Build a stable, importable module name for a script path
+    """
+    relative = os.path.relpath(os.path.abspath(path), REPO_ROOT)
+    return 'pipeline_' + re.sub(r'\W', '_', os.path.splitext(relative)[0])
+
+
+def _add_repo_root():
+    # The scripts import report_io and friends from the repository root
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def load_script(path):
+    """
+    Load a script by path and return it as a module.
+
+    The module is registered in sys.modules so its functions can be pickled
+    and sent to worker processes. Loading the same path again returns the
+    cached module.
+    """
+    if not os.path.isabs(path):
+        path = os.path.join(REPO_ROOT, path)
+    name = module_name(path)
+    if name in sys.modules:
+        return sys.modules[name]
+
+    _add_repo_root()
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def load_stage(stage):
+    """
+    Load the script registered for a pipeline stage
+    """
+    if stage not in SCRIPTS:
+        raise ValueError(f"Unknown pipeline stage: {stage}. Expected one of: {', '.join(sorted(SCRIPTS))}")
+    return load_script(SCRIPTS[stage])
+
+
+def script_path(script):
+    """
+    Path of a script given as a stage name, a path relative to the current
+    directory or a path relative to the repository root
+    """
+    if script in SCRIPTS:
+        return os.path.join(REPO_ROOT, SCRIPTS[script])
+    if os.path.exists(script):
+        return os.path.abspath(script)
+    path = os.path.join(REPO_ROOT, script)
+    if not os.path.exists(path):
+        raise ValueError(f"No such script or stage: {script}")
+    return path
+
+
+def run_script(script, args=()):
+    """
+    Run a script as __main__, as `python <script> <args>` would, with the
+    repository root importable
+    """
+    import runpy
+
+    path = script_path(script)
+    _add_repo_root()
+    sys.path.insert(0, os.path.dirname(path))
+    sys.argv = [path] + list(args)
+    runpy.run_path(path, run_name='__main__')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print("usage: script_loader.py <stage or script path> [script arguments ...]\n\nstages: "
+              + ', '.join(sorted(SCRIPTS)))
+        return 0 if argv else 2
+    try:
+        path = script_path(argv[0])
+    except ValueError as e:
+        print(e)
+        return 2
+    run_script(path, argv[1:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
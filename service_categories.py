@@ -0,0 +1,101 @@
+"""
+Service title -> category lookup shared by the report scripts.
+
+The report workbooks group controls by the AWS service in the `title` column.
+The grouping used to be a dict copied into every script and applied with one
+`isin` filter per category; it now lives here as a single lookup table that is
+applied with one categorical map:
+
+    from service_categories import CATEGORIES, partition
+    for category, category_df in partition(open_issues_df).items():
+        ...
+
+The table can be replaced without touching code by pointing
+REPORT_CATEGORIES_FILE at a JSON file ({"Compute": ["EC2", ...], ...}) or a
+CSV file with `title` and `category` columns.
+"""
+import csv
+import json
+import os
+
+# Default grouping, in the order the category sheets and summary blocks are written
+DEFAULT_CATEGORIES = {
+    'Security and Identity': ['IAM', 'ACM', 'KMS', 'GuardDuty', 'Secret Manager', 'Secret Hub', 'SSM'],
+    'Compute': ['Auto Scaling', 'EC2', 'ECS', 'EKS', 'Lambda', 'EMR', 'Step Functions'],
+    'Storage': ['EBS', 'ECR', 'S3', 'DLM', 'Backup'],
+    'Network': ['API Gateway', 'CloudFront', 'Route 53', 'VPC', 'ELB', 'ElasticCache', 'CloudTrail'],
+    'Database': ['RDS', 'DynamoDB', 'Athena', 'Glue'],
+    'Other': ['CloudFormation', 'CodeDeploy', 'Config', 'SNS', 'SQS', 'WorkSpaces', 'EventBridge'],
+}
+
+CATEGORIES_FILE = os.environ.get('REPORT_CATEGORIES_FILE')
+
+
+def load_categories(path=None):
+    """
+    Load the category table from a JSON or CSV file, or the default table when no path is given.
+
+    Args:
+        path (str, optional): JSON {category: [titles]} or CSV with title/category columns
+
+    Returns:
+        dict: category -> list of service titles, in file order
+    """
+    if not path:
+        return {category: list(titles) for category, titles in DEFAULT_CATEGORIES.items()}
+
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return {category: list(titles) for category, titles in data.items()}
+    elif path.lower().endswith('.csv'):
+        categories = {}
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                categories.setdefault(row['category'].strip(), []).append(row['title'].strip())
+        return categories
+    else:
+        raise ValueError("Unsupported categories file. Please use a JSON or CSV file.")
+
+
+def build_lookup(categories):
+    """
+    Flatten {category: [titles]} into {title: category}. Titles listed twice
+    keep their first category, so duplicates in a config are harmless.
+    """
+    lookup = {}
+    for category, titles in categories.items():
+        for title in titles:
+            lookup.setdefault(title, category)
+    return lookup
+
+
+CATEGORIES = load_categories(CATEGORIES_FILE)
+SERVICE_TO_CATEGORY = build_lookup(CATEGORIES)
+
+
+def categorize(titles, categories=None):
+    """
+    Map a Series of service titles to their category in one pass.
+
+    Returns a categorical Series (categories in table order); titles that are
+    in no category are NaN.
+    """
+    import pandas as pd
+
+    categories = CATEGORIES if categories is None else categories
+    lookup = SERVICE_TO_CATEGORY if categories is CATEGORIES else build_lookup(categories)
+    return titles.map(lookup).astype(pd.CategoricalDtype(list(categories)))
+
+
+def partition(df, column='title', categories=None):
+    """
+    Split df into one DataFrame per category with a single groupby.
+
+    Every category is present in the result, in table order, with an empty
+    frame when no rows fall into it. Rows keep their original order, and rows
+    whose service has no category are left out.
+    """
+    codes = categorize(df[column], categories)
+    groups = dict(tuple(df.groupby(codes, observed=True, sort=False)))
+    return {category: groups.get(category, df.iloc[0:0]) for category in codes.cat.categories}
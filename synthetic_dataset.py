@@ -0,0 +1,210 @@
+"""
+Generate synthetic Powerpipe-shaped compliance results for scale testing.
+
+Control titles are drawn from PowerPipeControls_PRC.csv and centralfile.csv, so
+the rows match the annotation files the pipeline enriches against. Row count,
+accounts, regions, service skew and status ratios are configurable, and the
+output is reproducible for a given seed. Rows are generated in chunks, so
+million-row CSV files are written with bounded memory.
+
+    python synthetic_dataset.py synthetic_1m.csv --rows 1000000 --accounts 25
+    python synthetic_dataset.py synthetic.xlsx --rows 50000 --status alarm=0.5,ok=0.4,skip=0.1
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from report_io import read_csv, write_columnar, write_csv_chunks, write_report
+from run_profile import profiled
+
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contains_report_generator_automation',
+                           'optimizer_locked', 'priority_seperater_file_tool')
+CATALOG_FILES = [os.path.join(CATALOG_DIR, 'PowerPipeControls_PRC.csv'),
+                 os.path.join(CATALOG_DIR, 'centralfile.csv')]
+
+DEFAULT_REGIONS = {
+    'us-east-1': 0.35, 'us-west-2': 0.2, 'eu-west-1': 0.15, 'ap-south-1': 0.1,
+    'eu-central-1': 0.08, 'ap-southeast-1': 0.07, 'global': 0.05,
+}
+DEFAULT_STATUS = {'alarm': 0.3, 'ok': 0.55, 'skip': 0.08, 'info': 0.04, 'error': 0.03}
+SEVERITIES = ['critical', 'high', 'medium', 'low']
+SEVERITY_WEIGHTS = [0.05, 0.25, 0.45, 0.25]
+
+# Compliance framework tag columns seen in real exports (kept by the report optimizer)
+FRAMEWORK_COLUMNS = ['cis_controls_v8_ig1', 'nist_800_53_rev_5', 'nist_csf', 'pci_dss_v321',
+                     'hipaa_final_omnibus_security_rule_2013', 'gdpr', 'soc_2', 'aws_foundational_security']
+
+# Reason text per status, as (prefix, suffix) around the resource
+REASONS = {
+    'alarm': ('', ' is not compliant.'),
+    'ok': ('', ' is compliant.'),
+    'skip': ('', ' skipped.'),
+    'info': ('', ' requires manual verification.'),
+    'error': ('Error evaluating ', '.'),
+}
+
+# xlsx sheets hold at most this many rows, header included
+XLSX_MAX_ROWS = 1_048_576
+
+
+def load_catalog(files=CATALOG_FILES):
+    """
+    Unique (title, control_title) pairs from the annotation CSV files
+    """
+    frames = [read_csv(path, columns=['title', 'control_title']) for path in files]
+    catalog = pd.concat(frames, ignore_index=True).dropna()
+    catalog['title'] = catalog['title'].str.strip()
+    catalog['control_title'] = catalog['control_title'].str.strip()
+    catalog = catalog[(catalog['title'] != '') & (catalog['control_title'] != '')]
+    return catalog.drop_duplicates().reset_index(drop=True)
+
+
+def parse_ratios(text):
+    """
+    Parse 'alarm=0.3,ok=0.6,skip=0.1' into normalized weights
+    """
+    ratios = {}
+    for part in text.split(','):
+        name, _, value = part.partition('=')
+        ratios[name.strip()] = float(value)
+    total = sum(ratios.values())
+    if total <= 0:
+        raise ValueError("Ratios must add up to more than 0")
+    return {name: value / total for name, value in ratios.items()}
+
+
+class SyntheticPowerpipe:
+    """
+    Reproducible generator of Powerpipe benchmark result rows.
+
+    Args:
+        accounts (int): Number of distinct AWS account ids
+        regions (dict): Region -> weight
+        status_ratios (dict): Status -> weight
+        service_skew (float): Zipf exponent over services; 0 spreads rows evenly,
+            higher values concentrate them on a few services like real accounts
+        seed (int): Random seed
+        catalog (DataFrame, optional): title/control_title pairs to draw from
+    """
+
+    def __init__(self, accounts=5, regions=None, status_ratios=None, service_skew=1.1, seed=0, catalog=None):
+        self.rng = np.random.default_rng(seed)
+        self.catalog = catalog if catalog is not None else load_catalog()
+        self.regions = regions or DEFAULT_REGIONS
+        self.status_ratios = status_ratios or DEFAULT_STATUS
+
+        # Twelve digit ids; some start with 0 to catch numeric parsing of account_id
+        self.accounts = np.array([f"{n:012d}" for n in self.rng.integers(10 ** 10, 10 ** 12, size=accounts)])
+
+        # Service weights follow a Zipf curve; controls share their service's weight
+        services = self.catalog['title'].unique()
+        service_rank = {name: rank for rank, name in enumerate(self.rng.permutation(services), start=1)}
+        service_weight = self.catalog['title'].map(lambda name: service_rank[name] ** -service_skew)
+        controls_per_service = self.catalog.groupby('title')['title'].transform('size')
+        weights = (service_weight / controls_per_service).to_numpy(dtype=float)
+        self.control_weights = weights / weights.sum()
+
+        self.control_ids = ('aws_' + self.catalog['control_title'].str.lower()
+                            .str.replace(r'[^a-z0-9]+', '_', regex=True).str.strip('_')).to_numpy()
+        self.services = self.catalog['title'].to_numpy()
+        self.control_titles = self.catalog['control_title'].to_numpy()
+        self.service_slugs = self.catalog['title'].str.lower().str.replace(r'[^a-z0-9]+', '', regex=True).to_numpy()
+        self.row_offset = 0
+
+    def chunk(self, rows):
+        """
+        Generate the next block of rows as a DataFrame
+        """
+        rng = self.rng
+        control = rng.choice(len(self.catalog), size=rows, p=self.control_weights)
+        account = self.accounts[rng.integers(0, len(self.accounts), size=rows)]
+        region = rng.choice(list(self.regions), size=rows, p=np.array(list(self.regions.values())) / sum(self.regions.values()))
+        status = rng.choice(list(self.status_ratios), size=rows, p=list(self.status_ratios.values()))
+        row_ids = np.arange(self.row_offset, self.row_offset + rows)
+        self.row_offset += rows
+
+        slugs = pd.Series(self.service_slugs[control])
+        resource = ('arn:aws:' + slugs + ':' + region + ':' + account + ':resource/res-'
+                    + pd.Series(row_ids).astype(str).str.zfill(10))
+        service = self.services[control]
+        control_title = self.control_titles[control]
+
+        df = pd.DataFrame({
+            'group_id': 'aws_compliance.benchmark.all_controls.' + pd.Series(service).str.lower().str.replace(' ', '_'),
+            'title': service,
+            'description': pd.Series(service) + ' controls.',
+            'control_id': self.control_ids[control],
+            'control_title': control_title,
+            'control_description': control_title,
+            'reason': '',
+            'resource': resource,
+            'status': status,
+            'severity': rng.choice(SEVERITIES, size=rows, p=SEVERITY_WEIGHTS),
+            'account_id': account,
+            'region': region,
+        })
+        for name, (prefix, suffix) in REASONS.items():
+            mask = df['status'] == name
+            df.loc[mask, 'reason'] = prefix + df.loc[mask, 'resource'] + suffix
+        for column in FRAMEWORK_COLUMNS:
+            df[column] = np.where(rng.random(rows) < 0.4, 'true', '')
+        return df
+
+    def chunks(self, rows, chunk_rows=250_000):
+        """
+        Yield DataFrames until rows have been generated
+        """
+        remaining = rows
+        while remaining > 0:
+            size = min(chunk_rows, remaining)
+            remaining -= size
+            yield self.chunk(size)
+
+
+def write_dataset(path, rows, chunk_rows=250_000, **options):
+    """
+    Write a synthetic export. CSV is appended chunk by chunk; Parquet, Arrow
+    and xlsx are written in one go. Returns the path.
+    """
+    generator = SyntheticPowerpipe(**options)
+    lower = path.lower()
+    if lower.endswith(('.xlsx', '.xls')) and rows >= XLSX_MAX_ROWS:
+        raise ValueError(f"xlsx sheets hold at most {XLSX_MAX_ROWS - 1} rows; use CSV or Parquet for {rows} rows")
+
+    if lower.endswith('.csv'):
+        write_csv_chunks(generator.chunks(rows, chunk_rows), path)
+    else:
+        df = pd.concat(generator.chunks(rows, chunk_rows), ignore_index=True)
+        if lower.endswith(('.xlsx', '.xls')):
+            write_report(df, path)
+        else:
+            write_columnar(df, path)
+    print(f"Synthetic dataset with {rows} rows saved as {path}")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Powerpipe export for scale testing.")
+    parser.add_argument('output_file', help="CSV, XLSX, Parquet or Arrow file to write")
+    parser.add_argument('-n', '--rows', type=int, default=100_000)
+    parser.add_argument('--accounts', type=int, default=5)
+    parser.add_argument('--regions', type=parse_ratios, default=None,
+                        help="Region weights, e.g. us-east-1=0.6,eu-west-1=0.4")
+    parser.add_argument('--status', type=parse_ratios, default=None,
+                        help="Status ratios, e.g. alarm=0.3,ok=0.6,skip=0.1")
+    parser.add_argument('--service-skew', type=float, default=1.1,
+                        help="Zipf exponent over services (0 = uniform)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=250_000)
+    args = parser.parse_args(argv)
+
+    write_dataset(args.output_file, args.rows, chunk_rows=args.chunk_rows, accounts=args.accounts,
+                  regions=args.regions, status_ratios=args.status, service_skew=args.service_skew, seed=args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(profiled(main)())
@@ -0,0 +1,111 @@
+"""
+Streaming plain-text tables for the filter tools.
+
+tabulate builds the whole table as one string before anything is printed,
+which is slow with long recommendation text. render_table writes the same
+kind of bordered table a batch of rows at a time, cuts long cells to a
+maximum width, and on a terminal pauses after every screenful:
+
+    render_table(filtered_df, ['title', 'control_title', 'priority'])
+    with open('filtered.txt', 'w') as f:
+        render_table(filtered_df, columns, out=f, max_width=None)
+
+Column widths come from a vectorized length scan of each column, so the
+first rows are written without formatting the whole frame first.
+"""
+import os
+import shutil
+import sys
+
+# Cells longer than this are cut and end in '...'; REPORT_TABLE_WIDTH=0 disables it
+MAX_COLUMN_WIDTH = int(os.environ.get('REPORT_TABLE_WIDTH', 60)) or None
+BATCH_ROWS = 1000
+ELLIPSIS = '...'
+
+
+def cell_text(values, max_width=MAX_COLUMN_WIDTH):
+    """
+    Display text for a column: missing values blank, line breaks and runs of
+    whitespace folded to one space, long values cut to max_width
+    """
+    text = values.astype(object).where(values.notna(), '').astype(str)
+    text = text.str.replace(r'\s+', ' ', regex=True).str.strip()
+    if max_width:
+        long = text.str.len() > max_width
+        if long.any():
+            text = text.where(~long, text.str.slice(0, max(max_width - len(ELLIPSIS), 1)) + ELLIPSIS)
+    return text
+
+
+def column_widths(df, columns, max_width=MAX_COLUMN_WIDTH):
+    """
+    Column widths from the raw value lengths, capped at max_width. Folding
+    whitespace only shortens a cell, so the cells are not formatted here.
+    """
+    widths = []
+    for column in columns:
+        values = df[column].dropna()
+        longest = int(values.astype(str).str.len().max()) if len(values) else 0
+        if max_width:
+            longest = min(longest, max_width)
+        widths.append(max(len(str(column)), longest))
+    return widths
+
+
+def _border(widths):
+    return '+' + '+'.join('-' * (width + 2) for width in widths) + '+\n'
+
+
+def _row(cells, widths):
+    return '| ' + ' | '.join(cell.ljust(width) for cell, width in zip(cells, widths)) + ' |\n'
+
+
+def _page_size(out):
+    """
+    Rows per page: a screenful on an interactive terminal, otherwise no paging
+    """
+    if out is sys.stdout and sys.stdout.isatty() and sys.stdin.isatty():
+        return max(shutil.get_terminal_size().lines - 2, 5)
+    return 0
+
+
+def render_table(df, columns=None, out=None, max_width=MAX_COLUMN_WIDTH, page_size=None, batch_rows=BATCH_ROWS):
+    """
+    Write df as a bordered text table, batch by batch.
+
+    Args:
+        df (pd.DataFrame): Rows to write
+        columns (list, optional): Columns to show, all by default
+        out (file, optional): Destination, sys.stdout by default
+        max_width (int, optional): Cut cells to this many characters; None keeps them whole
+        page_size (int, optional): Pause after this many rows; None pages only on a
+            terminal, 0 never pauses
+        batch_rows (int): Rows formatted per write
+
+    Returns:
+        int: Number of rows written (fewer than len(df) if the reader quit paging)
+    """
+    out = out or sys.stdout
+    columns = [column for column in (columns or list(df.columns)) if column in df.columns]
+    page_size = _page_size(out) if page_size is None else page_size
+    widths = column_widths(df, columns, max_width)
+
+    border = _border(widths)
+    out.write(border + _row([str(column) for column in columns], widths) + border)
+
+    written = 0
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        cells = [cell_text(batch[column], max_width).tolist() for column in columns]
+        for row in zip(*cells):
+            out.write(_row(row, widths))
+            written += 1
+            if page_size and written % page_size == 0 and written < len(df):
+                out.flush()
+                answer = input(f"-- {written}/{len(df)} rows, Enter for more, q to stop -- ")
+                if answer.strip().lower() == 'q':
+                    out.write(border)
+                    return written
+        out.flush()
+    out.write(border)
+    return written
@@ -0,0 +1,74 @@
+"""
+Control title matching: exact, normalized and fuzzy (trigram) matches.
+"""
+import pandas as pd
+
+from control_index import ControlIndex, normalize_key, normalize_keys
+
+ANNOTATIONS = pd.DataFrame({
+    'control_title': [
+        'AWS Config should be enabled',
+        'EC2 instances should not have a public IPv4 address',
+        'S3 buckets should block public access',
+        'aws config should be enabled.',
+    ],
+    'priority': ['High', 'Medium', 'Low', 'Low'],
+})
+
+
+def match(titles, fuzzy=False):
+    index = ControlIndex(ANNOTATIONS, fuzzy=fuzzy)
+    matched, found = index.match(pd.Series(titles), ['priority'])
+    return matched['priority'].tolist(), found.tolist(), index.stats
+
+
+def test_normalize_key():
+    assert normalize_key('  AWS  Config_should be enabled. ') == 'aws config should be enabled'
+    assert normalize_key(None) == ''
+    assert normalize_keys(pd.Series(['S3 buckets,  Block!', None])).tolist() == ['s3 buckets block', '']
+
+
+def test_exact_match():
+    priorities, found, stats = match(['S3 buckets should block public access'])
+    assert priorities == ['Low']
+    assert found == [True]
+    assert stats == {'rows': 1, 'exact': 1, 'fuzzy': 0, 'unmatched': 0}
+
+
+def test_normalized_match_ignores_case_spacing_and_punctuation():
+    priorities, found, _ = match(['s3 BUCKETS should  block public access.', ' S3 buckets should block public-access '])
+    assert priorities == ['Low', 'Low']
+    assert found == [True, True]
+
+
+def test_first_annotation_wins_for_the_same_normalized_title():
+    priorities, _, _ = match(['AWS Config should be enabled!'])
+    assert priorities == ['High']
+
+
+def test_unmatched_titles_without_fuzzy():
+    priorities, found, stats = match(['EC2 instances should not have a public IPv4 adress', ''])
+    assert found == [False, False]
+    assert all(pd.isna(priority) for priority in priorities)
+    assert stats['unmatched'] == 2
+
+
+def test_fuzzy_match_for_near_titles_only():
+    priorities, found, stats = match(['EC2 instances should not have a public IPv4 adress',
+                                      'Lambda functions should use supported runtimes'], fuzzy=True)
+    assert priorities[0] == 'Medium'
+    assert found == [True, False]
+    assert stats == {'rows': 2, 'exact': 0, 'fuzzy': 1, 'unmatched': 1}
+
+
+def test_fuzzy_threshold():
+    index = ControlIndex(ANNOTATIONS, fuzzy=True, threshold=0.99)
+    _, found = index.match(pd.Series(['EC2 instances should not have a public IPv4 adress']), ['priority'])
+    assert found.tolist() == [False]
+
+
+def test_match_keeps_the_index_of_the_titles():
+    titles = pd.Series(['AWS Config should be enabled', 'unknown'], index=[10, 20])
+    matched, found = ControlIndex(ANNOTATIONS).match(titles, ['priority'])
+    assert matched.index.tolist() == [10, 20]
+    assert found.index.tolist() == [10, 20]
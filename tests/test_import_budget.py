@@ -0,0 +1,19 @@
+"""
+Start-up budget: every entry script, the Tool_adds copies included, has to
+load in a fresh interpreter within DEFAULT_IMPORT_BUDGET seconds and without
+importing pandas, openpyxl, openai or the other heavy dependencies.
+"""
+import pytest
+
+from benchmark_suite import DEFAULT_IMPORT_BUDGET, IMPORT_CHECK_SCRIPTS, TOOL_ADDS_DIR, measure_import
+
+
+def test_tool_adds_copies_are_checked():
+    assert any(path.startswith(TOOL_ADDS_DIR) for path in IMPORT_CHECK_SCRIPTS)
+
+
+@pytest.mark.parametrize('script', IMPORT_CHECK_SCRIPTS)
+def test_script_loads_within_budget(script):
+    seconds, heavy = measure_import(script, repeat=3)
+    assert heavy == [], f"{script} imports {', '.join(heavy)} at start-up"
+    assert seconds <= DEFAULT_IMPORT_BUDGET, f"{script} took {seconds:.3f}s to load"
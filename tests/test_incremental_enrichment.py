@@ -0,0 +1,136 @@
+"""
+Diff-aware re-enrichment: a patched output must equal a full recompute
+against the new annotations, values and Arrow schema alike.
+"""
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+
+import incremental_enrichment
+from incremental_enrichment import RECOMMENDATION, patch_list_rows, reenrich
+from report_io import is_columnar, write_columnar, write_report
+from script_loader import load_stage
+
+
+def scan():
+    return pd.DataFrame({
+        'title': ['Config', 'Config', 'EC2', 'EC2', 'S3', 'S3', 'IAM', 'Lambda'],
+        'control_title': [
+            'AWS Config should be enabled',
+            'aws config should be enabled. ',
+            'EC2 instances should not have a public IP',
+            'EC2 instances should not have a public IP',
+            'S3 buckets should block public access',
+            'S3 buckets should block public access',
+            'IAM root user should have MFA',
+            'Lambda functions should use supported runtimes',
+        ],
+        'resource': [f"arn:{i}" for i in range(8)],
+        'status': ['alarm', 'alarm', 'alarm', 'ok', 'alarm', 'skip', 'alarm', 'alarm'],
+        'account_id': ['0123'] * 8,
+    })
+
+
+def annotations(priorities):
+    titles = ['AWS Config should be enabled', 'EC2 instances should not have a public IP',
+              'S3 buckets should block public access', 'IAM root user should have MFA']
+    return pd.DataFrame({
+        'title': ['Config', 'EC2', 'S3', 'IAM'],
+        'control_title': titles,
+        'priority': priorities,
+        RECOMMENDATION: [f"Fix {title}" for title in titles],
+    })
+
+
+def edit(old):
+    """
+    A new version: one priority and one recommendation edited, one control
+    removed, one added for rows that had no match
+    """
+    new = old.copy()
+    new.loc[0, 'priority'] = old.loc[1, 'priority']
+    new.loc[2, RECOMMENDATION] = 'Enable Block Public Access on the account'
+    new = new.drop(index=3)
+    added = pd.DataFrame({'title': ['Lambda'], 'control_title': ['Lambda functions should use supported runtimes'],
+                          'priority': [old.loc[3, 'priority']], RECOMMENDATION: ['Upgrade the runtime']})
+    return pd.concat([new, added], ignore_index=True)
+
+
+def enrich(df, df_priority):
+    return load_stage('annotate').update_priority_and_recommendation(df, df_priority)
+
+
+def read_table(path):
+    file_format = 'parquet' if path.endswith('.parquet') else 'ipc'
+    return ds.dataset(path, format=file_format).to_table()
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.arrow'])
+@pytest.mark.parametrize('priorities', [['High', 'Medium', 'Low', 'High'], [1, 2, 3, 1]],
+                         ids=['labels', 'numbers'])
+def test_patched_annotations_output_matches_full_run(tmp_path, extension, priorities):
+    old = annotations(priorities)
+    new = edit(old)
+    old_path, new_path = str(tmp_path / 'old.xlsx'), str(tmp_path / 'new.xlsx')
+    old.to_excel(old_path, index=False)
+    new.to_excel(new_path, index=False)
+
+    patched = str(tmp_path / f"scan_with_priorities{extension}")
+    full = str(tmp_path / f"full{extension}")
+    write_columnar(enrich(scan(), pd.read_excel(old_path)), patched)
+    write_columnar(enrich(scan(), pd.read_excel(new_path)), full)
+
+    counts = reenrich(old_path, new_path, [patched])
+
+    assert 0 < counts[patched] < len(scan())
+    patched_table, full_table = read_table(patched), read_table(full)
+    assert patched_table.schema.remove_metadata() == full_table.schema.remove_metadata()
+    assert patched_table.equals(full_table)
+
+
+def test_patched_list_output_matches_full_run(tmp_path):
+    def write_lists(folder, lists):
+        os.makedirs(folder)
+        for number, titles in lists.items():
+            pd.DataFrame({'control_title': titles, RECOMMENDATION: [f"Fix {t}" for t in titles],
+                          'COST': ['Low'] * len(titles)}).to_csv(os.path.join(folder, f"{number}_priority_expe.csv"),
+                                                                 index=False)
+
+    titles = scan()['control_title'].unique().tolist()
+    old_dir, new_dir = str(tmp_path / 'old'), str(tmp_path / 'new')
+    write_lists(old_dir, {1: titles[:3], 2: titles[3:], 3: titles[1:2]})
+    # One control moves from list 1 to list 3, one drops out of every list
+    write_lists(new_dir, {1: titles[1:3], 2: titles[3:-1], 3: titles[:2]})
+
+    patched, full = str(tmp_path / 'scan.parquet'), str(tmp_path / 'full.parquet')
+    for path, folder in ((patched, old_dir), (full, new_dir)):
+        lists = incremental_enrichment.load_annotation_version(folder, 'lists')
+        write_columnar(patch_list_rows(scan(), lists), path)
+
+    counts = reenrich(old_dir, new_dir, [patched])
+
+    assert counts[patched] > 0
+    patched_table, full_table = read_table(patched), read_table(full)
+    assert patched_table.schema.remove_metadata() == full_table.schema.remove_metadata()
+    assert patched_table.equals(full_table)
+
+
+def test_unaffected_files_are_not_rewritten(tmp_path):
+    old = annotations(['High', 'Medium', 'Low', 'High'])
+    new = old.copy()
+    new.loc[3, 'priority'] = 'Low'
+    old_path, new_path = str(tmp_path / 'old.xlsx'), str(tmp_path / 'new.xlsx')
+    old.to_excel(old_path, index=False)
+    new.to_excel(new_path, index=False)
+
+    # A report without the IAM control
+    report = str(tmp_path / 'scan.csv')
+    df = enrich(scan().iloc[:6].copy(), old)
+    write_report(df, report)
+    assert not is_columnar(report)
+    mtime = os.path.getmtime(report)
+
+    assert reenrich(old_path, new_path, [report]) == {report: 0}
+    assert os.path.getmtime(report) == mtime
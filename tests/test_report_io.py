@@ -0,0 +1,57 @@
+"""
+CSV encoding detection and the ISO-8859-1 reread for files whose first
+block samples as UTF-8.
+"""
+import pandas as pd
+import pytest
+
+from report_io import ENCODING_SAMPLE_BYTES, FALLBACK_ENCODING, detect_encoding, read_csv, stream_columns
+
+HEADER = b'control_title,resource,status\n'
+
+
+def write_late_latin1(path):
+    """
+    A CSV whose first sampled block is plain ASCII and whose last row has a
+    cp1252 byte (0xe9, 'é') past the sample
+    """
+    row = b'S3 buckets should block public access,arn:aws:s3:::bucket,alarm\n'
+    rows = ENCODING_SAMPLE_BYTES // len(row) + 10
+    with open(path, 'wb') as f:
+        f.write(HEADER + row * rows + b'Caf\xe9 control,arn:aws:s3:::late,ok\n')
+    return rows + 1
+
+
+def test_detect_encoding(tmp_path):
+    utf8, bom, latin1 = tmp_path / 'utf8.csv', tmp_path / 'bom.csv', tmp_path / 'latin1.csv'
+    utf8.write_bytes(HEADER + 'Café,arn,ok\n'.encode('utf-8'))
+    bom.write_bytes(b'\xef\xbb\xbf' + HEADER)
+    latin1.write_bytes(HEADER + b'Caf\xe9,arn,ok\n')
+    assert detect_encoding(str(utf8)) == 'utf-8'
+    assert detect_encoding(str(bom)) == 'utf-8-sig'
+    assert detect_encoding(str(latin1)) == FALLBACK_ENCODING
+
+
+@pytest.mark.parametrize('engine', ['pyarrow', 'pandas'])
+def test_read_csv_rereads_a_late_non_utf8_byte(tmp_path, engine):
+    path = str(tmp_path / 'late.csv')
+    rows = write_late_latin1(path)
+    assert detect_encoding(path) == 'utf-8'
+
+    df = read_csv(path, engine=engine)
+
+    assert len(df) == rows
+    assert df['control_title'].iloc[-1] == 'Café control'
+    assert df['status'].iloc[-1] == 'ok'
+
+
+def test_stream_columns_rereads_a_late_non_utf8_byte(tmp_path):
+    path, out = str(tmp_path / 'late.csv'), str(tmp_path / 'out.csv')
+    rows = write_late_latin1(path)
+
+    assert stream_columns(path, out, ['status', 'control_title'], chunksize=10_000) == rows
+
+    df = pd.read_csv(out, encoding='utf-8')
+    assert df.columns.tolist() == ['status', 'control_title']
+    assert len(df) == rows
+    assert df['control_title'].iloc[-1] == 'Café control'